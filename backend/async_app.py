@@ -0,0 +1,169 @@
+"""
+ASGI serving mode for production.
+
+The search routes run as async handlers on an async Elasticsearch client, so one
+worker keeps hundreds of searches in flight on a single event loop instead of
+parking a thread on each. Every other route (/index_*, /check_content, /health, ...)
+is still the Flask app from connect_db, served through a WSGI adapter on a thread
+pool so long scrapes never block the event loop.
+
+    pip install quart quart-cors asgiref "elasticsearch[async]" hypercorn
+    hypercorn async_app:application --workers 4 --bind 0.0.0.0:5000
+    # or: uvicorn async_app:application --workers 4 --port 5000
+
+Each worker is its own process with its own query cache and suggestion index; alias
+swaps made by one worker reach the others through index_versions.watch_alias_updates.
+"""
+from asgiref.wsgi import WsgiToAsgi
+import time
+from urllib.parse import parse_qsl
+
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+
+import connect_db as db
+import pagination
+import profiling
+from elastic import create_async_client
+from metrics import HTTP_REQUEST_SECONDS
+from pagination import InvalidCursor
+from query_cache import cached_async
+from responses import respond_async, search_etag
+
+ASYNC_ROUTES = ('/search', '/search_reddit', '/search_cfa', '/api/search_all', '/suggest')
+
+app = cors(Quart(__name__), expose_headers=["X-Next-Cursor"])
+flask_app = WsgiToAsgi(db.app)
+
+
+async def search_response(endpoint, query, params, aliases, compute):
+    """Async twin of connect_db.search_response (304s, cached encodings, compression)."""
+    etag = search_etag(endpoint, query, params, aliases)
+    status, body, headers = await respond_async(
+        etag, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'), compute
+    )
+    return Response(body, status=status, headers=headers)
+
+
+# One async client per worker, bound to that worker's event loop.
+es = None
+
+
+@app.before_serving
+async def open_client():
+    global es
+    if db.SEARCH_BACKEND != "local":
+        es = create_async_client()
+
+
+@app.after_serving
+async def close_client():
+    if es is not None:
+        await es.close()
+
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request_latency(response):
+    # Same histogram as the Flask routes, so /metrics (served by Flask) shows both.
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
+
+
+def async_client(request_timeout=None):
+    return es.options(request_timeout=request_timeout) if request_timeout else es
+
+
+async def search_page(index, body, page_size, cursor=None, request_timeout=None):
+    """One page on the configured backend (the local engine answers inline, in well under a millisecond)."""
+    if db.SEARCH_BACKEND == "local":
+        return pagination.search_page(db.local_engine, index, body, page_size, cursor)
+    return await pagination.search_page_async(async_client(request_timeout), index, body, page_size, cursor)
+
+
+async def msearch_pages(sources, page_size, cursor=None, request_timeout=None):
+    if db.SEARCH_BACKEND == "local":
+        return pagination.msearch_pages(db.local_engine, sources, page_size, cursor)
+    return await pagination.msearch_pages_async(async_client(request_timeout), sources, page_size, cursor)
+
+
+async def serve_search(route):
+    """Async twin of connect_db.serve_search: the same SearchRoute, run on the async client."""
+    if route.empty is not None:
+        return jsonify(route.empty)
+    degraded = []
+
+    async def run_search():
+        try:
+            outcome = await route.search(search_page, msearch_pages)
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            degraded.append(e)
+            return route.degrade(e), False
+        return route.result(outcome)
+
+    async def compute():
+        value = await cached_async(route.endpoint, route.query, route.params, route.aliases, run_search)
+        payload, extra_headers, cacheable = route.present(value)
+        return payload, extra_headers, cacheable and not degraded
+
+    try:
+        return await search_response(route.endpoint, route.query, route.params, route.aliases, compute)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        payload, status = route.failure(e)
+        return jsonify(payload), status
+
+
+@app.route('/search', methods=['GET'])
+async def search_engine():
+    return await serve_search(db.passage_route(request.args))
+
+
+@app.route('/search_reddit', methods=['GET'])
+async def search_reddit_memes_endpoint():
+    return await serve_search(db.reddit_route(request.args))
+
+
+@app.route('/search_cfa', methods=['GET'])
+async def search_cfa():
+    return await serve_search(db.cfa_route(request.args))
+
+
+@app.route('/api/search_all', methods=['GET'])
+async def search_all():
+    return await serve_search(db.search_all_route(request.args))
+
+
+@app.route('/suggest', methods=['GET'])
+async def suggest_endpoint():
+    query, limit, sources = db.suggest_args(request.args)
+
+    async def compute():
+        return db.suggest_compute(query, limit, sources)
+
+    return await search_response('/suggest', query, (limit, sources), list(db.suggestion_sources()), compute)
+
+
+def profiling_requested(scope):
+    """Profiled requests go to the Flask routes, where cProfile sees only that request's thread."""
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get("headers", [])}
+    query = dict(parse_qsl(scope.get("query_string", b"").decode('latin-1')))
+    return profiling.requested(headers.get(profiling.PROFILE_HEADER.lower()), query.get('profile'))
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: async routes on Quart, everything else (and profiled requests) on the Flask app."""
+    if scope["type"] == "http" and (scope["path"] not in ASYNC_ROUTES or profiling_requested(scope)):
+        return await flask_app(scope, receive, send)
+    return await app(scope, receive, send)
@@ -0,0 +1,252 @@
+"""
+Search and ingestion benchmark for connect_db.app, run against the local
+Elasticsearch stand-in (es_standin.py) so no cluster or network is needed.
+
+    python benchmark.py --scale 20 --requests 300 --concurrency 8 --output bench_results.json
+    python benchmark.py --baseline benchmark_baseline.json          # fail on regressions
+    python benchmark.py --save-baseline benchmark_baseline.json     # record a new baseline
+    python benchmark.py --backend local                             # serve searches from local_search.py
+
+Ingestion is measured by streaming the checked-in CSVs (scaled up synthetically)
+through the same create_generation -> ingest_actions -> swap_alias pipeline the
+/index_* routes use; the scrape step is left out because it depends on the network
+(record an HTTP archive and use FETCH_MODE=replay to include it).
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from es_standin import start_standin
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CFA_DETAILED_CSV = os.path.join(DATA_DIR, "cfa_breeds_detailed_2025.csv")
+REDDIT_CSV = os.path.join(DATA_DIR, "reddit_cat_memes.csv")
+WIKIPEDIA_CSV = os.path.join(DATA_DIR, "wikipedia_cat_data.csv")
+BRITANNICA_CSV = os.path.join(DATA_DIR, "britannica_cat_data.csv")
+
+SEARCH_ROUTES = ['/search', '/search_reddit', '/search_cfa', '/api/search_all']
+BASE_QUERIES = ["cat", "feline species", "domestic cat", "maine coon", "persian", "kitten",
+                "funny cat", "breed", "hunting", "whiskers", "siamese", "meme"]
+
+csv.field_size_limit(sys.maxsize)
+
+
+# --- SYNTHETIC DATA ---
+def read_rows(filename):
+    with open(filename, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+def split_text(text, size=600):
+    words, chunk = text.split(), []
+    for word in words:
+        chunk.append(word)
+        if sum(len(w) + 1 for w in chunk) >= size:
+            yield " ".join(chunk)
+            chunk = []
+    if chunk:
+        yield " ".join(chunk)
+
+
+def scaled_cfa_docs(scale):
+    rows = list(read_rows(CFA_DETAILED_CSV))
+    for copy in range(scale):
+        for row in rows:
+            suffix = f" {copy}" if copy else ""
+            yield {
+                "name": row['name'] + suffix,
+                "url": f"{row['url']}#copy-{copy}",
+                "description": row['description'],
+                "scraped_at": datetime.now().isoformat(),
+            }
+
+
+def scaled_reddit_docs(scale):
+    rows = list(read_rows(REDDIT_CSV))
+    for copy in range(scale):
+        for row in rows:
+            yield {
+                "title": row['title'],
+                "source_url": f"{row['source_url']}#copy-{copy}",
+                "scraped_content": row['scraped_content'],
+            }
+
+
+def scaled_passage_docs(db, scale):
+    """Article passages; the legacy one-row Wikipedia CSV is cut into passage-sized chunks."""
+    base = list(db.load_data_from_csv(WIKIPEDIA_CSV)) + list(
+        db.load_data_from_csv(BRITANNICA_CSV, db.BRITANNICA_URL, 'Cat | Britannica'))
+    passages = []
+    for doc in base:
+        for i, chunk in enumerate(split_text(doc['body_text'])):
+            passages.append({**doc, "body_text": chunk, "passage_id": f"{doc['passage_id']}-{i}"})
+    for copy in range(scale):
+        for doc in passages:
+            yield {**doc, "passage_id": f"{doc['passage_id']}-copy-{copy}"}
+
+
+# --- MEASUREMENT ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def bench_ingestion(db, es, label, alias, body, docs, id_field=None):
+    docs = list(docs)
+    started = time.perf_counter()
+    new_index = db.create_generation(es, alias, body=body)
+    stats = db.ingest_actions(es, db.to_actions(docs, new_index, id_field=id_field), label=label,
+                              refresh_index=new_index)
+    db.swap_alias(es, alias, new_index)
+    elapsed = time.perf_counter() - started
+    if db.SEARCH_BACKEND == "local":
+        # The swap rebuilt the local index from the on-disk CSV; serve the scaled docs instead.
+        _, text_fields, local_id_field = db.local_sources()[alias]
+        db.local_engine.build(alias, docs, text_fields, local_id_field)
+    return {
+        "documents": stats.successes,
+        "errors": stats.error_count,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(stats.successes / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def bench_route(app, route, queries, total_requests, concurrency):
+    def worker(indices):
+        client = app.test_client()
+        latencies, errors = [], 0
+        for i in indices:
+            started = time.perf_counter()
+            response = client.get(route, query_string={"q": queries[i % len(queries)]})
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+        return latencies, errors
+
+    slices = [range(i, total_requests, concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, slices))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(l for result, _ in results for l in result)
+    return {
+        "requests": total_requests,
+        "errors": sum(errors for _, errors in results),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "qps": round(total_requests / wall, 1) if wall else 0.0,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns human-readable regressions: latency up or throughput down by more than tolerance."""
+    regressions = []
+    for route, current in results["search"].items():
+        previous = baseline.get("search", {}).get(route)
+        if previous and previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous and current["qps"] < previous["qps"] * (1 - tolerance):
+            regressions.append(f"{route}: qps {previous['qps']} -> {current['qps']}")
+    for route, current in results["ingest"].items():
+        previous = baseline.get("ingest", {}).get(route)
+        if previous and current["docs_per_sec"] < previous["docs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{route}: docs/sec {previous['docs_per_sec']} -> {current['docs_per_sec']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark connect_db search and ingestion routes.")
+    parser.add_argument("--scale", type=int, default=10, help="synthetic copies of every CSV row")
+    parser.add_argument("--requests", type=int, default=200, help="requests per search route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--cache", action="store_true", help="leave the query and rendered-response caches enabled")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on regressions")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--backend", choices=["elasticsearch", "local"], default="elasticsearch",
+                        help="search backend the routes are served from")
+    args = parser.parse_args()
+
+    server, es_url = start_standin()
+    # Must be configured before connect_db builds its client and cache.
+    os.environ["ELASTIC_HOSTS"] = es_url
+    os.environ.pop("ELASTIC_HOST_URL", None)
+    os.environ["SEARCH_BACKEND"] = args.backend
+    os.environ["LOCAL_INDEX_DIR"] = tempfile.mkdtemp(prefix="bench_local_index_")
+    if not args.cache:
+        os.environ["QUERY_CACHE_SIZE"] = "0"
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    import connect_db as db
+
+    es = db.init_elasticsearch_client()
+    print(f"🧪 Benchmarking against stand-in at {es_url} (scale x{args.scale})")
+
+    ingest = {
+        "/index_data": bench_ingestion(db, es, "Wikipedia", db.INDEX_NAME, {"mappings": db.MAPPINGS},
+                                       scaled_passage_docs(db, args.scale), id_field="passage_id"),
+        "/index_reddit": bench_ingestion(db, es, "Reddit", db.REDDIT_INDEX_NAME, {"mappings": db.REDDIT_MAPPINGS},
+                                         scaled_reddit_docs(args.scale)),
+        "/index_cfa": bench_ingestion(db, es, "CFA", db.CFA_INDEX_NAME, db.cfa_index_body,
+                                      scaled_cfa_docs(args.scale), id_field="url"),
+    }
+
+    queries = BASE_QUERIES + [row['name'].lower() for row in read_rows(CFA_DETAILED_CSV)][:20]
+    search = {route: bench_route(db.app, route, queries, args.requests, args.concurrency)
+              for route in SEARCH_ROUTES}
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "scale": args.scale,
+            "requests_per_route": args.requests,
+            "concurrency": args.concurrency,
+            "cache_enabled": args.cache,
+            "search_backend": args.backend,
+        },
+        "ingest": ingest,
+        "search": search,
+    }
+    server.shutdown()
+
+    for route, r in ingest.items():
+        print(f"  {route:<16} {r['documents']:>7} docs  {r['docs_per_sec']:>9} docs/sec")
+    for route, r in search.items():
+        print(f"  {route:<16} p50 {r['p50_ms']:>8}ms  p95 {r['p95_ms']:>8}ms  "
+              f"p99 {r['p99_ms']:>8}ms  {r['qps']:>8} qps  ({r['errors']} errors)")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("🚨 Regressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("✅ No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
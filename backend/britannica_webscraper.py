@@ -1,7 +1,12 @@
 import requests
-from bs4 import BeautifulSoup
-import csv
-import re
+from datetime import datetime
+
+
+from passages import passage_rows, PASSAGE_SCHEMA
+from records import RecordWriter, find_records
+from html_extract import extract_article_passages, extract_title
+from fetcher import fetch
+from crawl_state import crawl_state
 
 # New Britannica URL
 url = "https://www.britannica.com/animal/cat"
@@ -14,42 +19,31 @@ HEADERS = {
 
 def scrape_britannica_to_csv(url, filename, headers):
     """
-    Scrapes the Britannica article on 'Cat' for all paragraphs and writes them to a CSV.
+    Scrapes the Britannica article on 'Cat' into section/paragraph passages and writes them as passage records.
     """
     try:
         # 1. Fetch the content using the User-Agent header
-        response = requests.get(url, headers=headers)
+        # Conditional GET: skip parsing entirely if the article hasn't changed since the last run
+        response = fetch(url, headers=headers, conditional=True)
         response.raise_for_status() 
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        data_rows = []
+        if not response.changed and find_records(filename):
+            print(f"♻️ Article unchanged since the last crawl; {filename} is up to date.")
+            return
         
         # 2. Target the main content area (Britannica often uses <article> or a general container)
-        # For simplicity, we'll find all paragraphs in the document.
-        # In a real-world scenario, you might target a class like 'topic-content' or similar.
-        all_paragraphs = soup.find_all('p')
+        # Headings split the paragraphs into sections; short paragraphs (captions, footers) are skipped.
+        page_title = extract_title(response.text) or 'Cat | Britannica'
         
-        # 3. Process the paragraphs
-        for i, p_tag in enumerate(all_paragraphs):
-            # Exclude very short paragraphs (often image captions or footers)
-            if len(p_tag.text.strip()) > 50: 
-                # Clean up text: remove reference numbers and leading/trailing whitespace
-                cleaned_text = re.sub(r'\[\d+\]', '', p_tag.text.strip())
-                
-                data_rows.append({
-                    'Paragraph_Number': i + 1,
-                    'Content': cleaned_text
-                })
+        # 3. Process the paragraphs into passages (only <article> is parsed when present)
+        passages = extract_article_passages(response.text, url, container='article')
 
-        # 4. Write Data to CSV
-        if data_rows:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['Paragraph_Number', 'Content']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(data_rows)
+        # 4. Write the passage records (see records.py for the format)
+        if passages:
+            with RecordWriter(filename, PASSAGE_SCHEMA) as writer:
+                writer.write_many(passage_rows(passages, url, page_title, datetime.now().isoformat()))
             
-            print(f"✅ Successfully scraped **{len(data_rows)}** paragraphs and saved data to **{filename}**")
+            crawl_state.commit([url])
+            print(f"✅ Successfully scraped **{len(passages)}** passages and saved data to **{writer.filename}**")
         else:
             print("⚠️ Could not find any suitable paragraphs to write.")
 
@@ -1,118 +1,359 @@
-from flask import Flask, request, jsonify, render_template_string
-from elasticsearch import Elasticsearch, helpers
+from flask import Flask, Response, g, request, jsonify, render_template_string
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import csv
 import importlib.util
 from elasticsearch.helpers import bulk
-import cloudscraper
 
 import requests
-from bs4 import BeautifulSoup
-import re
 import time
 from datetime import datetime
-import json
+
+from elastic import get_client, start_health_checks, health_status
+from fetcher import crawl_concurrently, fetch, get_session, CHALLENGE_SESSION, CRAWL_MAX_WORKERS
+from crawl_state import crawl_state, UNCHANGED
+from ingest import ingest_actions, to_actions, peek
+from reddit_crawler import crawl_reddit_posts, listing_url, REDDIT_HEADERS, REDDIT_SCHEMA, REDDIT_MAX_PAGES
+from index_versions import (create_generation, swap_alias, discard_generation, live_indices, on_alias_swap,
+                            notify_alias_updated, watch_alias_updates)
+from query_cache import query_cache, cached, bypass as bypass_query_cache
+from passages import passage_rows, row_to_passage_document, PASSAGE_SCHEMA
+from records import Schema, RecordWriter, tee_records, replace_records, read_records, find_records
+from html_extract import extract_article_passages, extract_content_paragraphs, extract_links, extract_title
+from local_search import LocalSearchClient
+from suggest import suggester
+from pagination import search_page, msearch_pages, page_size_arg, cacheable_page, InvalidCursor
+from responses import respond, search_etag, rendered_cache, dumps
+from snippets import (with_offsets, highlight_clause, snippet_from_hit, highlighter_for, forget_highlighters,
+                      SNIPPET_HIGHLIGHTER)
+from dedup import article_filter, reddit_filter, cfa_filter
+from jobs import job_store
+import profiling
+from metrics import registry, timed, host_of, observe_cache, HTTP_REQUEST_SECONDS, SCRAPER_PARSE_SECONDS
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor"])
 load_dotenv()
 
 # --- MAPPING DATA SETUP (Cleaned to be minimal and correct) ---
 INDEX_NAME = "search_index"
 # NOTE: These MAPPINGS are defined here, but the active index uses the old/inferred ones.
-# We keep these definitions because the /index_data route will delete the old index
-# and apply these correct ones for future use.
+# We keep these definitions because the /index_data route builds each new index
+# generation with these correct ones.
 MAPPINGS = {
     "properties": {
+        "passage_id": {"type": "keyword"},
         "title": {"type": "text"},
-        "body_text": {"type": "text"}, 
-        "url": {"type": "keyword"},   
-        "snippet": {"type": "text"}
+        # Section headings are also kept whole for exact matching and suggestions
+        "section": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+        # One passage (paragraph), not the whole article; offsets stored for query-time snippets
+        "body_text": with_offsets({"type": "text"}),
+        "url": {"type": "keyword"}
     }
 }
 
 # --- WIKIPEDIA SCRAPER CONFIGURATION ---
 SCRAPE_URL = "https://en.wikipedia.org/w/index.php?title=Cat&action=render"
 CSV_FILENAME = "wikipedia_cat_data.csv"
+# Britannica passages (written by britannica_webscraper.py) are indexed alongside Wikipedia when present.
+BRITANNICA_URL = "https://www.britannica.com/animal/cat"
+BRITANNICA_CSV_FILE = "britannica_cat_data.csv"
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
 # --- ELASTICSEARCH CLIENT INIT ---
-ELASTIC_HOST_URL = os.getenv("ELASTIC_HOST_URL")
-ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
-client = None
-
+# The pooled client is built once (see elastic.py); health checks run in the background.
 def init_elasticsearch_client():
-    global client
-    if client is None:
-        full_host_url = f"https://{ELASTIC_HOST_URL}"
+    return get_client()
+
+es_client = init_elasticsearch_client()
+start_health_checks()
+
+# Rebuilding an index invalidates every cached result that read from it.
+on_alias_swap(query_cache.invalidate_alias)
+
+# --- SEARCH BACKEND ---
+# SEARCH_BACKEND=local serves the search routes from the embedded BM25 engine (local_search.py)
+# instead of Elasticsearch; the /index_* routes still write to Elasticsearch.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "elasticsearch").lower()
+local_engine = LocalSearchClient()
+
+def get_search_client():
+    """The client the search routes read from (the local engine or the pooled ES client)."""
+    return local_engine if SEARCH_BACKEND == "local" else init_elasticsearch_client()
+
+def snippet_highlighter(alias, field):
+    """The highlighter for field's snippets on alias (the local engine builds its own fragments)."""
+    if SEARCH_BACKEND == "local":
+        return SNIPPET_HIGHLIGHTER
+    return highlighter_for(es_client, alias, field)
+
+on_alias_swap(forget_highlighters)
+
+def cursor_header(next_cursor):
+    """The next-page cursor also travels in X-Next-Cursor (the only place list-shaped routes carry it)."""
+    return {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+# --- SEARCH ROUTES (shared by the Flask views below and async_app's Quart views) ---
+class SearchRoute:
+    """
+    One request to a search route, independent of how it is served. Flask (serve_search) and
+    Quart (async_app.serve_search) only differ in how they run search(page, msearch), where
+    page(index, body, page_size, cursor, request_timeout) / msearch(sources, ...) run the query.
+
+    result(outcome) -> (value, cacheable) shapes the search outcome into the cached value;
+    degrade(error) -> value answers a failed search with a degraded (uncached) value, or raises;
+    present(value) -> (payload, extra headers, cacheable) turns the value into the response;
+    failure(error) -> (payload, status) answers anything else that went wrong.
+    """
+
+    def __init__(self, endpoint, query, page_size, cursor, aliases, search, result, present,
+                 degrade=None, failure=None, empty=None, needs_client=False):
+        self.endpoint = endpoint
+        self.query = query
+        self.page_size = page_size
+        self.cursor = cursor
+        self.params = (page_size, cursor)
+        self.aliases = aliases
+        self.search = search
+        self.result = result
+        self.present = present
+        self.degrade = degrade or self._reraise
+        self.failure = failure or (lambda e: ({"error": f"Search failed: {e}"}, 500))
+        self.empty = empty # Answered straight away (e.g. for an empty query) when set
+        self.needs_client = needs_client
+
+    @staticmethod
+    def _reraise(error):
+        raise error
+
+def passage_route(args):
+    user_query = args.get('q', 'cat feline')
+    page_size = page_size_arg(args.get('page_size'), 10)
+    cursor = args.get('cursor')
+    search_body = build_passage_query(user_query, page_size)
+
+    def result(outcome):
+        search_response, next_cursor = outcome
+        payload = format_passage_response(user_query, search_response)
+        return {**payload, "page_size": page_size, "next_cursor": next_cursor}, cacheable_page(cursor)
+
+    return SearchRoute(
+        '/search', user_query, page_size, cursor, [INDEX_NAME],
+        search=lambda page, msearch: page(INDEX_NAME, search_body, page_size, cursor),
+        result=result,
+        present=lambda payload: (payload, cursor_header(payload["next_cursor"]), cacheable_page(cursor)),
+        needs_client=True,
+    )
+
+def reddit_route(args):
+    user_query = args.get('q', 'funny cat')
+    page_size = page_size_arg(args.get('page_size'), 50)
+    cursor = args.get('cursor')
+
+    def payload(results, next_cursor):
+        return {"query": user_query, "total_hits": len(results), "results": results,
+                "page_size": page_size, "next_cursor": next_cursor}
+
+    def degrade(e):
+        # A failed Reddit search degrades to no results (never cached)
+        print(f"Error searching Reddit index: {e}")
+        return payload([], None)
+
+    return SearchRoute(
+        '/search_reddit', user_query, page_size, cursor, [REDDIT_INDEX_NAME],
+        # A generous timeout to ensure the query completes
+        search=lambda page, msearch: page(REDDIT_INDEX_NAME, build_reddit_query(user_query, page_size),
+                                          page_size, cursor, request_timeout=30),
+        result=lambda outcome: (payload(format_reddit_hits(outcome[0]['hits']['hits']), outcome[1]),
+                                cacheable_page(cursor)),
+        present=lambda value: (value, cursor_header(value["next_cursor"]), cacheable_page(cursor)),
+        degrade=degrade,
+        failure=lambda e: ({"error": f"Reddit search failed: {e}"}, 500),
+        needs_client=True,
+    )
+
+def cfa_route(args):
+    query = args.get('q', '')
+    page_size = page_size_arg(args.get('page_size'), 10)
+    cursor = args.get('cursor')
+    return SearchRoute(
+        '/search_cfa', query, page_size, cursor, [CFA_INDEX_NAME],
+        search=lambda page, msearch: page(CFA_INDEX_NAME, build_cfa_query(query), page_size, cursor),
+        result=lambda outcome: ({"results": format_cfa_hits(outcome[0]['hits']['hits']), "next_cursor": outcome[1]},
+                                cacheable_page(cursor)),
+        # The body stays a plain list for existing clients; the cursor travels in X-Next-Cursor.
+        present=lambda page: (page["results"], cursor_header(page["next_cursor"]), cacheable_page(cursor)),
+        failure=lambda e: ([], 200),
+        empty=None if query else [],
+    )
+
+def search_all_route(args):
+    query = args.get('q', '')
+    sources = search_all_sources(query)
+    # Without ?page_size= every source keeps its own default size.
+    page_size = page_size_arg(args.get('page_size'), None)
+    cursor = args.get('cursor')
+
+    def result(outcome):
+        responses, next_cursor = outcome
+        payload, cacheable = merge_msearch_responses(sources, responses)
+        return {**payload, "next_cursor": next_cursor}, cacheable and cacheable_page(cursor)
+
+    def degrade(e):
+        print(f"Error running multi-search: {e}")
+        return result(([{"error": str(e)}] * len(sources), None))[0]
+
+    return SearchRoute(
+        '/api/search_all', query, page_size, cursor, [index for _, index, _, _ in sources],
+        # One _msearch round trip for all sources (later pages read each from its own point-in-time)
+        search=lambda page, msearch: msearch(paged_sources(sources), page_size, cursor,
+                                             request_timeout=SEARCH_ALL_REQUEST_TIMEOUT),
+        result=result,
+        present=lambda payload: (payload, cursor_header(payload["next_cursor"]),
+                                 not payload["partial"] and cacheable_page(cursor)),
+        degrade=degrade,
+        empty=None if query else {"breeds": [], "facts": [], "memes": []},
+    )
+
+def suggest_args(args):
+    """(query, limit, sources) of a /suggest request."""
+    sources = [source for source in args.get('sources', '').split(',') if source] or None
+    return args.get('q', ''), args.get('limit', type=int), sources
+
+def suggest_compute(query, limit, sources):
+    """compute() for /suggest: completions are cheap and always cacheable."""
+    return {"query": query, "suggestions": suggester.suggest(query, limit, sources)}, {}, True
+
+def run_search_page(index, body, page_size, cursor, request_timeout=None):
+    """One page on the configured backend (the `page` function SearchRoute.search is given)."""
+    options = {"request_timeout": request_timeout} if request_timeout else {}
+    return search_page(get_search_client(), index, body, page_size, cursor, **options)
+
+def run_msearch_pages(sources, page_size, cursor, request_timeout=None):
+    options = {"request_timeout": request_timeout} if request_timeout else {}
+    return msearch_pages(get_search_client(), sources, page_size, cursor, **options)
+
+def serve_search(route):
+    """Answers a SearchRoute through the query cache and the response layer."""
+    if route.empty is not None:
+        return jsonify(route.empty)
+    if route.needs_client and not get_search_client():
+        return jsonify({"error": "Elasticsearch connection failed"}), 500
+    degraded = []
+
+    def run_search():
         try:
-            client = Elasticsearch(
-                [full_host_url],
-                api_key=ELASTIC_API_KEY
-            )
-            if client.ping():
-                print("Successfully connected to Elasticsearch.")
-            else:
-                print("Connection failed, check credentials.")
-                client = None
+            outcome = route.search(run_search_page, run_msearch_pages)
+        except InvalidCursor:
+            raise
         except Exception as e:
-            print(f"Error initializing Elasticsearch client: {e}")
-            client = None
-    return client
+            degraded.append(e)
+            return route.degrade(e), False
+        return route.result(outcome)
 
-es_client = init_elasticsearch_client()
+    def compute():
+        value = cached(route.endpoint, route.query, route.params, route.aliases, run_search)
+        payload, extra_headers, cacheable = route.present(value)
+        return payload, extra_headers, cacheable and not degraded
+
+    try:
+        return search_response(route.endpoint, route.query, route.params, route.aliases, compute)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        payload, status = route.failure(e)
+        return jsonify(payload), status
+
+def search_response(endpoint, query, params, aliases, compute):
+    """
+    Serves a search route through the compact response layer (responses.py): a 304 or an
+    already-encoded body when possible, else compute() -> (payload, extra headers, cacheable).
+    Admins can send the profiling token to get an uncached, profiled answer instead.
+    """
+    if profiling.requested(request.headers.get(profiling.PROFILE_HEADER), request.args.get('profile')):
+        return profiled_response(compute)
+    etag = search_etag(endpoint, query, params, aliases)
+    status, body, headers = respond(
+        etag, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'), compute
+    )
+    return Response(body, status=status, headers=headers)
+
+def profiled_response(compute):
+    """Runs compute() under profiling.py (no query/response cache) and attaches the breakdown."""
+    with profiling.profile_request() as profile, bypass_query_cache():
+        payload, extra_headers, _ = compute()
+        started = time.perf_counter()
+        dumps(payload)
+        profile.serialize_seconds = time.perf_counter() - started
+    body = dumps(profiling.attach(payload, profile.report()))
+    return Response(body, headers={**extra_headers, "Content-Type": "application/json", "Cache-Control": "no-store"})
+
+def submit_index_job(kind):
+    """
+    Starts an /index_* run as a background job and answers 202 with its ID (GET /jobs/<id>
+    for progress). ?wait=1 runs it on the request thread and returns its result instead.
+    """
+    params = {"force": is_forced_refresh()}
+    if request.args.get('wait') == '1':
+        job = job_store.run_inline(kind, params)
+        if job is None:
+            return jsonify({"error": f"A {kind} job is already running."}), 409
+        return jsonify({**job.result, "job_id": job.id}), job.status_code
+    job, created = job_store.submit(kind, params)
+    payload = {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+    if not created:
+        payload["message"] = f"A {kind} job is already running; not starting another."
+    return jsonify(payload), 202
+
+def resumable_generation(client, job):
+    """The generation an earlier attempt of job was building, if it still exists (None otherwise)."""
+    index_name = job.checkpoint.get("index")
+    if not index_name or job.checkpoint.get("mode") == "incremental":
+        return None
+    if client.indices.exists(index=index_name):
+        return index_name
+    job.reset_checkpoint() # Garbage-collected or deleted meanwhile: start over
+    return None
+
+def is_forced_refresh():
+    """?force=1 on an /index_* route skips conditional crawling and rebuilds from scratch."""
+    return request.args.get('force', '').lower() in ('1', 'true', 'yes')
 
-# --- SCRAPER FUNCTION (Brute-Force Text Extraction) ---
-def scrape_wikipedia_cat_to_csv(url, filename, headers):
+# --- SCRAPER FUNCTION (Section/Paragraph Passages) ---
+def scrape_wikipedia_cat_to_csv(url, filename, headers, conditional=False):
+    """
+    Scrapes the article into one passage record per paragraph, tagged with its section title.
+    Returns UNCHANGED (without parsing) when a conditional fetch finds nothing new.
+    """
     print(f"--- Starting Wikipedia scrape for: {url} ---")
-    documents_to_write = [] 
 
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = fetch(url, headers=headers, timeout=15, conditional=conditional)
         response.raise_for_status() 
+        if conditional and not response.changed and find_records(filename):
+            print("♻️ Wikipedia article unchanged since the last crawl; skipping parse.")
+            return UNCHANGED
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-        main_content_container = soup.find('body')
-        if not main_content_container:
-            main_content_container = soup
-        
-        all_text_nodes = main_content_container.get_text('\n', strip=True) 
-        full_text_lines = all_text_nodes.split('\n')
-        article_paragraphs = []
-        
-        print(f"--- DEBUG: Total text lines/nodes found: {len(full_text_lines)} ---") 
+        # Only the title, headings and paragraphs are parsed; the rest of the page is never built
+        with timed(SCRAPER_PARSE_SECONDS, host=host_of(url)):
+            raw_title = extract_title(response.content)
+            passages = extract_article_passages(response.content, url)
+        page_title = raw_title.replace(' - Wikipedia', '').strip() if raw_title else 'Cat Article'
+        total_chars = sum(len(p['text']) for p in passages)
 
-        for text_line in full_text_lines:
-            cleaned_text = re.sub(r'\[\d+\]', '', text_line.strip())
-            if len(cleaned_text) > 50: 
-                article_paragraphs.append(cleaned_text)
-            
-        article_text = ' '.join(article_paragraphs)
-        page_title = soup.title.string.replace(' - Wikipedia', '').strip() if soup.title else 'Cat Article'
-        
-        if len(article_text) < 1000: 
-             print(f"❌ Warning: Scraped content is short ({len(article_text)} chars). Scraping may have failed.")
+        print(f"--- DEBUG: {len(passages)} passages across {len({p['section'] for p in passages})} sections ---") 
         
-        # NOTE: This creates the CSV columns: 'source_url', 'title', 'scraped_content'
-        documents_to_write.append({
-            'timestamp': datetime.now().isoformat(),
-            'source_url': url,
-            'title': page_title,
-            'scraped_content': article_text 
-        })
+        if total_chars < 1000: 
+             print(f"❌ Warning: Scraped content is short ({total_chars} chars). Scraping may have failed.")
         
-        if documents_to_write and len(article_text) > 50:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['timestamp', 'source_url', 'title', 'scraped_content'] 
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(documents_to_write)
+        if passages:
+            with RecordWriter(filename, PASSAGE_SCHEMA) as writer:
+                writer.write_many(passage_rows(passages, url, page_title, datetime.now().isoformat()))
             
-            print(f"✅ Success! Article scraped (Length: {len(article_text)}). Data saved to {filename}.")
+            print(f"✅ Success! {len(passages)} passages scraped (Length: {total_chars}). Data saved to {writer.filename}.")
             return True
         else:
             print("⚠️ No suitable content was extracted for indexing.")
@@ -124,113 +365,125 @@ def scrape_wikipedia_cat_to_csv(url, filename, headers):
         print(f"❌ An unexpected error occurred: {e}")
     return False
 
-# --- CSV LOADER FUNCTION (Remains mapping to 'body_text' for bulk ingestion) ---
-def load_data_from_csv(filename):
-    documents = []
+# --- RECORD LOADER FUNCTION (One document per passage, text in 'body_text') ---
+def load_data_from_csv(filename, default_url=SCRAPE_URL, default_title='Wikipedia Article'):
+    """Streams passage documents from a Wikipedia/Britannica data set (see records.py) one record at a time."""
+    count = 0
     try:
-        with open(filename, mode='r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if 'scraped_content' in row:
-                    documents.append({
-                        # The fields below are the PREFERRED fields for the MAPPINGS defined above
-                        "title": row.get('title', 'Wikipedia Article'), 
-                        "url": row.get('source_url', SCRAPE_URL), 
-                        "body_text": row['scraped_content'], 
-                        "snippet": row['scraped_content'][:200].strip() + "..." 
-                    })
-            print(f"✅ Loaded {len(documents)} documents from {filename}.")
-            return documents
+        for ordinal, row in enumerate(read_records(filename, PASSAGE_SCHEMA), start=1):
+            doc = row_to_passage_document(row, default_url, default_title, ordinal)
+            if not doc['body_text']:
+                continue
+            count += 1
+            yield doc
+        print(f"✅ Loaded {count} passages from {filename}.")
     except FileNotFoundError:
         print(f"🚨 CRITICAL ERROR: Scraped data file '{filename}' not found. Run /index_data!")
-        return []
     except Exception as e:
-        print(f"🚨 Error reading CSV: {e}")
-        return []
+        print(f"🚨 Error reading passage records: {e}")
+
+def load_article_passages():
+    """
+    Wikipedia passages, followed by Britannica passages if that article has been scraped.
+    Boilerplate and passages that near-duplicate an earlier one (from either site) are dropped.
+    """
+    def passages():
+        yield from load_data_from_csv(CSV_FILENAME)
+        if find_records(BRITANNICA_CSV_FILE):
+            yield from load_data_from_csv(BRITANNICA_CSV_FILE, BRITANNICA_URL, 'Cat | Britannica')
+    yield from article_filter().filter(passages())
 
 # --------------------------------------------------------
 # INDEX SETUP ENDPOINT (FIXED: Added robust error checking)
 # --------------------------------------------------------
 @app.route('/index_data', methods=['POST'])
 def index_data():
+    """Submits the Wikipedia/Britannica indexing job (see run_index_data); ?wait=1 runs it inline."""
+    return submit_index_job("index_data")
+
+def run_index_data(job):
     """
     Creates the index, applies the mapping, runs the scraper, and bulk-ingests documents.
+    A resumed job reuses its generation and the scraped records, and skips acknowledged passages.
     """
-    scrape_success = scrape_wikipedia_cat_to_csv(SCRAPE_URL, CSV_FILENAME, HEADERS)
-    if not scrape_success:
-        return jsonify({"error": "Indexing aborted because web scraping failed."}), 500
-
     es_client = init_elasticsearch_client()
     if not es_client:
-        return jsonify({"error": "Elasticsearch connection failed"}), 500
-
-    try:
-        csv_documents = load_data_from_csv(CSV_FILENAME)
-        if not csv_documents:
-             return jsonify({"error": f"Failed to load documents from {CSV_FILENAME}. Check file path and contents."}), 500
-        
-        # A. Delete/Create Index
-        if es_client.indices.exists(index=INDEX_NAME):
-            # FORCING DELETION TO RESOLVE MAPPING INCOMPATIBILITIES
-            es_client.indices.delete(index=INDEX_NAME, ignore=[400, 404])
-            print(f"Index '{INDEX_NAME}' deleted for fresh start.")
+        return {"error": "Elasticsearch connection failed"}, 500
 
-        create_response = es_client.indices.create(index=INDEX_NAME)
-        print("Index created:", create_response)
+    new_index = resumable_generation(es_client, job)
+    if new_index and find_records(CSV_FILENAME):
+        print(f"⏯️ Resuming into '{new_index}' ({job.progress.get('checkpointed', 0)} passages already indexed).")
+    else:
+        new_index = None
+        # Conditional refresh: skip everything if the article is unchanged (?force=1 always rebuilds)
+        conditional = not job.params.get("force") and bool(live_indices(es_client, INDEX_NAME))
+        job.report(stage="scraping")
+        scrape_success = scrape_wikipedia_cat_to_csv(SCRAPE_URL, CSV_FILENAME, HEADERS, conditional)
+        if scrape_success == UNCHANGED:
+            return {"status": UNCHANGED, "message": "Wikipedia article unchanged; index left as is."}, 200
+        if not scrape_success:
+            crawl_state.rollback([SCRAPE_URL])
+            return {"error": "Indexing aborted because web scraping failed."}, 500
 
-        # B. Add or update mappings
-        mapping_response = es_client.indices.put_mapping(
-            index=INDEX_NAME,
-            body=MAPPINGS
+    try:
+        first_doc, csv_documents = peek(
+            doc for doc in load_article_passages() if not job.is_done(doc['passage_id'])
         )
-        print("Mappings updated:", mapping_response)
+        if first_doc is None and not new_index:
+            return {"error": f"Failed to load documents from {CSV_FILENAME}. Check file path and contents."}, 500
 
-        # C. Bulk ingest documents 
-        ingestion_timeout=300 
-        actions = [{'_index': INDEX_NAME, '_source': doc} for doc in csv_documents]
-        
-        print(f"Attempting to bulk ingest {len(csv_documents)} documents...")
-        bulk_response = helpers.bulk(
-            es_client.options(request_timeout=ingestion_timeout),
-            actions,
-            refresh="wait_for" 
+        # A. Build a fresh generation with the correct mappings (the live alias keeps serving)
+        if not new_index:
+            new_index = create_generation(es_client, INDEX_NAME, body={"mappings": MAPPINGS})
+            job.set_index(new_index)
+
+        # B. Stream documents into the new generation in bounded chunks, checkpointing each one
+        print(f"Streaming documents from {CSV_FILENAME} into '{new_index}'...")
+        job.report(stage="ingesting")
+        stats = ingest_actions(
+            es_client,
+            to_actions(csv_documents, new_index, id_field="passage_id"),
+            label="Wikipedia",
+            refresh_index=new_index,
+            on_chunk=job.checkpoint_chunk
         )
         
-        successes, errors = bulk_response
-        
-        if errors:
+        if stats.error_count:
+            discard_generation(es_client, new_index)
+            job.reset_checkpoint()
+            crawl_state.rollback([SCRAPE_URL])
             print("\n🚨 CRITICAL BULK INGESTION ERRORS FOUND:")
-            print(f"  Total Errors: {len(errors)}")
-            print(f"  Sample Error (First 500 chars): {str(errors[0])[:500]}...") 
-            return jsonify({
+            print(f"  Total Errors: {stats.error_count}")
+            print(f"  Sample Error (First 500 chars): {str(stats.error_samples[0])[:500]}...") 
+            return {
                 "error": "Bulk ingestion encountered errors (check server log for the full error details).",
-                "success_count": successes,
-                "error_count": len(errors),
-                "sample_error": errors[0] if errors else None
-            }), 500
+                **stats.as_dict()
+            }, 500
         
-        return jsonify({
-            "status": f"Index created and {len(csv_documents)} documents from CSV ingested successfully",
-            "bulk_stats": bulk_response
-        })
+        # C. Atomically repoint the read alias at the new generation
+        job.report(stage="swapping")
+        swap_alias(es_client, INDEX_NAME, new_index)
+        crawl_state.commit([SCRAPE_URL])
+
+        return {
+            "status": f"Index created and {job.progress.get('checkpointed', stats.successes)} passages ingested successfully",
+            "index": new_index,
+            "bulk_stats": stats.as_dict()
+        }, 200
 
     except Exception as e:
-        return jsonify({"error": f"Indexing failed: {e}"}), 500
+        # The half-built generation and its checkpoint are kept so the job can be resumed.
+        crawl_state.rollback([SCRAPE_URL])
+        return {"error": f"Indexing failed: {e}", "resumable": bool(new_index)}, 500
 
 # --------------------------------------------------------
-# SEARCH ENDPOINT (FIXED: To search using the preferred field names: body_text, url, snippet)
+# SEARCH ENDPOINT (FIXED: To search using the preferred field names: body_text, url, section)
 # --------------------------------------------------------
-@app.route('/search', methods=['GET'])
-def search_engine():
-    es_client = init_elasticsearch_client()
-    if not es_client:
-        return jsonify({"error": "Elasticsearch connection failed"}), 500
-
-    user_query = request.args.get('q', 'cat feline')
-    
+def build_passage_query(user_query, size=10):
+    """Search body for /search over the article passages."""
     # We now search the 'body_text' field, which is the preferred field name defined in MAPPINGS.
     # If the user runs /index_data, this search will work.
-    search_body = {
+    return {
         "query": {
             "match": {
                 "body_text": {
@@ -239,36 +492,34 @@ def search_engine():
                 }
             }
         },
-        "size": 10,
-        "_source": ["title", "url", "snippet", "body_text"] # Retrieve all preferred fields
+        "size": size,
+        "_source": ["title", "url", "section"], # body_text never leaves ES; only its highlighted fragments do
+        "highlight": highlight_clause("body_text", highlighter=snippet_highlighter(INDEX_NAME, "body_text"))
     }
 
-    try:
-        search_response = es_client.search(
-            index=INDEX_NAME,
-            body=search_body,
-        )
-
-        results = []
-        for hit in search_response['hits']['hits']:
-            # The data processing now relies on the MAPPINGS being correct (body_text, url, snippet)
-            # which is guaranteed after running /index_data successfully.
-            results.append({
-                "id": hit['_id'],
-                "score": round(hit['_score'], 2),
-                "title": hit['_source'].get('title'),
-                "url": hit['_source'].get('url'),
-                "snippet": hit['_source'].get('snippet') or hit['_source'].get('body_text', '')[:200].strip() + "..."
-            })
-
-        return jsonify({
-            "query": user_query,
-            "total_hits": search_response['hits']['total']['value'],
-            "results": results
+def format_passage_response(user_query, search_response):
+    results = []
+    for hit in search_response['hits']['hits']:
+        # The data processing now relies on the MAPPINGS being correct (body_text, url, section)
+        # which is guaranteed after running /index_data successfully.
+        results.append({
+            "id": hit['_id'],
+            "score": round(hit['_score'], 2),
+            "title": hit['_source'].get('title'),
+            "url": hit['_source'].get('url'),
+            "section": hit['_source'].get('section'),
+            "snippet": snippet_from_hit(hit, 'body_text')
         })
 
-    except Exception as e:
-        return jsonify({"error": f"Search failed: {e}"}), 500
+    return {
+        "query": user_query,
+        "total_hits": search_response['hits']['total']['value'],
+        "results": results
+    }
+
+@app.route('/search', methods=['GET'])
+def search_engine():
+    return serve_search(passage_route(request.args))
 
 # --------------------------------------------------------
 # REMAINING ENDPOINTS (Home, Check_Content)
@@ -319,17 +570,17 @@ def home_page():
 
 @app.route('/check_content', methods=['GET'])
 def check_content():
-    es_client = init_elasticsearch_client()
-    if not es_client:
+    search_client = get_search_client()
+    if not search_client:
         return jsonify({"error": "Elasticsearch connection failed"}), 500
 
     try:
-        response = es_client.search(
+        response = search_client.search(
             index=INDEX_NAME,
             body={
                 "query": {"match_all": {}},
                 "size": 1,
-                "_source": ["title", "body_text"]
+                "_source": ["title", "section", "body_text"]
             }
         )
 
@@ -342,15 +593,19 @@ def check_content():
             
         first_doc = hits[0]['_source']
         body_text = first_doc.get('body_text', 'No body_text field found')
+
+        def passages_matching(term):
+            return search_client.count(index=INDEX_NAME, body={"query": {"match": {"body_text": term}}})['count']
         
         return jsonify({
             "status": "Success - Content Verified",
             "title": first_doc.get('title', 'N/A'),
-            "body_text_length": len(body_text),
-            "body_text_snippet": body_text[:500] + "...",
-            "contains_cat": "cat" in body_text.lower(),
-            "contains_feline": "feline" in body_text.lower(),
-            "IMPORTANT": "The length should be high (10k+) and both keywords should be True."
+            "passage_count": response['hits']['total']['value'],
+            "sample_section": first_doc.get('section', 'N/A'),
+            "sample_passage": body_text[:500],
+            "passages_with_cat": passages_matching("cat"),
+            "passages_with_feline": passages_matching("feline"),
+            "IMPORTANT": "There should be dozens of passages and both keyword counts should be above zero."
         })
 
     except Exception as e:
@@ -363,95 +618,41 @@ REDDIT_INDEX_NAME = 'reddit_cat_memes_index'
 REDDIT_URL = "https://www.reddit.com/r/Catmemes/"
 REDDIT_CSV_FILE = "reddit_cat_memes.csv"
 
-def scrape_reddit_cat_memes_to_csv(url, filename):
+REDDIT_PROBE_URL = listing_url(REDDIT_URL, "hot")
+
+def reddit_listing_unchanged():
     """
-    Scrapes Reddit using the stable, unofficial JSON endpoint via requests.
+    Conditionally fetches the first hot page; True if it matches the last committed crawl.
+    The probe is recorded as pending under REDDIT_PROBE_URL, so commit/rollback it with the index.
     """
-    print(f"--- Starting JSON endpoint scrape for: {url} ---")
-    documents_to_write = []
-    
-    # Reddit expects a User-Agent string to not block requests
-    headers = {
-        'User-Agent': 'Simple-Python-Scraper-V1.0 (by marssmith)'
-    }
-    
-    try:
-        # 1. Make the request
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status() # Raises an HTTPError for bad responses (4xx or 5xx)
-        
-        data = response.json()
-        
-        # 2. Parse the JSON structure
-        if 'data' in data and 'children' in data['data']:
-            posts = data['data']['children']
-            print(f"--- DEBUG: Found {len(posts)} posts in the JSON response. ---")
-            
-            for post_item in posts:
-                post = post_item['data']
-                
-                # Extracting necessary fields from the JSON
-                # -----------------------------------------------------------------
-                # ALL LINES BELOW MUST BE INDENTED TO BE INSIDE THE FOR LOOP!
-                # -----------------------------------------------------------------
-                title = post.get('title', '').strip()
-                relative_url = post.get('permalink', '')
-                
-                if title and relative_url:
-                    # 1. Clean the title of non-standard characters
-                    clean_title = re.sub(r'[^\w\s\.-]', '', title).strip() 
-                    
-                    # Construct absolute URL
-                    absolute_url = f"https://www.reddit.com{relative_url}"
-                    
-                    # Combine the clean title with the terms 'cat meme'
-                    searchable_content = f"{clean_title} cat meme reddit" 
-                    
-                    documents_to_write.append({
-                        'timestamp': datetime.now().isoformat(),
-                        'source_url': absolute_url,
-                        'title': clean_title,
-                        'scraped_content': searchable_content
-                    })
-            # 3. WRITE DATA TO CSV
-            if documents_to_write:
-                with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                    fieldnames = ['timestamp', 'source_url', 'title', 'scraped_content'] 
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(documents_to_write)
-                
-                print(f"✅ Success! Found {len(documents_to_write)} posts. Data saved to {filename}.")
-                return True
-            else:
-                print("⚠️ JSON endpoint returned no posts.")
-                return False
+    response = fetch(REDDIT_PROBE_URL, headers=REDDIT_HEADERS, timeout=10, conditional=True)
+    response.raise_for_status()
+    return not response.changed and bool(find_records(REDDIT_CSV_FILE))
 
-        else:
-            print("⚠️ JSON structure was unexpected. Could not find posts in 'data.children'.")
-            return False
-
-    except requests.exceptions.RequestException as e:
-        print(f"❌ HTTP Request failed: {e}")
-        return False
-    except json.JSONDecodeError:
-        print("❌ Failed to decode JSON response.")
-        print(f"Response Text Sample: {response.text[:200]}...")
-        return False
-    except Exception as e:
-        print(f"❌ Scraping failed: {e}")
-        return False
+def reddit_row_to_document(row):
+    return {
+        "title": row.get('title', 'Reddit Post'),
+        "source_url": row.get('source_url', REDDIT_URL),
+        "scraped_content": row['scraped_content'],
+    }
 
-def search_reddit_memes(query, page_size=50):
-    
+def scrape_reddit_cat_memes_to_csv(url, filename, listings=None, max_pages=REDDIT_MAX_PAGES):
     """
-    Executes a search query against the dedicated Reddit index.
+    Backfills the subreddit via the paginated JSON listings (see reddit_crawler) into its record file.
+    Returns the number of posts written.
     """
-    # NOTE: es_client must be initialized globally to be used here.
+    print(f"--- Starting paginated JSON crawl for: {url} ---")
+    count = 0
+    for _ in tee_records(crawl_reddit_posts(url, listings, max_pages), filename, REDDIT_SCHEMA):
+        count += 1
+    print(f"✅ Wrote {count} posts to {filename}")
+    return count
 
-    
-    search_body = {
+def build_reddit_query(query, page_size=50):
+    """Search body for the Reddit index, boosting the title."""
+    return {
         "size": page_size,
+        "_source": ["title", "source_url", "scraped_content"], # scraped_content is the results' snippet
         "query": {
             # Search across title and content fields, boosting the title
             "multi_match": {
@@ -461,150 +662,127 @@ def search_reddit_memes(query, page_size=50):
             }
         }
     }
-    
-    try:
-        res = es_client.search(
-            index=REDDIT_INDEX_NAME, 
-            body=search_body,
-            request_timeout=30 # Add a generous timeout to ensure the query completes
-        )
-        
-        results = []
-        for hit in res['hits']['hits']:
-            source = hit['_source']
-            results.append({
-                'title': source['title'],
-                # Use scraped_content (the meme text/title) as the snippet
-                'snippet': source['scraped_content'], 
-                'url': source['source_url'],
-                'score': hit['_score'],
-                'source_type': 'Reddit Meme' # IMPORTANT for frontend differentiation
-            })
-        return results
-    
-    except Exception as e:
-        print(f"Error searching Reddit index: {e}")
-        return []
-    
+
+def format_reddit_hits(hits):
+    results = []
+    for hit in hits:
+        source = hit['_source']
+        results.append({
+            'title': source['title'],
+            'url': source['source_url'],
+            # Use scraped_content (the meme text/title) as the snippet
+            'snippet': source.get('scraped_content'),
+            'score': hit['_score'],
+            'source_type': 'Reddit Meme' # IMPORTANT for frontend differentiation
+        })
+    return results
+
 REDDIT_MAPPINGS = {
     "properties": {
         "title": {"type": "text"},
-        # This maps the content from the CSV
+        # This maps the content from the scraped records
         "scraped_content": {"type": "text"}, 
         # Source URL is typically stored as a keyword
         "source_url": {"type": "keyword"},   
     }
 }
 def load_reddit_data_from_csv(filename):
-    """Loads documents from the Reddit CSV, mapping fields for Elasticsearch ingestion."""
-    documents = []
+    """Streams documents from the Reddit records, mapping fields for Elasticsearch ingestion."""
+    count = 0
+    dedup = reddit_filter()
     try:
-        with open(filename, mode='r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                # IMPORTANT: We use the actual column names from the scraper
-                documents.append({
-                    "title": row.get('title', 'Reddit Post'), 
-                    "source_url": row.get('source_url', REDDIT_URL), 
-                    "scraped_content": row['scraped_content'], 
-                })
-            print(f"✅ Loaded {len(documents)} documents from {filename} for Reddit index.")
-            return documents
+        for row in read_records(filename, REDDIT_SCHEMA):
+            # IMPORTANT: We use the actual column names from the scraper
+            doc = reddit_row_to_document(row)
+            if dedup.check(doc):
+                continue
+            count += 1
+            yield doc
+        dedup.report()
+        print(f"✅ Loaded {count} documents from {filename} for Reddit index.")
     except FileNotFoundError:
         print(f"🚨 CRITICAL ERROR: Scraped data file '{filename}' not found. Run /index_reddit!")
-        return []
     except Exception as e:
-        print(f"🚨 Error reading Reddit CSV: {e}")
-        return []
+        print(f"🚨 Error reading Reddit records: {e}")
     
 # --------------------------------------------------------
 # REDDIT INDEX SETUP ENDPOINT
 # --------------------------------------------------------
 @app.route('/index_reddit', methods=['POST'])
 def index_reddit_data():
+    """Submits the Reddit indexing job (see run_index_reddit); ?wait=1 runs it inline."""
+    return submit_index_job("index_reddit")
+
+def run_index_reddit(job):
     """
-    Creates the Reddit index, applies the mapping, runs the scraper, and bulk-ingests documents.
+    Crawls the Reddit listings page by page and streams each page's posts into a fresh
+    index generation as it arrives (also mirroring them to the record file), then swaps the alias.
+    Posts are keyed by URL, so a resumed job re-crawls the listings but only sends new posts.
     """
-    # NOTE: Fix the REDDIT_URL to use the JSON endpoint:
-    # REDDIT_URL = "https://www.reddit.com/r/Catmemes/.json"4
-    global REDDIT_URL
-    
-    # Check if the global variable was updated for the JSON endpoint (since the provided code was HTML-based)
-    if not REDDIT_URL.endswith('.json'):
-        REDDIT_URL = REDDIT_URL.strip('/') + '/.json'
-        print(f"Updated REDDIT_URL to JSON endpoint: {REDDIT_URL}")
-
-    scrape_success = scrape_reddit_cat_memes_to_csv(REDDIT_URL, REDDIT_CSV_FILE)
-    if not scrape_success:
-        return jsonify({"error": "Reddit Indexing aborted because web scraping failed."}), 500
-
     es_client = init_elasticsearch_client()
     if not es_client:
-        return jsonify({"error": "Elasticsearch connection failed"}), 500
+        return {"error": "Elasticsearch connection failed"}, 500
 
+    new_index = resumable_generation(es_client, job)
     try:
-        csv_documents = load_reddit_data_from_csv(REDDIT_CSV_FILE)
-        if not csv_documents:
-             return jsonify({"error": f"Failed to load documents from {REDDIT_CSV_FILE}."}), 500
-        
-        # A. Delete/Create Index
-        if es_client.indices.exists(index=REDDIT_INDEX_NAME):
-            es_client.indices.delete(index=REDDIT_INDEX_NAME, ignore=[400, 404])
-            print(f"Index '{REDDIT_INDEX_NAME}' deleted for fresh start.")
+        # Conditional refresh: skip everything if the first hot page is unchanged (?force=1 always rebuilds)
+        if (not new_index and not job.params.get("force") and live_indices(es_client, REDDIT_INDEX_NAME)
+                and reddit_listing_unchanged()):
+            print("♻️ Reddit listing unchanged since the last crawl; skipping the backfill.")
+            return {"status": UNCHANGED, "message": "Reddit listing unchanged; index left as is."}, 200
 
-        es_client.indices.create(index=REDDIT_INDEX_NAME)
+        job.report(stage="crawling")
+        rows = tee_records(crawl_reddit_posts(REDDIT_URL), REDDIT_CSV_FILE, REDDIT_SCHEMA)
+        # The record file keeps every crawled post; only distinct, non-empty ones are indexed
+        documents = reddit_filter().filter(reddit_row_to_document(row) for row in rows)
+        first_doc, documents = peek(doc for doc in documents if not job.is_done(doc['source_url']))
+        if first_doc is None and not new_index:
+            crawl_state.rollback([REDDIT_PROBE_URL])
+            return {"error": "Reddit Indexing aborted because the crawl returned no posts."}, 500
 
-        # B. Add or update mappings
-        es_client.indices.put_mapping(
-            index=REDDIT_INDEX_NAME,
-            body=REDDIT_MAPPINGS
-        )
+        # A. Build a fresh generation with the Reddit mappings (the live alias keeps serving)
+        if not new_index:
+            new_index = create_generation(es_client, REDDIT_INDEX_NAME, body={"mappings": REDDIT_MAPPINGS})
+            job.set_index(new_index)
 
-        # C. Bulk ingest documents 
-        actions = [{'_index': REDDIT_INDEX_NAME, '_source': doc} for doc in csv_documents]
-        print(f"Attempting to bulk ingest {len(csv_documents)} Reddit documents...")
-        bulk_response = helpers.bulk(
-            es_client.options(request_timeout=300),
-            actions,
-            refresh="wait_for" 
+        # B. Stream posts into the new generation while later pages are still being fetched
+        stats = ingest_actions(
+            es_client,
+            to_actions(documents, new_index, id_field="source_url"),
+            label="Reddit",
+            refresh_index=new_index,
+            on_chunk=job.checkpoint_chunk
         )
-        
-        successes, errors = bulk_response
-        
-        if errors:
-            print(f"🚨 Reddit Bulk Ingestion Errors: {len(errors)}")
-            return jsonify({"error": "Reddit Bulk ingestion encountered errors."}), 500
-        
-        return jsonify({
-            "status": f"Reddit Index created and {len(csv_documents)} documents ingested successfully",
-            "bulk_stats": bulk_response
-        })
+
+        if stats.error_count:
+            print(f"🚨 Reddit Bulk Ingestion Errors: {stats.error_count}")
+            discard_generation(es_client, new_index)
+            job.reset_checkpoint()
+            crawl_state.rollback([REDDIT_PROBE_URL])
+            return {"error": "Reddit Bulk ingestion encountered errors.", **stats.as_dict()}, 500
+
+        # C. Atomically repoint the read alias at the new generation
+        job.report(stage="swapping")
+        swap_alias(es_client, REDDIT_INDEX_NAME, new_index)
+        crawl_state.commit([REDDIT_PROBE_URL])
+
+        return {
+            "status": f"Reddit Index created and {job.progress.get('checkpointed', stats.successes)} documents ingested successfully",
+            "index": new_index,
+            "bulk_stats": stats.as_dict()
+        }, 200
 
     except Exception as e:
-        return jsonify({"error": f"Reddit Indexing failed: {e}"}), 500
-    
-    # --------------------------------------------------------
+        # The half-built generation and its checkpoint are kept so the job can be resumed.
+        crawl_state.rollback([REDDIT_PROBE_URL])
+        return {"error": f"Reddit Indexing failed: {e}", "resumable": bool(new_index)}, 500
+
+# --------------------------------------------------------
 # REDDIT SEARCH ENDPOINT
 # --------------------------------------------------------
 @app.route('/search_reddit', methods=['GET'])
 def search_reddit_memes_endpoint():
-    es_client = init_elasticsearch_client()
-    if not es_client:
-        return jsonify({"error": "Elasticsearch connection failed"}), 500
-
-    user_query = request.args.get('q', 'funny cat')
-    
-    try:
-        results = search_reddit_memes(user_query) # This calls your existing function
-        
-        return jsonify({
-            "query": user_query,
-            "total_hits": len(results),
-            "results": results
-        })
-
-    except Exception as e:
-        return jsonify({"error": f"Reddit search failed: {e}"}), 500
+    return serve_search(reddit_route(request.args))
     
 #--------------------------------------------------------
 # create index for cfa breeds
@@ -614,6 +792,10 @@ def search_reddit_memes_endpoint():
 CFA_INDEX_NAME = 'cat_fanciers_association_index'
 CFA_URL = "https://cfa.org/breeds/"
 CFA_CSV_FILE = "cfa_breeds_2025.csv"
+# Full /index_cfa runs mirror the scraped breeds here (the local search engine is built from it).
+CFA_DETAILED_CSV_FILE = "cfa_breeds_detailed_2025.csv"
+CFA_FIELDNAMES = ['name', 'url', 'description']
+CFA_SCHEMA = Schema("cfa", CFA_FIELDNAMES)
 
 cfa_index_body = {
     "settings": {
@@ -626,7 +808,7 @@ cfa_index_body = {
     "mappings": {
         "properties": {
             "name": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
-            "description": {"type": "text", "analyzer": "breed_analyzer"},
+            "description": with_offsets({"type": "text", "analyzer": "breed_analyzer"}),
             "url": {"type": "keyword"},
             "scraped_at": {"type": "date"}
         }
@@ -635,183 +817,517 @@ cfa_index_body = {
 
 # --- SCRAPER LOGIC ---
 
-def get_breed_links():
-    """Fetches list of all breed URLs from the main CFA index page."""
-    scraper = cloudscraper.create_scraper() 
+def get_breed_links(conditional=False):
+    """
+    Fetches list of all breed URLs from the main CFA index page.
+    When the page is unchanged since the last committed crawl, the stored link list is reused.
+    """
+    scraper = get_session(CHALLENGE_SESSION) # Shared cookies/challenge state and keep-alive pool
     print(f"📡 Accessing CFA Index: {CFA_URL}")
     try:
-        response = scraper.get(CFA_URL, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        response = fetch(CFA_URL, timeout=15, session=scraper, conditional=conditional)
+        stored_links = crawl_state.get(CFA_URL).get('links')
+        if conditional and not response.changed and stored_links:
+            print(f"♻️ CFA index page unchanged; reusing {len(stored_links)} stored links.")
+            return stored_links
+
         breed_links = []
         seen_urls = set()
         
-        for link in soup.find_all('a', href=True):
-            url = link['href']
-            name = link.get_text(strip=True)
+        # Only <a href> nodes are parsed
+        with timed(SCRAPER_PARSE_SECONDS, host=host_of(CFA_URL)):
+            links = list(extract_links(response.text))
+        for url, name in links:
             # Filter for specific breed profile URLs
             if "cfa.org" in url and len(url.split('/')) >= 4:
                 if not any(x in url.lower() for x in ['contact', 'about', 'privacy', 'tag', 'category']):
                     if name and url not in seen_urls:
                         breed_links.append({'name': name, 'url': url})
                         seen_urls.add(url)
+        crawl_state.set_extra(CFA_URL, links=breed_links)
         print(f"✅ Found {len(breed_links)} unique breeds.")
         return breed_links
     except Exception as e:
         print(f"⚠️ Link Scrape Error: {e}")
         return []
 
-def upload_cfa_to_es(breed_links, index_name):
-    """Visits each breed URL to get detailed descriptions and bulk uploads to ES."""
-    scraper = cloudscraper.create_scraper()
-    actions = []
-    
-    for i, breed in enumerate(breed_links):
-        print(f"  [{i+1}/{len(breed_links)}] Scraping: {breed['name']}")
-        try:
-            res = scraper.get(breed['url'], timeout=10)
-            soup = BeautifulSoup(res.text, 'html.parser')
-            # Targets the main text content area
-            content = soup.find('div', class_='entry-content') or soup.find('main')
-            paragraphs = content.find_all('p')
-            desc = " ".join([p.get_text(strip=True) for p in paragraphs[:5]])
-        except Exception:
-            desc = "Description currently unavailable."
-
-        actions.append({
-            "_index": index_name,
-            "_id": breed['url'],
-            "_source": {
-                "name": breed['name'],
-                "url": breed['url'],
-                "description": desc,
-                "scraped_at": datetime.now().isoformat()
-            }
-        })
-        time.sleep(0.3) # Polite delay
-    
-    if actions:
-        successes, _ = helpers.bulk(es_client, actions)
-        return successes
-    return 0
+def scrape_breed_detail(scraper, breed, index_name, conditional=False):
+    """Fetches one breed page and returns its bulk action (None if the page is unchanged)."""
+    try:
+        res = fetch(breed['url'], timeout=10, session=scraper, conditional=conditional)
+        if conditional and not res.changed:
+            return None
+        # Targets the main text content area (only that subtree is parsed)
+        with timed(SCRAPER_PARSE_SECONDS, host=host_of(breed['url'])):
+            paragraphs = extract_content_paragraphs(res.text, max_paragraphs=5)
+        if paragraphs is None:
+            raise ValueError("content area not found")
+        desc = " ".join(paragraphs)
+    except Exception:
+        # fetch() may already have recorded the new content hash; forget it so the page is retried.
+        crawl_state.rollback([breed['url']])
+        if conditional:
+            raise # Keep the live document rather than overwrite it with a placeholder
+        desc = "Description currently unavailable."
+
+    return {
+        "_index": index_name,
+        "_id": breed['url'],
+        "_source": {
+            "name": breed['name'],
+            "url": breed['url'],
+            "description": desc,
+            "scraped_at": datetime.now().isoformat()
+        }
+    }
+
+def upload_cfa_to_es(breed_links, index_name, max_workers=CRAWL_MAX_WORKERS, conditional=False, removed_urls=(),
+                     csv_file=None, job=None):
+    """
+    Visits the breed URLs concurrently (rate-limited per host) and streams each
+    parsed breed into ES as soon as it finishes, instead of collecting them first.
+    With conditional=True unchanged pages are skipped, and removed_urls are deleted,
+    so the live index can be updated in place. A full crawl is mirrored to the csv_file data set; an
+    incremental one merges the pages it changed or deleted into it (see update_cfa_records).
+    Within a job, URLs finished by an earlier attempt are skipped and each chunk is checkpointed.
+    Returns (bulk stats, settled URLs): the pages whose crawl state may be committed because
+    ES acknowledged their document (or they were unchanged, or dropped as boilerplate).
+    """
+    scraper = get_session(CHALLENGE_SESSION)
+    if job:
+        breed_links = [breed for breed in breed_links if not job.is_done(breed['url'])]
+        removed_urls = [url for url in removed_urls if not job.is_done(url)]
+        job.report(stage="scraping", urls_remaining=len(breed_links))
+    total = len(breed_links)
+    skipped = []
+    settled = set()
+    changed, deleted = {}, set()
+    dedup = cfa_filter()
+
+    def generate_actions():
+        crawl = crawl_concurrently(
+            breed_links,
+            lambda breed: scrape_breed_detail(scraper, breed, index_name, conditional),
+            max_workers=max_workers,
+            session=scraper
+        )
+        for i, (breed, action, error) in enumerate(crawl, start=1):
+            if error:
+                print(f"  [{i}/{total}] ⚠️ Failed: {breed['name']} ({error})")
+                continue
+            if action is None:
+                skipped.append(breed['url'])
+                if job:
+                    job.mark_done(breed['url'])
+                continue
+            reason = dedup.check(action['_source'])
+            if reason:
+                print(f"  [{i}/{total}] 🧹 Dropped: {breed['name']} ({reason})")
+                if conditional:
+                    # The page may have been indexed before it turned into boilerplate
+                    deleted.add(breed['url'])
+                    yield {"_op_type": "delete", "_index": index_name, "_id": breed['url']}
+                else:
+                    settled.add(breed['url'])
+                    if job:
+                        job.mark_done(breed['url'])
+                continue
+            print(f"  [{i}/{total}] Scraped: {breed['name']}")
+            if conditional:
+                changed[breed['url']] = action['_source']
+            yield action
+        dedup.report()
+        for url in removed_urls:
+            deleted.add(url)
+            yield {"_op_type": "delete", "_index": index_name, "_id": url}
+
+    actions = generate_actions()
+    if csv_file and not conditional:
+        # A resumed job appends to the rows its earlier attempt already wrote.
+        resuming = bool(job and job.attempts > 1)
+        sources = tee_records((action['_source'] for action in actions), csv_file, CFA_SCHEMA, append=resuming)
+        actions = to_actions(sources, index_name, id_field="url")
+
+    def on_chunk(ids, stats):
+        settled.update(ids)
+        if job:
+            job.checkpoint_chunk(ids, stats)
+
+    try:
+        # Small chunks so breeds land in ES shortly after they are scraped.
+        stats = ingest_actions(es_client, actions, label="CFA", chunk_size=50, refresh_index=index_name,
+                               on_chunk=on_chunk)
+    finally:
+        if csv_file and conditional:
+            # Only what ES acknowledged, so the records never get ahead of the index.
+            update_cfa_records(csv_file, {url: source for url, source in changed.items() if url in settled},
+                               deleted & settled)
+    if skipped:
+        print(f"♻️ Skipped {len(skipped)} unchanged breed pages.")
+    settled.update(skipped)
+    return stats, settled
+
+def update_cfa_records(filename, updated, deleted):
+    """
+    Applies an incremental run to the CFA records (updated: url -> document, deleted: urls),
+    so the local engine and suggestions, which are rebuilt from them, match the live index.
+    """
+    if not updated and not deleted:
+        return
+    if find_records(filename) is None:
+        print(f"⚠️ No CFA records in '{filename}' to update; run a full /index_cfa (?force=1) to write them.")
+        return
+
+    def merged():
+        seen = set()
+        for row in read_records(filename, CFA_SCHEMA):
+            if row['url'] in deleted or row['url'] in seen:
+                continue
+            seen.add(row['url'])
+            yield updated.get(row['url'], row)
+        yield from (doc for url, doc in updated.items() if url not in seen)
+
+    count = replace_records(filename, CFA_SCHEMA, merged())
+    print(f"💾 Updated the CFA records: {len(updated)} changed, {len(deleted)} removed ({count} breeds).")
 
 # --- FLASK ROUTES ---
 
 @app.route('/index_cfa', methods=['POST'])
 def index_cfa_data():
+    """Submits the CFA indexing job (see run_index_cfa); ?wait=1 runs it inline."""
+    return submit_index_job("index_cfa")
+
+def run_index_cfa(job):
     if not es_client:
-        return jsonify({"error": "Elasticsearch not connected"}), 500
+        return {"error": "Elasticsearch not connected"}, 500
+
+    # Incremental refresh updates the live index in place; ?force=1 rebuilds a full generation.
+    # A resumed job keeps the mode (and, for a full rebuild, the generation) it started with.
+    new_index = resumable_generation(es_client, job)
+    if job.checkpoint.get("mode"):
+        incremental = job.checkpoint["mode"] == "incremental"
+    else:
+        incremental = not job.params.get("force") and bool(live_indices(es_client, CFA_INDEX_NAME))
+    previous_links = crawl_state.get(CFA_URL).get('links') or []
     
     print("--- 📡 STEP 1: Fetching Links from CFA ---")
-    links = get_breed_links()
+    job.report(stage="fetching links")
+    links = get_breed_links(conditional=incremental)
     
     if not links:
+        crawl_state.rollback([CFA_URL])
         print("❌ CRITICAL: No links found. CFA might be blocking the request.")
-        return jsonify({"error": "No breed links found. Check terminal logs."}), 500
+        return {"error": "No breed links found. Check terminal logs."}, 500
+    job.report(urls_total=len(links))
+    crawled_urls = [link['url'] for link in links]
 
-    print(f"✅ Found {len(links)} links. Proceeding to create index...")
+    def settle(settled_urls, success):
+        """Commits the crawl state of pages whose documents landed; the rest are retried next run."""
+        unsettled = [url for url in crawled_urls if url not in settled_urls]
+        # The link list (and so removed-page detection) only advances after a clean run.
+        crawl_state.rollback(unsettled if success else unsettled + [CFA_URL])
+        crawl_state.commit(list(settled_urls) + ([CFA_URL] if success else []))
 
-    try:
-        if es_client.indices.exists(index=CFA_INDEX_NAME):
-            es_client.indices.delete(index=CFA_INDEX_NAME)
-        
-        es_client.indices.create(index=CFA_INDEX_NAME, body=cfa_index_body)
-    except Exception as e:
-        return jsonify({"error": f"Index creation failed: {e}"}), 500
+    if incremental:
+        job.set_index(CFA_INDEX_NAME, mode="incremental")
+        current_urls = {link['url'] for link in links}
+        removed_urls = [link['url'] for link in previous_links if link['url'] not in current_urls]
+        print(f"--- 📥 STEP 2: Incremental refresh of {len(links)} breeds ({len(removed_urls)} removed) ---")
+        try:
+            stats, settled_urls = upload_cfa_to_es(links, CFA_INDEX_NAME, conditional=True, removed_urls=removed_urls,
+                                                   csv_file=CFA_DETAILED_CSV_FILE, job=job)
+        except Exception as e:
+            crawl_state.rollback(crawled_urls + [CFA_URL])
+            return {"error": f"CFA Indexing failed: {e}"}, 500
+        count = stats.successes
+        settle(settled_urls, success=not stats.error_count)
+        if count:
+            notify_alias_updated(CFA_INDEX_NAME, CFA_INDEX_NAME)
+        if stats.error_count:
+            print(f"🚨 CFA Bulk Ingestion Errors: {stats.error_count}")
+            return {"error": "CFA bulk ingestion encountered errors; failed pages will be retried.",
+                    "mode": "incremental", **stats.as_dict()}, 500
+        print(f"🎉 SUCCESS: Updated {count} changed breeds in place.")
+        return {
+            "status": "success" if count else UNCHANGED,
+            "mode": "incremental",
+            "message": f"Re-indexed {count} changed or removed breeds from CFA."
+        }, 200
+
+    if new_index:
+        print(f"⏯️ Resuming into '{new_index}' ({job.progress.get('checkpointed', 0)} breeds already done).")
+    else:
+        print(f"✅ Found {len(links)} links. Proceeding to create index...")
+        try:
+            new_index = create_generation(es_client, CFA_INDEX_NAME, body=cfa_index_body)
+        except Exception as e:
+            crawl_state.rollback(crawled_urls + [CFA_URL])
+            return {"error": f"Index creation failed: {e}"}, 500
+        job.set_index(new_index, mode="full")
     
     print("--- 📥 STEP 2: Scraping Details & Ingesting to ES ---")
-    count = upload_cfa_to_es(links, CFA_INDEX_NAME)
+    try:
+        stats, settled_urls = upload_cfa_to_es(links, new_index, csv_file=CFA_DETAILED_CSV_FILE, job=job)
+        if stats.error_count:
+            discard_generation(es_client, new_index)
+            job.reset_checkpoint()
+            crawl_state.rollback(crawled_urls + [CFA_URL])
+            print(f"🚨 CFA Bulk Ingestion Errors: {stats.error_count}")
+            return {"error": "CFA bulk ingestion encountered errors; the live CFA index was left unchanged.",
+                    **stats.as_dict()}, 500
+        # Counted in the index itself, so breeds written by an earlier attempt are included.
+        count = es_client.count(index=new_index)['count']
+        if not count:
+            discard_generation(es_client, new_index)
+            job.reset_checkpoint()
+            crawl_state.rollback(crawled_urls + [CFA_URL])
+            return {"error": "No breeds were indexed; the live CFA index was left unchanged."}, 500
+
+        print("--- 🔀 STEP 3: Swapping alias to the new generation ---")
+        job.report(stage="swapping")
+        swap_alias(es_client, CFA_INDEX_NAME, new_index)
+    except Exception as e:
+        # The half-built generation and its checkpoint are kept so the job can be resumed.
+        crawl_state.rollback(crawled_urls + [CFA_URL])
+        return {"error": f"CFA Indexing failed: {e}", "resumable": True}, 500
+    settle(settled_urls, success=True)
     print(f"🎉 SUCCESS: Indexed {count} breeds.")
     
-    return jsonify({
+    return {
         "status": "success", 
+        "mode": "full",
+        "index": new_index,
         "message": f"Scraped and indexed {count} breeds from CFA."
-    })
+    }, 200
 
-@app.route('/search_cfa', methods=['GET'])
-def search_cfa():
-    query = request.args.get('q', '')
-    if not query:
-        return jsonify([])
-    
+def load_cfa_data_from_csv(filename):
+    """Streams breed documents from the detailed CFA records (navigation pages and repeats dropped)."""
     try:
-        res = es_client.search(index=CFA_INDEX_NAME, body={
-            "query": {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["name^5", "description"],
-                    "type": "best_fields",
-                    "fuzziness": "AUTO" # This helps if you search "breeds" vs "breed"
-                }
+        yield from cfa_filter().filter(
+            {"name": row['name'], "url": row['url'], "description": row.get('description', '')}
+            for row in read_records(filename, CFA_SCHEMA)
+        )
+    except FileNotFoundError:
+        print(f"🚨 CRITICAL ERROR: Scraped data file '{filename}' not found. Run /index_cfa!")
+
+def build_cfa_query(query):
+    """Search body for the CFA index: priority on the breed name, tolerant of typos."""
+    return {
+        "query": {
+            "multi_match": {
+                "query": query,
+                "fields": ["name^5", "description"], # Priority on Name
+                "type": "best_fields",
+                "fuzziness": "AUTO" # This helps if you search "breeds" vs "breed"
             }
-        })
-        results = [hit['_source'] for hit in res['hits']['hits']]
-        return jsonify(results)
-    except Exception as e:
-        return jsonify([])
+        },
+        "_source": ["name", "url"], # scraped_at is bookkeeping; description comes back as a snippet
+        "highlight": highlight_clause("description", highlighter=snippet_highlighter(CFA_INDEX_NAME, "description"))
+    }
+
+def format_cfa_hits(hits):
+    """Breed name and URL plus the query-relevant part of its description."""
+    return [{**hit['_source'], "description": snippet_from_hit(hit, 'description')} for hit in hits]
+
+def build_facts_query(query, size=5):
+    """Search body for the Wikipedia/article index."""
+    return {
+        "query": {
+            "multi_match": {
+                "query": query,
+                "fields": ["title^3", "section^2", "body_text"],
+                "type": "best_fields"
+            }
+        },
+        "size": size,
+        "_source": ["title", "url", "section"], # The full passage never leaves ES
+        "highlight": highlight_clause("body_text", highlighter=snippet_highlighter(INDEX_NAME, "body_text"))
+    }
+
+def format_facts_hits(hits):
+    return [{**hit['_source'], "snippet": snippet_from_hit(hit, 'body_text')} for hit in hits]
+
+@app.route('/search_cfa', methods=['GET'])
+def search_cfa():
+    return serve_search(cfa_route(request.args))
+
+# Per-source budget for /api/search_all; a slow source returns what it has instead of stalling the rest.
+SEARCH_ALL_SOURCE_TIMEOUT = os.getenv("SEARCH_ALL_SOURCE_TIMEOUT", "2s")
+SEARCH_ALL_REQUEST_TIMEOUT = float(os.getenv("SEARCH_ALL_REQUEST_TIMEOUT", "10"))
+
+def search_all_sources(query):
+    """(result key, index, search body, hit formatter) for every source in /api/search_all."""
+    return [
+        ("breeds", CFA_INDEX_NAME, build_cfa_query(query), format_cfa_hits),
+        ("facts", INDEX_NAME, build_facts_query(query), format_facts_hits),
+        ("memes", REDDIT_INDEX_NAME, build_reddit_query(query), format_reddit_hits),
+    ]
+
+def paged_sources(sources):
+    """(key, index, body) triples for msearch_pages, each body carrying the per-source timeout."""
+    return [(key, index, {**body, "timeout": SEARCH_ALL_SOURCE_TIMEOUT}) for key, index, body, _ in sources]
+
+def merge_msearch_responses(sources, responses):
+    """Returns (payload, cacheable): formatted hits per source plus partial-result reporting."""
+    payload = {key: [] for key, _, _, _ in sources}
+    errors = {}
+    timed_out = []
+    for (key, _, _, format_hits), response in zip(sources, responses):
+        if 'error' in response:
+            error = response['error']
+            errors[key] = error.get('reason', str(error)) if isinstance(error, dict) else str(error)
+            print(f"Error searching {key}: {errors[key]}")
+            continue
+        if response.get('timed_out'):
+            timed_out.append(key)
+        payload[key] = format_hits(response['hits']['hits'])
+
+    # Partial-result reporting: sources that failed or ran out of time are listed explicitly.
+    payload["partial"] = bool(errors or timed_out)
+    if errors:
+        payload["errors"] = errors
+    if timed_out:
+        payload["timed_out"] = timed_out
+    # Only complete answers are cached, so a transient failure is retried next time.
+    return payload, not payload["partial"]
 
 @app.route('/api/search_all', methods=['GET'])
 def search_all():
-    query = request.args.get('q', '')
-    if not query:
-        return jsonify({"breeds": [], "facts": [], "memes": []})
+    return serve_search(search_all_route(request.args))
 
-    # Optimized CFA Search
-    try:
-        breed_res = es_client.search(index=CFA_INDEX_NAME, body={
-            "query": {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["name^5", "description"], # Priority on Name
-                    "fuzziness": "AUTO",                 # Handles minor typos
-                    "type": "best_fields"
-                }
-            }
-        })
-        # Debug: Print to terminal to see if ES is actually returning anything
-        print(f"CFA Results found: {breed_res['hits']['total']['value']}")
-        breeds = [hit['_source'] for hit in breed_res['hits']['hits']]
-    except Exception as e:
-        print(f"Error searching CFA index: {e}")
-        breeds = []
+# --------------------------------------------------------
+# LOCAL SEARCH ENGINE (SEARCH_BACKEND=local)
+# --------------------------------------------------------
+def local_sources():
+    """alias -> (document loader, full-text fields, id field), mirroring what each /index_* route ingests."""
+    return {
+        INDEX_NAME: (load_article_passages, ["title", "section", "body_text"], "passage_id"),
+        REDDIT_INDEX_NAME: (lambda: load_reddit_data_from_csv(REDDIT_CSV_FILE), ["title", "scraped_content"], None),
+        CFA_INDEX_NAME: (lambda: load_cfa_data_from_csv(CFA_DETAILED_CSV_FILE), ["name", "description"], "url"),
+    }
 
-    # Facts search (uses the Wikipedia/article index)
-    facts = []
-    try:
-        if es_client.indices.exists(index=INDEX_NAME):
-            facts_res = es_client.search(
-                index=INDEX_NAME,
-                body={
-                    "query": {
-                        "multi_match": {
-                            "query": query,
-                            "fields": ["title^3", "body_text", "snippet"],
-                            "type": "best_fields"
-                        }
-                    },
-                    "size": 5,
-                    "_source": ["title", "url", "snippet", "body_text"]
-                }
-            )
-            facts = [hit['_source'] for hit in facts_res['hits']['hits']]
-    except Exception as e:
-        print(f"Error searching facts index: {e}")
-        facts = []
+def build_local_index(alias, new_index=None):
+    """Rebuilds alias in the local engine from its scraped records; runs as an alias swap listener."""
+    loader, text_fields, id_field = local_sources()[alias]
+    local_engine.build(alias, loader(), text_fields, id_field)
+    # The cache was already invalidated by the swap, but may have refilled from the old local index.
+    query_cache.invalidate_alias(alias)
 
-    # 3. Search Reddit Memes
-    memes = search_reddit_memes(query)
+def start_local_engine():
+    """Opens the local indices built by an earlier run, building any that are missing."""
+    for alias in local_sources():
+        if not local_engine.load(alias):
+            build_local_index(alias)
+
+if SEARCH_BACKEND == "local":
+    start_local_engine()
+    on_alias_swap(build_local_index)
+
+# --------------------------------------------------------
+# TYPE-AHEAD SUGGESTIONS
+# --------------------------------------------------------
+def suggestion_sources():
+    """alias -> (suggest source name, loader of the texts to complete)."""
+    return {
+        CFA_INDEX_NAME: ("breeds", lambda: (doc['name'] for doc in load_cfa_data_from_csv(CFA_DETAILED_CSV_FILE))),
+        INDEX_NAME: ("facts", lambda: (doc['section'] for doc in load_article_passages())),
+        REDDIT_INDEX_NAME: ("memes", lambda: (doc['title'] for doc in load_reddit_data_from_csv(REDDIT_CSV_FILE))),
+    }
+
+def refresh_suggestions(alias, new_index=None):
+    """Rebuilds one source's completions; runs as an alias swap listener so reindexing refreshes them."""
+    source, load_texts = suggestion_sources()[alias]
+    suggester.set_source(source, load_texts())
+
+for suggest_alias in suggestion_sources():
+    refresh_suggestions(suggest_alias)
+on_alias_swap(refresh_suggestions)
+# Swaps made by another worker process (e.g. the one that ran /index_*) reach this one too.
+watch_alias_updates()
+
+@app.route('/suggest', methods=['GET'])
+def suggest_endpoint():
+    """Prefix completions over breed names, article section titles and Reddit titles (?q=mai&limit=5)."""
+    query, limit, sources = suggest_args(request.args)
+    return search_response('/suggest', query, (limit, sources), list(suggestion_sources()),
+                           lambda: suggest_compute(query, limit, sources))
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Last result of the background Elasticsearch health check."""
+    if SEARCH_BACKEND == "local":
+        # Searches don't touch Elasticsearch in this mode, so its health doesn't fail the check.
+        return jsonify({**health_status, "search_backend": "local", "local_indices": local_engine.stats()})
+    status_code = 503 if health_status["healthy"] is False else 200
+    return jsonify(health_status), status_code
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the in-process query result cache."""
+    return jsonify(query_cache.stats())
+
+# --- INDEXING JOBS ---
+job_store.register("index_data", run_index_data)
+job_store.register("index_reddit", run_index_reddit)
+job_store.register("index_cfa", run_index_cfa)
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify([job.as_dict() for job in job_store.list()])
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status, stage, progress (docs ok/errors, chunks, docs/sec, URLs checkpointed) and result of one job."""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.as_dict())
+
+@app.route('/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    """Restarts a failed or interrupted job from its last checkpoint."""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    if not job_store.resume(job):
+        return jsonify({"error": "Job is not resumable right now (not failed/interrupted, or another run is active).",
+                        **job.as_dict()}), 409
+    return jsonify({"job_id": job.id, "status": "queued", "status_url": f"/jobs/{job.id}"}), 202
+
+# --- METRICS ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Route templates, not raw paths, keep the label set bounded.
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
+
+def collect_cache_metrics():
+    observe_cache("query", query_cache.hits, query_cache.misses)
+    # A 304 is the cheapest possible hit, so it counts as one.
+    observe_cache("response", rendered_cache.hits + rendered_cache.not_modified, rendered_cache.misses)
+
+registry.add_collector(collect_cache_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape target (text exposition format)."""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
 
-    return jsonify({
-        "breeds": breeds,
-        "facts": facts,
-        "memes": memes
-    })
-    
 @app.route('/debug_cfa', methods=['GET'])
 def debug_cfa():
     try:
         # Ask ES for every document in the CFA index
-        res = es_client.search(index=CFA_INDEX_NAME, body={"query": {"match_all": {}}, "size": 10})
-        count = es_client.count(index=CFA_INDEX_NAME)['count']
+        search_client = get_search_client()
+        res = search_client.search(index=CFA_INDEX_NAME, body={"query": {"match_all": {}}, "size": 10})
+        count = search_client.count(index=CFA_INDEX_NAME)['count']
         
         return jsonify({
             "total_documents_in_index": count,
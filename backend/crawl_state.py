@@ -0,0 +1,101 @@
+"""
+Persistent per-URL crawl state: ETag, Last-Modified and a content hash.
+Used to send conditional GETs and to skip parsing/reindexing pages that haven't changed.
+
+New observations are held as "pending" until the caller commits them (after the
+data has actually been indexed), so a failed run never hides a change from the next one.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+CRAWL_STATE_FILE = os.getenv("CRAWL_STATE_FILE", "crawl_state.json")
+
+# Returned by scrapers when nothing changed since the last committed crawl.
+UNCHANGED = "unchanged"
+
+
+def content_hash(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+class CrawlState:
+    def __init__(self, filename=CRAWL_STATE_FILE):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._committed = self._load()
+        self._pending = {}
+
+    def _load(self):
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Could not read crawl state '{self.filename}', starting fresh: {e}")
+            return {}
+
+    def get(self, url):
+        with self._lock:
+            return dict(self._committed.get(url, {}))
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for the last committed fetch of url."""
+        entry = self.get(url)
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, url, headers, digest, extra=None):
+        """Stores a fresh observation as pending; returns True if the content changed."""
+        with self._lock:
+            previous = self._committed.get(url, {})
+            entry = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'content_hash': digest,
+                'fetched_at': datetime.now().isoformat(),
+            }
+            entry.update({k: v for k, v in previous.items() if k not in entry})
+            if extra:
+                entry.update(extra)
+            self._pending[url] = entry
+            return previous.get('content_hash') != digest
+
+    def set_extra(self, url, **extra):
+        """Attaches derived data (e.g. the parsed link list of an index page) to url's pending entry."""
+        with self._lock:
+            entry = self._pending.get(url) or dict(self._committed.get(url, {}))
+            entry.update(extra)
+            self._pending[url] = entry
+
+    def commit(self, urls=None):
+        """Promotes pending entries (all, or only `urls`) and writes the state file."""
+        with self._lock:
+            keys = list(self._pending) if urls is None else [u for u in urls if u in self._pending]
+            for url in keys:
+                self._committed[url] = self._pending.pop(url)
+            snapshot = json.dumps(self._committed, indent=1)
+        tmp_name = f"{self.filename}.tmp"
+        with open(tmp_name, 'w', encoding='utf-8') as f:
+            f.write(snapshot)
+        os.replace(tmp_name, self.filename)
+
+    def rollback(self, urls=None):
+        with self._lock:
+            if urls is None:
+                self._pending.clear()
+            else:
+                for url in urls:
+                    self._pending.pop(url, None)
+
+
+crawl_state = CrawlState()
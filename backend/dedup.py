@@ -0,0 +1,209 @@
+"""
+Ingestion-time boilerplate and near-duplicate suppression, shared by every indexer.
+
+Documents pass through a DedupFilter on their way to the bulk pipeline:
+
+- a rule-based boilerplate classifier spots bodies that are scraper placeholders
+  ("Content area not found."), leaked fetch errors or stock editorial lines. Such a
+  document is dropped, except that a filter built with keep_titled (CFA) keeps one
+  whose title is a real name ("Bengal") rather than a menu label ("HOME", "Top Cats"),
+  with an empty body, deduplicated on its URL/title;
+- a 64-bit SimHash of each document's word shingles is looked up in an in-memory
+  LSH index (SIMHASH_BANDS bands of the fingerprint, one hash table per band).
+  Any fingerprint within SIMHASH_MAX_DISTANCE bits must share a band, so candidate
+  lookup is a few dict hits instead of a scan, and the first copy wins.
+
+The index lives for one ingestion run; every generation is rebuilt from a full
+stream, so that is enough to keep repeats out of the index.
+"""
+import hashlib
+import os
+import re
+from collections import Counter
+
+from metrics import INGEST_FILTERED
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = int(os.getenv("SIMHASH_BANDS", "4"))
+# Must stay below SIMHASH_BANDS, or near-duplicates could differ in every band.
+SIMHASH_MAX_DISTANCE = min(int(os.getenv("SIMHASH_MAX_DISTANCE", "3")), SIMHASH_BANDS - 1)
+SHINGLE_WORDS = 3
+
+WORD_RE = re.compile(r"\w+")
+PLACEHOLDER_TEXTS = {"content area not found.", "description currently unavailable.", "no description found."}
+# Leaked exception text, e.g. "Error: HTTPSConnectionPool(host=...): Max retries exceeded ..."
+FETCH_ERROR_RE = re.compile(r"^error:\s|max retries exceeded|connectionpool\(", re.IGNORECASE)
+# Stock lines that appear on every page of a site; only short texts are checked against these.
+BOILERPLATE_PHRASES_RE = re.compile(
+    r"our editors will review what you.ve submitted|all rights reserved|thank you for your feedback"
+    r"|this article was most recently revised|cookie (policy|settings)|sign up for our newsletter",
+    re.IGNORECASE,
+)
+BOILERPLATE_PHRASE_MAX_CHARS = 300
+# Reasons whose body is scraper junk rather than (short) real text.
+JUNK_REASONS = {"placeholder", "fetch_error", "boilerplate_phrase"}
+# Menu labels scraped as if they were pages, compared as normalized_key()s. All-caps titles
+# and titles without letters ("2024-25") count as labels too.
+NAVIGATION_LABELS = {
+    "home", "about", "about us", "contact", "contact us", "login", "log in", "menu", "search", "news",
+    "resources", "special offers", "ecat login", "breeds", "registration", "shows events", "top cats",
+    "top cats gallery", "top kittens", "top cats in premiership", "top household pets", "national winners",
+    "breed winners", "grands", "grands of distinction", "regions 1 9", "china", "international",
+    "find a breeder website advertising", "breed council secretary candidates", "2024 breed council ballots",
+    "acceptance of new breeds and colors", "registering a cat for outcross breeding",
+    "using cattrack litters on ecat", "entering a show", "archives show counts",
+    "annual meeting awards ceremony", "international show expo", "cfa show catalog forms",
+    "judges emeritus", "judges association spotlight recipients", "cfa bylaws", "cfa timetable",
+    "abusive conduct prevention policy", "conflict of interest policy", "health welfare policy",
+    "whistleblower policy", "apply for a new club", "current club applicants", "breeder code of ethics",
+    "breed color prefix chart", "cfa newsletter archives", "grand points lookup herman",
+    "cfa our programs", "breeders exhibitors",
+}
+
+
+def boilerplate_reason(title, body, min_words=1):
+    """Why the body of a (title, body) pair is boilerplate, or None if it looks like real content."""
+    body = " ".join(str(body or "").split())
+    if body.lower() in PLACEHOLDER_TEXTS:
+        return "placeholder"
+    if FETCH_ERROR_RE.search(body[:200]):
+        return "fetch_error"
+    if len(body) <= BOILERPLATE_PHRASE_MAX_CHARS and BOILERPLATE_PHRASES_RE.search(body):
+        return "boilerplate_phrase"
+    if len(WORD_RE.findall(body)) < min_words:
+        # A navigation label ("HOME", "CAT TALK") or an untitled post with nothing else to it.
+        return "navigation" if title and str(title).isupper() else "too_short"
+    return None
+
+
+def navigation_like(title, labels=NAVIGATION_LABELS):
+    """A title that is only a menu label: all caps, one of labels, or without any letters."""
+    title = str(title or "")
+    return title.isupper() or not re.search(r"[^\W\d_]", title) or normalized_key(title) in labels
+
+
+def normalized_key(text):
+    return " ".join(WORD_RE.findall(str(text).lower()))
+
+
+# --- SIMHASH + LSH ---
+def shingles(text, size=SHINGLE_WORDS):
+    words = WORD_RE.findall(str(text).lower())
+    size = max(1, min(size, len(words)))
+    return Counter(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def simhash(text):
+    """64-bit SimHash over weighted word shingles; similar texts differ in few bits."""
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in shingles(text).items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class SimHashIndex:
+    """In-memory LSH over SimHash fingerprints: one bucket table per band of bits."""
+
+    def __init__(self, bands=SIMHASH_BANDS, max_distance=SIMHASH_MAX_DISTANCE):
+        self.bands = bands
+        self.max_distance = max_distance
+        self.band_bits = SIMHASH_BITS // bands
+        self._tables = [{} for _ in range(bands)]
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def find(self, fingerprint):
+        """A stored fingerprint within max_distance bits, or None."""
+        for table, key in zip(self._tables, self._band_keys(fingerprint)):
+            for candidate in table.get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, fingerprint):
+        for table, key in zip(self._tables, self._band_keys(fingerprint)):
+            table.setdefault(key, []).append(fingerprint)
+
+
+class DedupFilter:
+    """
+    Drops boilerplate and near-duplicate documents for one ingestion run.
+    title_field/body_field name the document's fields; with no body_field the title is the text.
+    key_field (e.g. the URL) identifies a document exactly; repeats of a key are dropped too.
+    keep_titled keeps a document with a junk body if its title isn't a menu label.
+    """
+
+    def __init__(self, label, title_field, body_field=None, min_words=1, key_field=None, keep_titled=False):
+        self.label = label
+        self.title_field = title_field
+        self.body_field = body_field
+        self.min_words = min_words
+        self.key_field = key_field
+        self.keep_titled = keep_titled
+        self.index = SimHashIndex()
+        self._keys = set()
+        self.kept = 0
+        self.dropped = Counter()
+
+    def check(self, doc):
+        """
+        None if doc should be indexed, else the reason it is dropped (the doc is remembered if kept).
+        A kept document whose body is boilerplate has that body blanked in place.
+        """
+        title = doc.get(self.title_field) or ""
+        body = doc.get(self.body_field) if self.body_field else title
+        keys = {normalized_key(doc.get(self.key_field) or "")} if self.key_field else set()
+        reason = boilerplate_reason(title, body, self.min_words)
+        if reason is not None and self.keep_titled and self.body_field and not navigation_like(title):
+            # Real title, useless (or just short) body: keep it, deduplicated on its title and key alone.
+            if reason in JUNK_REASONS:
+                doc[self.body_field] = ""
+            keys.add(normalized_key(title))
+            reason = "duplicate" if keys & self._keys else None
+        elif reason is None:
+            fingerprint = simhash(f"{title} {body}" if self.body_field else body)
+            if keys & self._keys or self.index.find(fingerprint) is not None:
+                reason = "near_duplicate"
+            else:
+                self.index.add(fingerprint)
+        if reason is None:
+            self._keys.update(key for key in keys if key)
+        if reason:
+            self.dropped[reason] += 1
+            INGEST_FILTERED.inc(label=self.label, reason=reason)
+        else:
+            self.kept += 1
+        return reason
+
+    def filter(self, documents):
+        """Yields only the documents check() keeps, then reports what was dropped."""
+        for doc in documents:
+            if self.check(doc) is None:
+                yield doc
+        self.report()
+
+    def report(self):
+        if self.dropped:
+            details = ", ".join(f"{count} {reason}" for reason, count in self.dropped.most_common())
+            print(f"🧹 [{self.label}] Kept {self.kept} documents; dropped {sum(self.dropped.values())} ({details}).")
+
+
+# The same field layout for every indexer that reads a given kind of document.
+def article_filter():
+    return DedupFilter("Articles", "section", "body_text", min_words=8, key_field="passage_id")
+
+
+def reddit_filter():
+    return DedupFilter("Reddit", "title", key_field="source_url")
+
+
+def cfa_filter():
+    return DedupFilter("CFA", "name", "description", min_words=8, key_field="url", keep_titled=True)
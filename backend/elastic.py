@@ -0,0 +1,120 @@
+"""
+Single, long-lived Elasticsearch client for the whole process.
+The client owns a tuned HTTP connection pool with retries and timeouts; health
+is checked by a background thread so no request ever pays for a ping.
+"""
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+
+try:
+    from elasticsearch import AsyncElasticsearch # needs the aiohttp extra: elasticsearch[async]
+except ImportError:
+    AsyncElasticsearch = None
+
+load_dotenv()
+
+# --- ELASTICSEARCH CONNECTION CONFIGURATION ---
+# ELASTIC_HOSTS is a comma-separated list for multi-node clusters; ELASTIC_HOST_URL is the single-host fallback.
+ELASTIC_HOSTS = os.getenv("ELASTIC_HOSTS") or os.getenv("ELASTIC_HOST_URL") or ""
+ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "10"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "3"))
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "25"))
+ES_HEALTH_CHECK_INTERVAL = float(os.getenv("ES_HEALTH_CHECK_INTERVAL", "30"))
+
+
+def host_list(hosts=ELASTIC_HOSTS):
+    """Turns 'a.example.com, https://b:9200' into full URLs (https is assumed when missing)."""
+    urls = []
+    for host in hosts.split(','):
+        host = host.strip()
+        if host:
+            urls.append(host if "://" in host else f"https://{host}")
+    return urls
+
+
+def client_options():
+    hosts = host_list()
+    if not hosts:
+        raise ValueError("No Elasticsearch hosts configured (set ELASTIC_HOSTS or ELASTIC_HOST_URL).")
+    return dict(
+        hosts=hosts,
+        api_key=ELASTIC_API_KEY,
+        request_timeout=ES_REQUEST_TIMEOUT,
+        max_retries=ES_MAX_RETRIES,
+        retry_on_timeout=True,
+        retry_on_status=(429, 502, 503, 504),
+        connections_per_node=ES_CONNECTIONS_PER_NODE,
+        http_compress=True,
+    )
+
+
+def create_client():
+    """Builds the pooled client. No network traffic happens here."""
+    return Elasticsearch(**client_options())
+
+
+def create_async_client():
+    """
+    Same pool settings on the asyncio transport, for the ASGI serving path (async_app.py).
+    Must be created inside the event loop that will use it.
+    """
+    if AsyncElasticsearch is None:
+        raise ImportError("The async client needs aiohttp: pip install 'elasticsearch[async]'")
+    return AsyncElasticsearch(**client_options())
+
+
+_client = None
+_client_lock = threading.Lock()
+health_status = {"healthy": None, "last_checked": None, "last_error": None}
+
+
+def get_client():
+    """Returns the process-wide client, creating it on first use (None if misconfigured)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = create_client()
+                    print(f"Elasticsearch client created for {len(host_list())} host(s).")
+                except Exception as e:
+                    print(f"Error initializing Elasticsearch client: {e}")
+    return _client
+
+
+def check_health():
+    client = get_client()
+    try:
+        healthy = bool(client and client.options(request_timeout=5).ping())
+        health_status["last_error"] = None if healthy else "Ping failed, check credentials."
+    except Exception as e:
+        healthy = False
+        health_status["last_error"] = str(e)
+    if healthy != health_status["healthy"]:
+        print("Elasticsearch is reachable." if healthy else f"Elasticsearch unhealthy: {health_status['last_error']}")
+    health_status["healthy"] = healthy
+    health_status["last_checked"] = time.time()
+    return healthy
+
+
+_health_thread = None
+
+
+def start_health_checks(interval=ES_HEALTH_CHECK_INTERVAL):
+    """Pings the cluster every `interval` seconds on a daemon thread (idempotent)."""
+    global _health_thread
+    if _health_thread is not None:
+        return
+
+    def loop():
+        while True:
+            check_health()
+            time.sleep(interval)
+
+    _health_thread = threading.Thread(target=loop, name="es-health-check", daemon=True)
+    _health_thread.start()
@@ -0,0 +1,448 @@
+"""
+Minimal Elasticsearch-compatible HTTP server for local benchmarks and offline runs.
+
+It implements just the REST surface connect_db.py uses (index create/delete/get,
+aliases, _bulk, _refresh, _search, _msearch, _count, _pit) with an in-memory store and
+simple term-frequency scoring. It is a stand-in for measuring the Flask layer,
+not a faithful model of Elasticsearch relevance or performance.
+
+    python es_standin.py --port 9200
+"""
+import argparse
+import fnmatch
+import gzip
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+from snippets import highlight_source
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class StandinError(Exception):
+    def __init__(self, status, error_type, reason):
+        super().__init__(reason)
+        self.status = status
+        self.body = {"error": {"type": error_type, "reason": reason}, "status": status}
+
+
+class Store:
+    """Indices, aliases and documents, guarded by one lock."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.indices = {}   # name -> {"docs": {id: source}, "mappings": {...}, "settings": {...}}
+        self.aliases = {}   # alias -> set(index names)
+        self.pits = {}      # point-in-time id -> (index names, snapshot of their docs)
+        self.next_id = 0
+
+    # --- NAME RESOLUTION ---
+    def resolve(self, expression, ignore_unavailable=False):
+        names = []
+        for part in expression.split(','):
+            part = part.strip()
+            if not part or part == '_all':
+                names.extend(self.indices)
+            elif '*' in part:
+                names.extend(n for n in self.indices if fnmatch.fnmatch(n, part))
+                for alias, targets in self.aliases.items():
+                    if fnmatch.fnmatch(alias, part):
+                        names.extend(targets)
+            elif part in self.aliases:
+                names.extend(self.aliases[part])
+            elif part in self.indices:
+                names.append(part)
+            elif not ignore_unavailable:
+                raise StandinError(404, "index_not_found_exception", f"no such index [{part}]")
+        return sorted(set(names))
+
+    # --- INDEX MANAGEMENT ---
+    def create_index(self, name, body):
+        if name in self.indices or name in self.aliases:
+            raise StandinError(400, "resource_already_exists_exception", f"index [{name}] already exists")
+        self.indices[name] = {
+            "docs": {},
+            "mappings": (body or {}).get("mappings", {}),
+            "settings": (body or {}).get("settings", {}),
+        }
+        return {"acknowledged": True, "shards_acknowledged": True, "index": name}
+
+    def delete_index(self, expression):
+        for name in self.resolve(expression):
+            self.indices.pop(name, None)
+            for targets in self.aliases.values():
+                targets.discard(name)
+        self.aliases = {a: t for a, t in self.aliases.items() if t}
+        return {"acknowledged": True}
+
+    def update_aliases(self, actions):
+        for action in actions:
+            (op, spec), = action.items()
+            if op == "add":
+                self.aliases.setdefault(spec["alias"], set()).add(spec["index"])
+            elif op == "remove":
+                self.aliases.get(spec["alias"], set()).discard(spec["index"])
+            elif op == "remove_index":
+                self.delete_index(spec["index"])
+        self.aliases = {a: t for a, t in self.aliases.items() if t}
+        return {"acknowledged": True}
+
+    def write_index(self, name):
+        if name in self.aliases:
+            targets = self.aliases[name]
+            if len(targets) != 1:
+                raise StandinError(400, "illegal_argument_exception", f"alias [{name}] has no single write index")
+            return next(iter(targets))
+        if name not in self.indices:
+            self.create_index(name, {})
+        return name
+
+    # --- DOCUMENTS ---
+    def bulk(self, lines):
+        items, errors = [], False
+        i = 0
+        while i < len(lines):
+            (op, meta), = lines[i].items()
+            i += 1
+            index = self.write_index(meta["_index"])
+            doc_id = meta.get("_id")
+            if op == "delete":
+                found = self.indices[index]["docs"].pop(doc_id, None) is not None
+                items.append({op: {"_index": index, "_id": doc_id, "status": 200 if found else 404,
+                                   "result": "deleted" if found else "not_found"}})
+                continue
+            source = lines[i]
+            i += 1
+            if op == "update":
+                existing = self.indices[index]["docs"].get(doc_id, {})
+                source = {**existing, **source.get("doc", {})}
+            if doc_id is None:
+                self.next_id += 1
+                doc_id = f"standin-{self.next_id}"
+            self.indices[index]["docs"][doc_id] = source
+            items.append({op: {"_index": index, "_id": doc_id, "status": 201, "result": "created"}})
+        return {"took": 0, "errors": errors, "items": items}
+
+    def all_docs(self, names):
+        for name in names:
+            for doc_id, source in self.indices[name]["docs"].items():
+                yield name, doc_id, source
+
+    # --- SEARCH ---
+    def open_pit(self, expression, ignore_unavailable=False):
+        names = self.resolve(expression, ignore_unavailable)
+        self.next_id += 1
+        pit_id = f"standin-pit-{self.next_id}"
+        self.pits[pit_id] = (names, list(self.all_docs(names)))
+        return {"id": pit_id}
+
+    def close_pit(self, pit_id):
+        found = self.pits.pop(pit_id, None) is not None
+        return {"succeeded": found, "num_freed": int(found)}
+
+    def search(self, expression, body, ignore_unavailable=False):
+        started = time.perf_counter()
+        body = body or {}
+        if "pit" in body:
+            pit_id = body["pit"]["id"]
+            if pit_id not in self.pits:
+                raise StandinError(404, "search_context_missing_exception", f"No search context found for id [{pit_id}]")
+            names, docs = self.pits[pit_id]
+        else:
+            names = self.resolve(expression, ignore_unavailable)
+            docs = list(self.all_docs(names))
+        query = body.get("query", {"match_all": {}})
+        stats = FieldStats(docs)
+
+        # Sorted by score, then by position in the (snapshotted) doc list, standing in for _shard_doc.
+        scored = []
+        for position, (index, doc_id, source) in enumerate(docs):
+            score = score_query(query, source, stats)
+            if score is not None:
+                scored.append((score, position, index, doc_id, source))
+        scored.sort(key=lambda hit: (-hit[0], hit[1]))
+        total = len(scored)
+        if body.get("search_after"):
+            after_score, after_position = body["search_after"][:2]
+            scored = [hit for hit in scored if (-hit[0], hit[1]) > (-after_score, after_position)]
+
+        start = int(body.get("from", 0))
+        size = int(body.get("size", 10))
+        hits = []
+        for score, position, index, doc_id, source in scored[start:start + size]:
+            hit = {
+                "_index": index,
+                "_id": doc_id,
+                "_score": score,
+                "_source": filter_source(source, body.get("_source", True)),
+            }
+            if "highlight" in body:
+                hit["highlight"] = highlight_source(source, body, tokenize)
+            if "sort" in body:
+                hit["sort"] = [score, position]
+            hits.append(hit)
+        response = {
+            "took": int((time.perf_counter() - started) * 1000),
+            "timed_out": False,
+            "_shards": {"total": len(names), "successful": len(names), "skipped": 0, "failed": 0},
+            "hits": {
+                "total": {"value": total, "relation": "eq"},
+                "max_score": scored[0][0] if scored else None,
+                "hits": hits,
+            },
+        }
+        if "pit" in body:
+            response["pit_id"] = body["pit"]["id"]
+        return response
+
+    def count(self, expression, body):
+        result = self.search(expression, {**(body or {}), "size": 0})
+        return {"count": result["hits"]["total"]["value"]}
+
+
+class FieldStats:
+    """Document frequencies per (field, term) for idf weighting."""
+
+    def __init__(self, docs):
+        self.doc_count = max(1, len(docs))
+        self._df = Counter()
+        self._docs = docs
+        self._fields_seen = set()
+
+    def idf(self, field, term):
+        if field not in self._fields_seen:
+            for _, _, source in self._docs:
+                for t in set(tokenize(field_value(source, field))):
+                    self._df[(field, t)] += 1
+            self._fields_seen.add(field)
+        df = self._df[(field, term)]
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+
+def field_value(source, field):
+    value = source
+    for part in field.split('.'):
+        if part == "keyword":
+            break
+        value = value.get(part, "") if isinstance(value, dict) else ""
+    return value if isinstance(value, str) else ("" if value is None else str(value))
+
+
+def score_field(text, terms, stats, field, operator="or"):
+    tokens = Counter(tokenize(text))
+    matched = [t for t in terms if tokens.get(t)]
+    if not matched or (operator == "and" and len(matched) < len(terms)):
+        return None
+    length_norm = 1.0 / math.sqrt(1 + sum(tokens.values()) / 50)
+    return sum((1 + math.log(tokens[t])) * stats.idf(field, t) for t in matched) * length_norm
+
+
+def score_query(query, source, stats):
+    """Returns a score, or None if the document does not match."""
+    (kind, spec), = query.items()
+    if kind == "match_all":
+        return 1.0
+    if kind == "match":
+        (field, params), = spec.items()
+        if not isinstance(params, dict):
+            params = {"query": params}
+        terms = tokenize(params.get("query", ""))
+        return score_field(field_value(source, field), terms, stats, field, params.get("operator", "or"))
+    if kind == "multi_match":
+        terms = tokenize(spec.get("query", ""))
+        best = None
+        for field_spec in spec.get("fields", []):
+            field, _, boost = field_spec.partition('^')
+            score = score_field(field_value(source, field), terms, stats, field, spec.get("operator", "or"))
+            if score is not None:
+                score *= float(boost or 1)
+                best = score if best is None else max(best, score)
+        return best
+    if kind == "term":
+        (field, value), = spec.items()
+        value = value.get("value") if isinstance(value, dict) else value
+        return 1.0 if field_value(source, field) == str(value) else None
+    if kind == "bool":
+        total = 0.0
+        for clause in spec.get("must", []) + spec.get("filter", []):
+            score = score_query(clause, source, stats)
+            if score is None:
+                return None
+            total += score
+        should = [score_query(c, source, stats) for c in spec.get("should", [])]
+        should = [s for s in should if s is not None]
+        if spec.get("should") and not should and not spec.get("must"):
+            return None
+        return total + sum(should)
+    raise StandinError(400, "parsing_exception", f"unknown query [{kind}]")
+
+
+def filter_source(source, includes):
+    if includes is True or includes is None:
+        return source
+    if includes is False:
+        return {}
+    if isinstance(includes, dict):
+        includes = includes.get("includes", list(source))
+    return {k: v for k, v in source.items() if k in includes}
+
+
+def parse_ndjson(raw):
+    return [json.loads(line) for line in raw.decode('utf-8').splitlines() if line.strip()]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    store = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip" and raw:
+            raw = gzip.decompress(raw)
+        return raw
+
+    def handle_any(self):
+        parsed = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        parts = [unquote(p) for p in parsed.path.strip('/').split('/') if p]
+        raw = self.read_body()
+        try:
+            with self.store.lock:
+                status, body = self.route(self.command, parts, params, raw)
+        except StandinError as e:
+            status, body = e.status, e.body
+        except Exception as e:
+            status, body = 500, {"error": {"type": "standin_exception", "reason": str(e)}, "status": 500}
+        self.send_json(status, body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = handle_any
+
+    def route(self, method, parts, params, raw):
+        store = self.store
+        json_body = json.loads(raw) if raw and not parts[-1:] in (["_bulk"], ["_msearch"]) else {}
+        ignore_unavailable = params.get("ignore_unavailable") == "true"
+
+        if not parts:
+            return 200, {"name": "es-standin", "cluster_name": "standin",
+                         "version": {"number": "8.13.0", "build_flavor": "default"},
+                         "tagline": "You Know, for Search"}
+        if parts == ["_bulk"] or parts[-1:] == ["_bulk"]:
+            lines = parse_ndjson(raw)
+            if len(parts) == 2:
+                for line in lines:
+                    for meta in line.values():
+                        if isinstance(meta, dict) and "_index" not in meta and len(line) == 1:
+                            meta["_index"] = parts[0]
+            return 200, store.bulk(lines)
+        if parts == ["_aliases"]:
+            return 200, store.update_aliases(json_body.get("actions", []))
+        if parts == ["_msearch"] or parts[-1:] == ["_msearch"]:
+            lines = parse_ndjson(raw)
+            responses = []
+            for header, body in zip(lines[0::2], lines[1::2]):
+                try:
+                    result = store.search(header.get("index", parts[0] if len(parts) == 2 else "_all"), body,
+                                          header.get("ignore_unavailable", False))
+                    result["status"] = 200
+                except StandinError as e:
+                    result = e.body
+                responses.append(result)
+            return 200, {"took": 0, "responses": responses}
+        if parts[0] == "_alias" and len(parts) == 2:
+            found = {i: {"aliases": {parts[1]: {}}} for i in store.aliases.get(parts[1], ())}
+            if not found:
+                raise StandinError(404, "aliases_not_found_exception", f"alias [{parts[1]}] missing")
+            return 200, found
+        if parts == ["_search"]:
+            return 200, store.search("_all", json_body)
+        if parts == ["_pit"] and method == "DELETE":
+            return 200, store.close_pit(json_body.get("id"))
+        if parts[0] == "_cluster" and parts[1:] == ["health"]:
+            return 200, {"status": "green", "number_of_nodes": 1}
+
+        index = parts[0]
+        if len(parts) == 1:
+            if method == "PUT":
+                return 200, store.create_index(index, json_body)
+            if method == "DELETE":
+                return 200, store.delete_index(index)
+            if method == "HEAD":
+                return (200, {}) if store.resolve(index, True) or index in store.indices else (404, {})
+            names = store.resolve(index, ignore_unavailable or params.get("allow_no_indices") == "true")
+            return 200, {n: {"aliases": {a: {} for a, t in store.aliases.items() if n in t},
+                             "mappings": store.indices[n]["mappings"],
+                             "settings": store.indices[n]["settings"]} for n in names}
+
+        action = parts[1]
+        if action == "_search":
+            return 200, store.search(index, json_body, ignore_unavailable)
+        if action == "_pit":
+            return 200, store.open_pit(index, ignore_unavailable)
+        if action == "_count":
+            return 200, store.count(index, json_body)
+        if action == "_refresh":
+            store.resolve(index, ignore_unavailable)
+            return 200, {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+        if action == "_mapping":
+            for name in store.resolve(index):
+                store.indices[name]["mappings"].setdefault("properties", {}).update(json_body.get("properties", {}))
+            return 200, {"acknowledged": True}
+        if action == "_settings":
+            return 200, {"acknowledged": True}
+        if action == "_doc" and len(parts) == 3:
+            target = store.write_index(index)
+            if method in ("PUT", "POST"):
+                store.indices[target]["docs"][parts[2]] = json_body
+                return 201, {"_index": target, "_id": parts[2], "result": "created"}
+            source = store.indices[target]["docs"].get(parts[2])
+            if source is None:
+                return 404, {"_index": target, "_id": parts[2], "found": False}
+            return 200, {"_index": target, "_id": parts[2], "found": True, "_source": source}
+        raise StandinError(400, "unsupported_operation", f"{method} /{'/'.join(parts)} is not supported by the stand-in")
+
+
+def start_standin(host="127.0.0.1", port=0):
+    """Starts the stand-in on a daemon thread and returns (server, base_url)."""
+    handler = type("BoundStandinHandler", (StandinHandler,), {"store": Store()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="es-standin", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local Elasticsearch stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+    server, url = start_standin(args.host, args.port)
+    print(f"🧪 Elasticsearch stand-in listening on {url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,259 @@
+"""
+Shared fetch engine for the scrapers: bounded concurrency plus a per-host
+token-bucket rate limit (replaces the old fixed time.sleep between requests),
+robots.txt rules cached per host (see robots.py), whose Crawl-delay /
+Request-rate cap that host's rate,
+conditional GETs backed by the persistent crawl state, record/replay
+through the on-disk HTTP archive (see http_archive.py), and long-lived pooled
+sessions so repeated requests to one host reuse their keep-alive connections.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from crawl_state import crawl_state, content_hash
+from http_archive import http_archive, recording, replaying
+from metrics import SCRAPER_FETCH_SECONDS, host_of
+from robots import robots_cache, RobotsDisallowed, ROBOTS_USER_AGENT
+
+# --- CRAWL CONFIGURATION ---
+CRAWL_MAX_WORKERS = int(os.getenv("CRAWL_MAX_WORKERS", "8"))
+# Requests per second allowed against any single host, and how many may burst at once.
+CRAWL_RATE_PER_HOST = float(os.getenv("CRAWL_RATE_PER_HOST", "5"))
+CRAWL_BURST_PER_HOST = int(os.getenv("CRAWL_BURST_PER_HOST", str(CRAWL_MAX_WORKERS)))
+# Set to 0 to skip robots.txt (e.g. against a local mirror).
+CRAWL_RESPECT_ROBOTS = os.getenv("CRAWL_RESPECT_ROBOTS", "1") != "0"
+
+# --- SESSION POOL CONFIGURATION ---
+# Number of per-host connection pools kept alive, and keep-alive connections per host.
+FETCH_POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "20"))
+FETCH_POOL_MAXSIZE = int(os.getenv("FETCH_POOL_MAXSIZE", str(max(10, CRAWL_MAX_WORKERS))))
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "2"))
+
+# Session kinds: plain requests, or cloudscraper for sites behind a bot challenge (CFA).
+DEFAULT_SESSION = "default"
+CHALLENGE_SESSION = "challenge"
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate, capacity=None):
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+            if capacity is not None:
+                self.capacity = max(1, int(capacity))
+                self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            time.sleep(wait_for)
+
+
+class HostRateLimiter:
+    """Keeps one TokenBucket per host so a crawl of one site never exceeds its budget."""
+
+    def __init__(self, rate=CRAWL_RATE_PER_HOST, burst=CRAWL_BURST_PER_HOST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._ceilings = {}
+        self._lock = threading.Lock()
+
+    def rate_for(self, url):
+        """The most this host may be sent: the global rate, or less if its robots.txt asks for it."""
+        return self._ceilings.get(urlparse(url).netloc.lower(), self.rate)
+
+    def bucket_for(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate = self._ceilings.get(host, self.rate)
+                bucket = self._buckets[host] = TokenBucket(rate, self.burst if rate >= self.rate else 1)
+            return bucket
+
+    def cap(self, url, rate):
+        """Caps the host's rate (from Crawl-delay / Request-rate); a capped host gets no bursts."""
+        host = urlparse(url).netloc.lower()
+        ceiling = min(self.rate, rate) if rate else self.rate
+        if self._ceilings.get(host, self.rate) == ceiling:
+            return
+        with self._lock:
+            self._ceilings[host] = ceiling
+        self.bucket_for(url).set_rate(ceiling, capacity=self.burst if ceiling >= self.rate else 1)
+
+    def wait(self, url):
+        self.bucket_for(url).acquire()
+
+
+# One limiter for the whole process, so concurrent crawls share each host's budget.
+rate_limiter = HostRateLimiter()
+
+
+def check_robots(url, session=None, headers=None, limiter=None):
+    """
+    Raises RobotsDisallowed if robots.txt forbids url, and caps the host's rate at its
+    Crawl-delay / Request-rate. Rules are cached per host, so this is a dict lookup
+    for every fetch but the first one to a host (or the first after ROBOTS_TTL).
+    """
+    # Replayed responses come from disk, so there is no host to be polite to.
+    if not CRAWL_RESPECT_ROBOTS or replaying():
+        return
+    session = session or get_session()
+    user_agent = ROBOTS_USER_AGENT or (headers or {}).get('User-Agent') or session.headers.get('User-Agent', '*')
+    rules = robots_cache.rules(url, session)
+    (limiter or rate_limiter).cap(url, rules.max_rate(user_agent))
+    if not rules.can_fetch(user_agent, url):
+        raise RobotsDisallowed(f"robots.txt disallows {url}")
+
+
+def crawl_concurrently(items, fetch_fn, url_of=lambda item: item['url'],
+                       max_workers=CRAWL_MAX_WORKERS, limiter=None, session=None):
+    """
+    Runs fetch_fn(item) over items on a bounded thread pool, respecting robots.txt and
+    the per-host rate limit, and yields (item, result, error) tuples in completion order.
+    At most `max_workers` fetches are in flight, so results stream out as they finish.
+    Pass the session fetch_fn uses, so robots.txt is read the same way as the pages.
+    """
+    limiter = limiter or rate_limiter
+    items = iter(items)
+
+    def run(item):
+        # Robots rules (and the rate they imply) are settled before taking a token.
+        check_robots(url_of(item), session, limiter=limiter)
+        if not replaying():
+            limiter.wait(url_of(item))
+        return fetch_fn(item)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = {}
+        for item in items:
+            in_flight[pool.submit(run, item)] = item
+            if len(in_flight) >= max_workers:
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                error = future.exception()
+                yield item, (None if error else future.result()), error
+
+                next_item = next(items, None)
+                if next_item is not None:
+                    in_flight[pool.submit(run, next_item)] = next_item
+
+
+def retry_policy():
+    return Retry(
+        total=FETCH_MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def build_session(kind=DEFAULT_SESSION):
+    """A Session with sized per-host keep-alive pools, retries and compressed transfers."""
+    if kind == CHALLENGE_SESSION:
+        import cloudscraper
+        session = cloudscraper.create_scraper()
+        # Keep cloudscraper's own TLS adapter (it is part of passing the challenge); just resize its pools.
+        for adapter in session.adapters.values():
+            adapter.max_retries = retry_policy()
+            adapter.init_poolmanager(FETCH_POOL_HOSTS, FETCH_POOL_MAXSIZE)
+    else:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=FETCH_POOL_HOSTS,
+            pool_maxsize=FETCH_POOL_MAXSIZE,
+            max_retries=retry_policy(),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    # gzip/deflate always, br/zstd when urllib3 has the decoders installed.
+    session.headers.setdefault("Accept-Encoding", requests.utils.DEFAULT_ACCEPT_ENCODING)
+    return session
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(kind=DEFAULT_SESSION):
+    """The process-wide session of this kind; cookies and challenge state are shared by every scraper."""
+    with _sessions_lock:
+        session = _sessions.get(kind)
+        if session is None:
+            session = _sessions[kind] = build_session(kind)
+        return session
+
+
+def fetch(url, headers=None, timeout=15, session=None, conditional=False, state=None, record_state=True):
+    """
+    GETs url and returns the response with an extra `changed` attribute.
+    With conditional=True the last committed ETag/Last-Modified are sent; a 304, or a
+    body whose hash matches the committed one, comes back with changed=False.
+    Successful fetches are recorded as pending in the crawl state unless record_state=False
+    (e.g. cursor-paginated listing pages, whose URLs are never requested twice).
+    Raises RobotsDisallowed, without a request, for URLs robots.txt puts off limits.
+    """
+    state = state or crawl_state
+    session = session or get_session()
+    check_robots(url, session, headers)
+    send_headers = dict(headers or {})
+    # Recording always fetches full bodies so the archive can stand in for the site later.
+    if conditional and not recording():
+        send_headers.update(state.conditional_headers(url))
+
+    started = time.perf_counter()
+    try:
+        if replaying():
+            response = http_archive.replay(url)
+        else:
+            response = session.get(url, headers=send_headers, timeout=timeout)
+            if recording():
+                http_archive.record(url, response)
+    except Exception:
+        SCRAPER_FETCH_SECONDS.observe(time.perf_counter() - started, host=host_of(url), status="error")
+        raise
+    SCRAPER_FETCH_SECONDS.observe(time.perf_counter() - started, host=host_of(url), status=response.status_code)
+
+    if response.status_code == 304:
+        response.changed = False
+        return response
+
+    if response.ok and record_state:
+        response.changed = state.record(url, response.headers, content_hash(response.content))
+    else:
+        response.changed = True
+    return response
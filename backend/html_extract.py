@@ -0,0 +1,104 @@
+"""
+Shared HTML extraction layer for the scrapers.
+
+Each helper parses only what its scraper needs (via SoupStrainer) instead of
+building a full tree of the page, and the parser backend is selectable:
+
+HTML_PARSER=auto         selectolax if installed, else BeautifulSoup+lxml, else html.parser (default)
+HTML_PARSER=selectolax   Lexbor-based CSS extraction (pip install selectolax)
+HTML_PARSER=lxml         BeautifulSoup with the lxml tree builder (pip install lxml)
+HTML_PARSER=html.parser  BeautifulSoup with the pure-Python parser
+"""
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from passages import passages_from_nodes, PASSAGE_MIN_CHARS
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401 (only needed as a BeautifulSoup tree builder)
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+HTML_PARSER = os.getenv("HTML_PARSER", "auto").lower()
+
+
+def active_backend():
+    """The backend actually in use, after falling back for anything not installed."""
+    if HTML_PARSER in ("auto", "selectolax") and LexborHTMLParser is not None:
+        return "selectolax"
+    if HTML_PARSER in ("auto", "selectolax", "lxml") and HAVE_LXML:
+        return "lxml"
+    return "html.parser"
+
+
+def make_soup(markup, parse_only=None):
+    """BeautifulSoup on the fastest available tree builder, optionally building only matching nodes."""
+    builder = "lxml" if HAVE_LXML and HTML_PARSER != "html.parser" else "html.parser"
+    return BeautifulSoup(markup, builder, parse_only=parse_only)
+
+
+# --- LINK DISCOVERY ---
+def extract_links(markup):
+    """All (href, link text) pairs on the page."""
+    if active_backend() == "selectolax":
+        tree = LexborHTMLParser(markup)
+        return [(a.attributes.get('href'), a.text(strip=True)) for a in tree.css('a[href]')]
+    soup = make_soup(markup, parse_only=SoupStrainer('a', href=True))
+    return [(a['href'], a.get_text(strip=True)) for a in soup.find_all('a', href=True)]
+
+
+# --- CONTENT BLOCKS ---
+def extract_content_paragraphs(markup, max_paragraphs=5, container_class='entry-content'):
+    """
+    Text of the first paragraphs inside div.<container_class> (falling back to <main>).
+    Returns None when the page has neither container.
+    """
+    if active_backend() == "selectolax":
+        tree = LexborHTMLParser(markup)
+        content = tree.css_first(f'div.{container_class}') or tree.css_first('main')
+        if content is None:
+            return None
+        return [p.text(strip=True) for p in content.css('p')[:max_paragraphs]]
+
+    for strainer in (SoupStrainer('div', class_=container_class), SoupStrainer('main')):
+        content = make_soup(markup, parse_only=strainer)
+        if content.find(True):
+            return [p.get_text(strip=True) for p in content.find_all('p')[:max_paragraphs]]
+    return None
+
+
+# --- ARTICLE PASSAGES ---
+def extract_title(markup):
+    if active_backend() == "selectolax":
+        node = LexborHTMLParser(markup).css_first('title')
+        return node.text(strip=True) if node else None
+    title = make_soup(markup, parse_only=SoupStrainer('title')).title
+    return title.get_text(strip=True) if title else None
+
+
+def extract_article_passages(markup, url, container=None, min_chars=PASSAGE_MIN_CHARS):
+    """
+    Section/paragraph passages (see passages.passages_from_nodes) built from only the
+    heading and paragraph nodes, optionally scoped to the first `container` tag (e.g. 'article').
+    """
+    if active_backend() == "selectolax":
+        tree = LexborHTMLParser(markup)
+        root = (tree.css_first(container) if container else None) or tree.body or tree.root
+        nodes = ((node.tag, node.text(separator=' ', strip=True)) for node in root.css('h2, h3, p'))
+        return list(passages_from_nodes(nodes, url, min_chars))
+
+    root = None
+    if container:
+        root = make_soup(markup, parse_only=SoupStrainer(container)).find(container)
+    if root is None:
+        root = make_soup(markup, parse_only=SoupStrainer(['h2', 'h3', 'p']))
+    nodes = ((node.name, node.get_text(' ', strip=True)) for node in root.find_all(['h2', 'h3', 'p']))
+    return list(passages_from_nodes(nodes, url, min_chars))
+
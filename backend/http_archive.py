@@ -0,0 +1,115 @@
+"""
+On-disk archive of raw HTTP responses, sitting under fetcher.fetch.
+
+FETCH_MODE=live    normal network fetches (default)
+FETCH_MODE=record  fetch from the network and append every response to the archive
+FETCH_MODE=replay  serve responses from the archive only; nothing touches the network
+
+The archive is gzip-compressed JSON lines, one response per line, appended as
+separate gzip members so recording never rewrites what is already on disk.
+"""
+import atexit
+import base64
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+FETCH_MODE = os.getenv("FETCH_MODE", "live").lower()
+HTTP_ARCHIVE_FILE = os.getenv("HTTP_ARCHIVE_FILE", "http_archive.jsonl.gz")
+
+
+def recording():
+    return FETCH_MODE == "record"
+
+
+def replaying():
+    return FETCH_MODE == "replay"
+
+
+def encode_body(content):
+    """Text bodies are stored as-is (they compress well); anything else as base64."""
+    try:
+        return {"body": content.decode('utf-8'), "body_encoding": "utf-8"}
+    except UnicodeDecodeError:
+        return {"body": base64.b64encode(content).decode('ascii'), "body_encoding": "base64"}
+
+
+def decode_body(record):
+    if record.get("body_encoding") == "base64":
+        return base64.b64decode(record["body"])
+    return record["body"].encode('utf-8')
+
+
+class HttpArchive:
+    def __init__(self, filename=HTTP_ARCHIVE_FILE):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._writer = None
+        self._index = None
+
+    # --- RECORDING ---
+    def record(self, url, response):
+        entry = {
+            "url": url,
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "recorded_at": datetime.now().isoformat(),
+            **encode_body(response.content),
+        }
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            if self._writer is None:
+                self._writer = gzip.open(self.filename, 'ab')
+            self._writer.write(line)
+            self._writer.flush()
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    # --- REPLAY ---
+    def _load_index(self):
+        """url -> most recent record. Loaded once, on the first replayed request."""
+        index = {}
+        try:
+            with gzip.open(self.filename, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        index[entry["url"]] = entry
+        except FileNotFoundError:
+            print(f"⚠️ HTTP archive '{self.filename}' not found; every replayed request will fail.")
+        except EOFError:
+            # A recording process that was killed leaves a truncated last member; keep what was read.
+            print(f"⚠️ HTTP archive '{self.filename}' is truncated; using the complete records only.")
+        print(f"📼 Loaded {len(index)} archived responses from {self.filename}.")
+        return index
+
+    def replay(self, url):
+        """Rebuilds a requests.Response for url, or raises ConnectionError if it was never recorded."""
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            entry = self._index.get(url)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(f"Replay mode: {url} is not in {self.filename}")
+
+        response = requests.Response()
+        response.url = url
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = decode_body(entry)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+        return response
+
+
+http_archive = HttpArchive()
+# Closing writes the gzip trailer of the last member.
+atexit.register(http_archive.close)
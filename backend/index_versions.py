@@ -0,0 +1,184 @@
+"""
+Versioned indices behind read aliases.
+Each rebuild goes into a fresh timestamped index; once it is fully loaded the
+alias is repointed atomically, so searches never see a missing or half-built index.
+
+Swaps and in-place updates are also recorded in ALIAS_MARKER_FILE, which every
+server worker polls (watch_alias_updates), so the listeners (cache invalidation,
+local index and suggestion rebuilds) run in every worker, not just the one that
+ran the indexing job.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from elasticsearch import NotFoundError
+
+from shared_files import locked, write_atomic
+
+# How many generations (including the live one) to keep around for rollback.
+INDEX_GENERATIONS_TO_KEEP = int(os.getenv("INDEX_GENERATIONS_TO_KEEP", "2"))
+
+ALIAS_MARKER_FILE = os.getenv("ALIAS_MARKER_FILE", "alias_generations.json")
+# Seconds between checks for updates made by other worker processes.
+ALIAS_WATCH_INTERVAL = float(os.getenv("ALIAS_WATCH_INTERVAL", "5"))
+
+# Callbacks run as fn(alias, index) after every swap or in-place update (e.g. cache invalidation).
+alias_swap_listeners = []
+# alias -> marker of the last update this process has run its listeners for
+_seen_updates = {}
+_watch_thread = None
+
+
+def on_alias_swap(listener):
+    alias_swap_listeners.append(listener)
+    return listener
+
+
+def generation_name(alias):
+    return f"{alias}-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+
+
+def belongs_to_alias(alias, index):
+    """True if index is alias itself or one of its generations (named by generation_name)."""
+    return index == alias or re.fullmatch(rf"{re.escape(alias)}-\d{{20}}", index) is not None
+
+
+def create_generation(client, alias, body=None):
+    """Creates a new, empty generation index for alias and returns its name."""
+    index_name = generation_name(alias)
+    client.indices.create(index=index_name, body=body or {})
+    print(f"🆕 Building new generation '{index_name}' for alias '{alias}'.")
+    return index_name
+
+
+def list_generations(client, alias):
+    """All generation indices for alias, oldest first."""
+    indices = client.indices.get(index=f"{alias}-*", allow_no_indices=True, ignore_unavailable=True)
+    return sorted(indices.keys())
+
+
+def live_indices(client, alias):
+    """The concrete indices the alias points at right now (empty if the alias is missing)."""
+    try:
+        return sorted(client.indices.get_alias(name=alias).keys())
+    except NotFoundError:
+        return []
+
+
+def swap_alias(client, alias, new_index, keep=INDEX_GENERATIONS_TO_KEEP):
+    """Atomically points alias at new_index, then garbage-collects old generations."""
+    current = live_indices(client, alias)
+    actions = [{"add": {"index": new_index, "alias": alias}}]
+    actions += [{"remove": {"index": index, "alias": alias}} for index in current if index != new_index]
+
+    # A pre-alias deployment has a concrete index with the alias's name; drop it in the same step.
+    if not current and client.indices.exists(index=alias):
+        actions.append({"remove_index": {"index": alias}})
+
+    client.indices.update_aliases(actions=actions)
+    print(f"🔀 Alias '{alias}' now points at '{new_index}'.")
+    notify_alias_updated(alias, new_index)
+    garbage_collect(client, alias, keep)
+
+
+def notify_alias_updated(alias, index_name):
+    """
+    Runs the swap listeners and tells the other worker processes (via ALIAS_MARKER_FILE);
+    also used after in-place (incremental) updates of the live index.
+    """
+    run_alias_listeners(alias, index_name)
+    try:
+        publish_alias_update(alias, index_name)
+    except OSError as e:
+        print(f"⚠️ Could not record the update of '{alias}' for other workers: {e}")
+
+
+def run_alias_listeners(alias, index_name):
+    for listener in alias_swap_listeners:
+        try:
+            listener(alias, index_name)
+        except Exception as e:
+            print(f"⚠️ Alias swap listener failed for '{alias}': {e}")
+
+
+# --- CROSS-PROCESS NOTIFICATION ---
+def read_alias_updates(filename=ALIAS_MARKER_FILE):
+    """alias -> {"index", "marker"} as last recorded by any process."""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read alias marker file '{filename}': {e}")
+        return {}
+
+
+def publish_alias_update(alias, index_name, filename=ALIAS_MARKER_FILE):
+    marker = uuid.uuid4().hex
+    _seen_updates[alias] = marker # This process has already run its listeners
+    with locked(filename):
+        updates = read_alias_updates(filename)
+        updates[alias] = {"index": index_name, "marker": marker}
+        write_atomic(filename, json.dumps(updates, indent=1))
+
+
+def check_alias_updates(filename=ALIAS_MARKER_FILE):
+    """Runs the listeners for every alias another process has updated since the last check."""
+    for alias, update in read_alias_updates(filename).items():
+        if _seen_updates.get(alias) != update.get("marker"):
+            _seen_updates[alias] = update.get("marker")
+            print(f"🔔 '{alias}' was updated by another worker; refreshing.")
+            run_alias_listeners(alias, update.get("index"))
+
+
+def watch_alias_updates(interval=ALIAS_WATCH_INTERVAL, filename=ALIAS_MARKER_FILE):
+    """
+    Polls ALIAS_MARKER_FILE every `interval` seconds on a daemon thread (idempotent). Updates
+    recorded before the call are taken as already reflected in this process's state.
+    """
+    global _watch_thread
+    if _watch_thread is not None or interval <= 0:
+        return
+    for alias, update in read_alias_updates(filename).items():
+        _seen_updates.setdefault(alias, update.get("marker"))
+
+    def loop():
+        last_mtime = None
+        while True:
+            time.sleep(interval)
+            try:
+                mtime = os.stat(filename).st_mtime_ns
+            except OSError:
+                continue
+            if mtime != last_mtime:
+                last_mtime = mtime
+                check_alias_updates(filename)
+
+    _watch_thread = threading.Thread(target=loop, name="alias-watch", daemon=True)
+    _watch_thread.start()
+
+
+def garbage_collect(client, alias, keep=INDEX_GENERATIONS_TO_KEEP):
+    """Deletes all but the newest `keep` generations, never touching the live one."""
+    live = set(live_indices(client, alias))
+    generations = list_generations(client, alias)
+    retained = set(generations[-keep:]) if keep > 0 else set()
+    for index in generations:
+        if index not in live and index not in retained:
+            client.indices.delete(index=index, ignore_unavailable=True)
+            print(f"🗑️ Deleted old generation '{index}'.")
+
+
+def discard_generation(client, index_name):
+    """Drops a generation whose build failed; the alias keeps serving the previous one."""
+    try:
+        client.indices.delete(index=index_name, ignore_unavailable=True)
+        print(f"🗑️ Discarded failed generation '{index_name}'.")
+    except Exception as e:
+        print(f"⚠️ Could not discard generation '{index_name}': {e}")
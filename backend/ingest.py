@@ -0,0 +1,157 @@
+"""
+Shared streaming ingestion pipeline used by all the indexers.
+Documents flow in as a generator and go out in bulk chunks bounded by both
+document count and byte size, so memory stays flat regardless of crawl size.
+"""
+import os
+import time
+from itertools import chain
+
+from elasticsearch import helpers
+
+from metrics import INGEST_DOCUMENTS, INGEST_DOCS_PER_SECOND, INGEST_DURATION_SECONDS
+
+# --- BULK CONFIGURATION ---
+BULK_CHUNK_DOCS = int(os.getenv("BULK_CHUNK_DOCS", "500"))
+BULK_CHUNK_BYTES = int(os.getenv("BULK_CHUNK_BYTES", str(5 * 1024 * 1024)))
+# More than one thread switches from streaming_bulk to parallel_bulk.
+BULK_THREADS = int(os.getenv("BULK_THREADS", "1"))
+BULK_REQUEST_TIMEOUT = int(os.getenv("BULK_REQUEST_TIMEOUT", "300"))
+MAX_ERROR_SAMPLES = 5
+
+
+class IngestStats:
+    """Running totals for one ingestion run (only a few error samples are kept)."""
+
+    def __init__(self, label):
+        self.label = label
+        self.successes = 0
+        self.error_count = 0
+        self.error_samples = []
+        self.chunks = 0
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+        self._published = (0, 0)
+
+    def record(self, ok, item):
+        if ok:
+            self.successes += 1
+        else:
+            self.error_count += 1
+            if len(self.error_samples) < MAX_ERROR_SAMPLES:
+                self.error_samples.append(item)
+
+    def publish(self):
+        """Pushes the counts since the last publish to /metrics (called once per chunk, not per doc)."""
+        published_ok, published_errors = self._published
+        INGEST_DOCUMENTS.inc(self.successes - published_ok, label=self.label, outcome="ok")
+        INGEST_DOCUMENTS.inc(self.error_count - published_errors, label=self.label, outcome="error")
+        INGEST_DOCS_PER_SECOND.set(self.docs_per_sec, label=self.label)
+        self._published = (self.successes, self.error_count)
+
+    @property
+    def docs_per_sec(self):
+        return round(self.successes / self.elapsed, 1) if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "success_count": self.successes,
+            "error_count": self.error_count,
+            "sample_error": self.error_samples[0] if self.error_samples else None,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "docs_per_sec": self.docs_per_sec,
+        }
+
+
+def peek(iterable):
+    """Returns (first_item, iterator_including_first), or (None, empty iterator)."""
+    iterator = iter(iterable)
+    first = next(iterator, None)
+    if first is None:
+        return None, iter(())
+    return first, chain([first], iterator)
+
+
+def to_actions(documents, index_name, id_field=None):
+    """Wraps plain documents into bulk actions for index_name."""
+    for doc in documents:
+        action = {'_index': index_name, '_source': doc}
+        if id_field and doc.get(id_field):
+            action['_id'] = doc[id_field]
+        yield action
+
+
+def acknowledged_id(item):
+    """The _id from a bulk result item like {"index": {"_id": ..., "status": 201}}."""
+    return next(iter(item.values()), {}).get('_id') if isinstance(item, dict) else None
+
+
+def already_deleted(item):
+    """True for a bulk delete whose document was not there (the outcome the delete wanted)."""
+    result = item.get('delete') if isinstance(item, dict) else None
+    return bool(result) and result.get('status') == 404
+
+
+def ingest_actions(client, actions, label, chunk_size=BULK_CHUNK_DOCS,
+                   max_chunk_bytes=BULK_CHUNK_BYTES, thread_count=BULK_THREADS,
+                   refresh_index=None, on_chunk=None):
+    """
+    Streams bulk actions into ES and reports progress once per chunk_size documents.
+    If refresh_index is given, it is refreshed once at the end (instead of per request).
+    on_chunk(ids, stats) gets the _ids ES acknowledged in each chunk (e.g. to checkpoint a job).
+    """
+    stats = IngestStats(label)
+    es = client.options(request_timeout=BULK_REQUEST_TIMEOUT)
+
+    if thread_count > 1:
+        results = helpers.parallel_bulk(
+            es, actions,
+            thread_count=thread_count,
+            chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes,
+            raise_on_error=False,
+            raise_on_exception=False
+        )
+    else:
+        results = helpers.streaming_bulk(
+            es, actions,
+            chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes,
+            raise_on_error=False,
+            raise_on_exception=False,
+            max_retries=2
+        )
+
+    processed = 0
+    acknowledged = []
+    for ok, item in results:
+        ok = ok or already_deleted(item)
+        stats.record(ok, item)
+        if ok and on_chunk:
+            acknowledged.append(acknowledged_id(item))
+        processed += 1
+        if processed % chunk_size == 0:
+            stats.chunks += 1
+            stats.elapsed = time.monotonic() - stats.started
+            stats.publish()
+            if on_chunk:
+                on_chunk(acknowledged, stats)
+                acknowledged = []
+            print(f"  [{label}] chunk {stats.chunks}: {stats.successes} ok, "
+                  f"{stats.error_count} errors ({stats.docs_per_sec} docs/sec)")
+    if processed % chunk_size:
+        stats.chunks += 1
+        if on_chunk:
+            stats.elapsed = time.monotonic() - stats.started
+            on_chunk(acknowledged, stats)
+
+    if refresh_index:
+        client.indices.refresh(index=refresh_index)
+
+    stats.elapsed = time.monotonic() - stats.started
+    stats.publish()
+    INGEST_DURATION_SECONDS.observe(stats.elapsed, label=label)
+    print(f"✅ [{label}] Ingested {stats.successes} documents in {stats.chunks} chunks "
+          f"({stats.docs_per_sec} docs/sec, {stats.error_count} errors).")
+    return stats
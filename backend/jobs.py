@@ -0,0 +1,327 @@
+"""
+Background runner for the /index_* routes.
+
+POST /index_* submits a job and returns its ID straight away; the scrape and bulk
+load run on a worker thread, and GET /jobs/<id> reports status, progress and
+throughput. Jobs persist to JOBS_FILE together with the generation they write
+into; the documents/URLs whose bulk chunk has been acknowledged are appended to a
+per-job file in JOBS_CHECKPOINT_DIR (read only when the job runs, deleted once it
+succeeds). A job that failed or was cut off by a restart can be resumed
+(POST /jobs/<id>/resume): it reuses its half-built generation and skips
+everything already checkpointed.
+"""
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from shared_files import locked, write_atomic
+
+JOBS_FILE = os.getenv("JOBS_FILE", "index_jobs.json")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs kept in JOBS_FILE (running and resumable ones are always kept).
+JOBS_HISTORY = int(os.getenv("JOBS_HISTORY", "50"))
+JOBS_CHECKPOINT_DIR = os.getenv("JOBS_CHECKPOINT_DIR", "index_job_checkpoints")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, INTERRUPTED = "queued", "running", "succeeded", "failed", "interrupted"
+ACTIVE = (QUEUED, RUNNING)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class Job:
+    """One indexing run. Everything but the lock is plain data, persisted as JSON."""
+
+    def __init__(self, kind, params=None, job_id=None, **state):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = state.get("status", QUEUED)
+        self.created_at = state.get("created_at") or datetime.now().isoformat()
+        self.started_at = state.get("started_at")
+        self.finished_at = state.get("finished_at")
+        self.pid = state.get("pid")
+        self.attempts = state.get("attempts", 0)
+        self.progress = state.get("progress", {})
+        self.result = state.get("result")
+        self.status_code = state.get("status_code")
+        self.error = state.get("error")
+        self.checkpoint = state.get("checkpoint", {"index": None, "done": 0, "chunks": 0})
+        self._lock = threading.Lock()
+        self._done = None # Loaded from the checkpoint file on first use
+        self._unsaved = [] # Marked done since the last chunk
+        self._store = None
+
+    @property
+    def resumable(self):
+        return self.status in (FAILED, INTERRUPTED) and bool(self.checkpoint.get("index") or self.checkpoint.get("done"))
+
+    @property
+    def checkpoint_file(self):
+        return os.path.join(JOBS_CHECKPOINT_DIR, f"{self.id}.keys")
+
+    def _done_keys(self):
+        """The checkpointed keys (lock held), read from the checkpoint file the first time."""
+        if self._done is None:
+            try:
+                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                    self._done = {line.rstrip("\n") for line in f if line.strip()}
+            except FileNotFoundError:
+                self._done = set()
+        return self._done
+
+    def _drop_checkpoint_file(self):
+        try:
+            os.remove(self.checkpoint_file)
+        except FileNotFoundError:
+            pass
+
+    def as_dict(self, full=False):
+        with self._lock:
+            data = {
+                "id": self.id, "kind": self.kind, "params": self.params, "status": self.status,
+                "created_at": self.created_at, "started_at": self.started_at, "finished_at": self.finished_at,
+                "pid": self.pid, "attempts": self.attempts, "progress": dict(self.progress),
+                "result": self.result, "status_code": self.status_code, "error": self.error,
+            }
+            if full:
+                data["checkpoint"] = dict(self.checkpoint)
+            else:
+                data["checkpoint"] = {"index": self.checkpoint.get("index"), "done": self.checkpoint.get("done", 0),
+                                      "chunks": self.checkpoint.get("chunks", 0)}
+                data["resumable"] = self.resumable
+            return data
+
+    # --- USED BY THE INDEXERS WHILE THE JOB RUNS ---
+    def is_done(self, key):
+        """True if key (a URL or document ID) was acknowledged by an earlier attempt."""
+        with self._lock:
+            return key in self._done_keys()
+
+    def set_index(self, index_name, **extra):
+        """Remembers the index being written (plus e.g. the run mode), so a resumed attempt keeps using it."""
+        with self._lock:
+            self.checkpoint.update(extra, index=index_name)
+        self._save()
+
+    def reset_checkpoint(self):
+        """Forgets all progress (e.g. after the generation was discarded); a resume starts over."""
+        with self._lock:
+            self.checkpoint = {"index": None, "done": 0, "chunks": 0}
+            self._done, self._unsaved = set(), []
+            self._drop_checkpoint_file()
+        self._save()
+
+    def clear_done(self):
+        """Drops the checkpointed keys once the job has succeeded (they are never resumed from)."""
+        with self._lock:
+            self.checkpoint["done"] = 0
+            self._done, self._unsaved = set(), []
+            self._drop_checkpoint_file()
+
+    def mark_done(self, key):
+        """Checkpoints a URL that needed no bulk write (unchanged or dropped); saved with the next chunk."""
+        with self._lock:
+            self._done_keys().add(key)
+            self._unsaved.append(key)
+
+    def report(self, **progress):
+        """Updates the progress shown by GET /jobs/<id> (not persisted on its own)."""
+        with self._lock:
+            self.progress.update(progress)
+
+    def checkpoint_chunk(self, keys, stats=None):
+        """Persists one acknowledged bulk chunk: its document keys (appended) plus running throughput."""
+        with self._lock:
+            done = self._done_keys()
+            new_keys = [key for key in self._unsaved + list(keys) if key]
+            done.update(new_keys)
+            self._unsaved = []
+            if new_keys:
+                os.makedirs(JOBS_CHECKPOINT_DIR, exist_ok=True)
+                with open(self.checkpoint_file, 'a', encoding='utf-8') as f:
+                    f.write("".join(f"{key}\n" for key in new_keys))
+            self.checkpoint["chunks"] = self.checkpoint.get("chunks", 0) + 1
+            self.checkpoint["done"] = len(done)
+            if stats is not None:
+                self.progress.update(stats.as_dict())
+            self.progress["checkpointed"] = len(done)
+        self._save()
+
+    def _save(self):
+        if self._store is not None:
+            self._store.save()
+
+
+class JobStore:
+    """
+    Jobs by ID, persisted to JOBS_FILE. Each process is authoritative for the jobs it runs;
+    everyone else's are re-read from the file, so several server workers share one view.
+    Every read-modify-write of the file (saves, claims) holds its lock (shared_files.locked).
+    """
+
+    def __init__(self, filename=JOBS_FILE, workers=JOB_WORKERS):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._owned = set()
+        self._handlers = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-job")
+        self._sync()
+
+    def _read(self):
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            print(f"⚠️ Could not read job file '{self.filename}', starting fresh: {e}")
+            return []
+
+    def _from_dict(self, data):
+        data = dict(data)
+        job = Job(data.pop("kind"), data.pop("params", {}), job_id=data.pop("id"), **data)
+        job._store = self
+        # Left running by a process that no longer exists: it can be resumed. Our own PID on a job
+        # we don't run means the PID was reused after a restart (e.g. PID 1 in a container).
+        runner_alive = job.pid and process_alive(job.pid) and (job.pid != os.getpid() or job.id in self._owned)
+        if job.status in ACTIVE and not runner_alive:
+            job.status = INTERRUPTED
+            job.error = job.error or "Interrupted by a server restart."
+        return job
+
+    def _sync(self):
+        """Refreshes the jobs this process doesn't own from the file."""
+        on_disk = [self._from_dict(data) for data in self._read()]
+        with self._lock:
+            for job in on_disk:
+                if job.id not in self._owned:
+                    self._jobs[job.id] = job
+
+    def save(self):
+        with locked(self.filename):
+            self._write()
+
+    def _write(self):
+        """Merges this process's jobs into the file (file lock held)."""
+        on_disk = {data["id"]: data for data in self._read()}
+        with self._lock:
+            on_disk.update((job.id, job.as_dict(full=True)) for job_id, job in self._jobs.items()
+                           if job_id in self._owned)
+            jobs = sorted(on_disk.values(), key=lambda data: data["created_at"])
+            finished = [data["id"] for data in jobs if data["status"] == SUCCEEDED]
+            dropped = set(finished[:-JOBS_HISTORY]) if len(finished) > JOBS_HISTORY else set()
+            for job_id in dropped:
+                self._jobs.pop(job_id, None)
+                self._owned.discard(job_id)
+            snapshot = json.dumps([data for data in jobs if data["id"] not in dropped], indent=1)
+        write_atomic(self.filename, snapshot)
+
+    def register(self, kind, handler):
+        """handler(job) runs the indexer and returns (response payload, HTTP status)."""
+        self._handlers[kind] = handler
+
+    def get(self, job_id):
+        self._sync()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        self._sync()
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def _active(self, kind, exclude=None):
+        """The active job of kind other than `exclude`, or None (store lock held)."""
+        return next((other for other in self._jobs.values()
+                     if other.kind == kind and other.status in ACTIVE and other.id != exclude), None)
+
+    def _claim(self, job, kind, prepare=None):
+        """
+        Takes ownership of job and records it, unless another job of kind is already active in any
+        process: the file is re-read and written under its lock, so two workers can't both claim.
+        prepare(job) runs just before the claim and can veto it by returning False.
+        Returns (the claimed job or None, the active job that blocked it or None).
+        """
+        with locked(self.filename):
+            self._sync()
+            with self._lock:
+                job = self._jobs.get(job.id, job)
+                active = self._active(kind, exclude=job.id)
+                if active is not None or (prepare and not prepare(job)):
+                    return None, active
+                job.pid = os.getpid() # Marks a queued job as alive for the other workers
+                self._jobs[job.id] = job
+                self._owned.add(job.id)
+            self._write()
+        return job, None
+
+    def submit(self, kind, params=None):
+        """Queues a job of kind; returns (job, created). An active job of the same kind is returned instead."""
+        job = Job(kind, params)
+        job._store = self
+        claimed, active = self._claim(job, kind)
+        if claimed is None:
+            return active, False
+        self._pool.submit(self._run, job)
+        return job, True
+
+    def resume(self, job):
+        """Requeues a failed/interrupted job; it picks up from its checkpoint. False if it can't run now."""
+        def requeue(job):
+            if not job.resumable:
+                return False
+            job.status, job.error, job.finished_at = QUEUED, None, None
+            return True
+
+        job, _ = self._claim(job, job.kind, prepare=requeue)
+        if job is None:
+            return False
+        self._pool.submit(self._run, job)
+        return True
+
+    def run_inline(self, kind, params=None):
+        """Runs a job on the calling thread (e.g. ?wait=1) and returns it when finished."""
+        job = Job(kind, params)
+        job._store = self
+        if self._claim(job, kind)[0] is None:
+            return None
+        self._run(job)
+        return job
+
+    def _run(self, job):
+        with job._lock:
+            job.status = RUNNING
+            job.pid = os.getpid()
+            job.attempts += 1
+            job.started_at = datetime.now().isoformat()
+        self.save()
+        print(f"🏗️ Job {job.id} ({job.kind}) started (attempt {job.attempts}).")
+        try:
+            payload, status_code = self._handlers[job.kind](job)
+            failed = status_code >= 400
+            error = payload.get("error") if failed and isinstance(payload, dict) else None
+        except Exception as e:
+            payload, status_code, failed, error = {"error": f"{job.kind} failed: {e}"}, 500, True, str(e)
+        if not failed:
+            job.clear_done()
+        with job._lock:
+            job.result, job.status_code, job.error = payload, status_code, error
+            job.status = FAILED if failed else SUCCEEDED
+            job.finished_at = datetime.now().isoformat()
+        self.save()
+        print(f"{'🚨' if failed else '✅'} Job {job.id} ({job.kind}) {job.status}.")
+
+
+job_store = JobStore()
@@ -0,0 +1,383 @@
+"""
+Embedded BM25 search engine, used as an ES-free serving mode (SEARCH_BACKEND=local).
+
+Each alias gets an inverted index built from the same documents the CSV loaders
+feed into Elasticsearch. Postings live in a compact memory-mapped file of uint32
+(doc, term frequency) pairs; the term dictionary, field lengths and stored
+documents live in a small JSON file next to it:
+
+    LOCAL_INDEX_DIR/<alias>/postings.bin
+    LOCAL_INDEX_DIR/<alias>/meta.json
+
+LocalSearchClient answers the subset of the Elasticsearch API the search routes
+use (search, msearch, count, point-in-time + search_after; match_all / match /
+multi_match / term queries, size/from, _source filtering and highlighting) and returns
+ES-shaped responses, so the routes don't need to know which backend served them.
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter, defaultdict
+
+from snippets import highlight_source
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+TOKEN_RE = re.compile(r"\w+")
+POSTINGS_FILE = "postings.bin"
+META_FILE = "meta.json"
+
+
+# --- ANALYSIS ---
+def stem(token):
+    """Very light plural folding, so 'breeds' finds 'breed' and 'kitties' finds 'kitty'."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("sses", "ches", "shes", "xes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def analyze(text):
+    return [stem(token) for token in TOKEN_RE.findall(str(text).lower())]
+
+
+def max_edits(term, fuzziness):
+    """Edit distance allowed for term under ES-style fuzziness ('AUTO', 0, 1, 2)."""
+    if fuzziness is None:
+        return 0
+    if str(fuzziness).upper() == "AUTO":
+        return 0 if len(term) < 3 else 1 if len(term) < 6 else 2
+    return int(fuzziness)
+
+
+def within_edits(a, b, limit):
+    """True if the Levenshtein distance between a and b is at most limit."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+# --- ON-DISK INDEX ---
+def write_index(directory, documents, text_fields, id_field=None):
+    """Builds the inverted index for documents and writes it to directory. Returns the doc count."""
+    sources, ids, seen = [], [], {}
+    lengths = {field: [] for field in text_fields}
+    postings = {field: defaultdict(lambda: array('I')) for field in text_fields}
+
+    for doc in documents:
+        doc_id = str(doc.get(id_field)) if id_field and doc.get(id_field) else str(len(sources))
+        if doc_id in seen:
+            continue # First copy wins, like an ES create
+        seen[doc_id] = ordinal = len(sources)
+        sources.append(doc)
+        ids.append(doc_id)
+        for field in text_fields:
+            counts = Counter(analyze(doc.get(field) or ""))
+            lengths[field].append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[field][term].extend((ordinal, tf))
+
+    os.makedirs(directory, exist_ok=True)
+    terms, offset = {}, 0
+    tmp_postings = os.path.join(directory, POSTINGS_FILE + ".tmp")
+    with open(tmp_postings, 'wb') as f:
+        for field in text_fields:
+            terms[field] = {}
+            for term in sorted(postings[field]):
+                pairs = postings[field][term]
+                pairs.tofile(f)
+                terms[field][term] = [offset, len(pairs) // 2]
+                offset += len(pairs)
+
+    meta = {
+        "built_at": time.time(),
+        "byteorder": sys.byteorder,
+        "ids": ids,
+        "sources": sources,
+        "fields": {
+            field: {
+                "avgdl": (sum(lengths[field]) / len(lengths[field])) if lengths[field] else 0.0,
+                "lengths": lengths[field],
+                "terms": terms[field],
+            }
+            for field in text_fields
+        },
+    }
+    tmp_meta = os.path.join(directory, META_FILE + ".tmp")
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, separators=(',', ':'))
+    os.replace(tmp_postings, os.path.join(directory, POSTINGS_FILE))
+    os.replace(tmp_meta, os.path.join(directory, META_FILE))
+    return len(sources)
+
+
+class LocalIndex:
+    """One alias's index, read-only once loaded; postings are paged in from the mmap on demand."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{directory} was built on a machine with a different byte order; rebuild it.")
+        self.built_at = meta["built_at"]
+        self.ids = meta["ids"]
+        self.sources = meta["sources"]
+        self.fields = meta["fields"]
+        # k1 * (1 - b + b * dl / avgdl) per document, computed once per field
+        self.norms = {
+            field: [BM25_K1 * (1 - BM25_B + BM25_B * (length / stats["avgdl"] if stats["avgdl"] else 0))
+                    for length in stats["lengths"]]
+            for field, stats in self.fields.items()
+        }
+
+        with open(os.path.join(directory, POSTINGS_FILE), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._postings = memoryview(self._mmap).cast('I') if self._mmap else memoryview(array('I'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def expand(self, field, term, fuzziness):
+        """The indexed terms a query term matches: itself, or fuzzy neighbours if it is unknown."""
+        terms = self.fields[field]["terms"]
+        if term in terms:
+            return [term]
+        limit = max_edits(term, fuzziness)
+        if not limit:
+            return []
+        # Like ES with prefix_length=1: only terms sharing the first character are compared.
+        return [t for t in terms if t[:1] == term[:1] and within_edits(term, t, limit)]
+
+    def term_scores(self, field, term):
+        """BM25 contribution of one indexed term in one field, per document."""
+        offset, df = self.fields[field]["terms"][term]
+        idf = math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+        norms = self.norms[field]
+        pairs = iter(self._postings[offset:offset + 2 * df])
+        return {doc: idf * tf * (BM25_K1 + 1) / (tf + norms[doc]) for doc, tf in zip(pairs, pairs)}
+
+    def field_scores(self, field, text, operator="or", fuzziness=None):
+        """Per-document BM25 score of text against field (operator 'and' requires every term)."""
+        if field not in self.fields:
+            return {}
+        query_terms = list(dict.fromkeys(analyze(text)))
+        scores, matched = defaultdict(float), Counter()
+        for term in query_terms:
+            best = {}
+            for indexed in self.expand(field, term, fuzziness):
+                for doc, score in self.term_scores(field, indexed).items():
+                    if score > best.get(doc, 0.0):
+                        best[doc] = score
+            for doc, score in best.items():
+                scores[doc] += score
+                matched[doc] += 1
+        if operator.lower() == "and":
+            return {doc: score for doc, score in scores.items() if matched[doc] == len(query_terms)}
+        return scores
+
+    def evaluate(self, query):
+        """{doc ordinal: score} for the supported subset of the ES query DSL."""
+        if not query or "match_all" in query:
+            return dict.fromkeys(range(len(self.ids)), 1.0)
+
+        if "match" in query:
+            field, spec = next(iter(query["match"].items()))
+            if not isinstance(spec, dict):
+                spec = {"query": spec}
+            return self.field_scores(field, spec["query"], spec.get("operator", "or"), spec.get("fuzziness"))
+
+        if "multi_match" in query:
+            spec = query["multi_match"]
+            combined = {}
+            # best_fields: a document scores as its best (boosted) field
+            for field_spec in spec.get("fields", []):
+                field, _, boost = field_spec.partition("^")
+                boost = float(boost or 1.0)
+                scores = self.field_scores(field, spec["query"], spec.get("operator", "or"), spec.get("fuzziness"))
+                for doc, score in scores.items():
+                    if score * boost > combined.get(doc, 0.0):
+                        combined[doc] = score * boost
+            return combined
+
+        if "term" in query:
+            field, value = next(iter(query["term"].items()))
+            if isinstance(value, dict):
+                value = value.get("value")
+            return {doc: 1.0 for doc, source in enumerate(self.sources) if source.get(field) == value}
+
+        raise ValueError(f"Unsupported query {sorted(query)} for the local search engine.")
+
+
+# --- ES-COMPATIBLE CLIENT ---
+def duration_seconds(value, default=300.0):
+    """'30s' / '5m' / '1h' (ES time units) in seconds."""
+    match = re.fullmatch(r"(\d+)(ms|s|m|h)", str(value or ""))
+    if not match:
+        return default
+    amount, unit = int(match.group(1)), match.group(2)
+    return amount * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+
+
+def filter_source(source, spec):
+    if spec is None or spec is True:
+        return source
+    if spec is False:
+        return {}
+    if isinstance(spec, str):
+        spec = [spec]
+    if isinstance(spec, dict):
+        spec = spec.get("includes", [])
+    return {field: source[field] for field in spec if field in source}
+
+
+class LocalSearchClient:
+    """Drop-in stand-in for the read side of the Elasticsearch client, backed by LocalIndex files."""
+
+    def __init__(self, directory=LOCAL_INDEX_DIR):
+        self.directory = directory
+        self._indices = {}
+        # Point-in-time id -> (alias, the LocalIndex it pins or None, expiry); indices are immutable once built.
+        self._pits = {}
+        self._lock = threading.Lock()
+
+    def path(self, alias):
+        return os.path.join(self.directory, alias)
+
+    def build(self, alias, documents, text_fields, id_field=None):
+        """(Re)builds alias from documents and swaps it in atomically. Returns the doc count."""
+        with self._lock:
+            count = write_index(self.path(alias), documents, text_fields, id_field)
+            self._indices[alias] = LocalIndex(self.path(alias))
+        print(f"✅ Local index '{alias}' built with {count} documents.")
+        return count
+
+    def load(self, alias):
+        """Opens a previously built index from disk; False if there is none (or it is unreadable)."""
+        try:
+            self._indices[alias] = LocalIndex(self.path(alias))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Local index '{alias}' not loaded: {e}")
+            return False
+        return True
+
+    def stats(self):
+        return {alias: {"documents": len(index), "built_at": index.built_at}
+                for alias, index in self._indices.items()}
+
+    def options(self, **kwargs):
+        return self
+
+    def ping(self):
+        return True
+
+    def _index(self, name):
+        index = self._indices.get(name)
+        if index is None:
+            raise LookupError(f"no such index [{name}]")
+        return index
+
+    def open_point_in_time(self, index, keep_alive=None, ignore_unavailable=False, **kwargs):
+        local_index = self._indices.get(index) if ignore_unavailable else self._index(index)
+        now = time.monotonic()
+        with self._lock:
+            self._pits = {pit: entry for pit, entry in self._pits.items() if entry[2] > now}
+            pit_id = uuid.uuid4().hex
+            self._pits[pit_id] = (index, local_index, now + duration_seconds(keep_alive))
+        return {"id": pit_id}
+
+    def close_point_in_time(self, id, **kwargs):
+        found = self._pits.pop(id, None) is not None
+        return {"succeeded": found, "num_freed": int(found)}
+
+    def _pinned(self, pit):
+        entry = self._pits.get(pit["id"])
+        if entry is None or entry[2] < time.monotonic():
+            raise LookupError(f"No search context found for id [{pit['id']}]")
+        alias, local_index, _ = entry
+        self._pits[pit["id"]] = (alias, local_index, time.monotonic() + duration_seconds(pit.get("keep_alive")))
+        return alias, local_index
+
+    def search(self, index=None, body=None, **kwargs):
+        started = time.perf_counter()
+        body = body or {}
+        if "pit" in body:
+            index, local_index = self._pinned(body["pit"])
+        elif kwargs.get("ignore_unavailable"):
+            local_index = self._indices.get(index)
+        else:
+            local_index = self._index(index)
+        scores = local_index.evaluate(body.get("query")) if local_index else {}
+        total = len(scores)
+        if body.get("search_after"):
+            # Sort values are (score, doc ordinal), the local stand-in for _shard_doc.
+            after_score, after_doc = body["search_after"][:2]
+            scores = {doc: score for doc, score in scores.items() if (-score, doc) > (-after_score, after_doc)}
+        start = int(body.get("from", 0))
+        size = int(body.get("size", 10))
+        top = heapq.nlargest(start + size, scores.items(), key=lambda item: (item[1], -item[0]))[start:]
+        hits = []
+        for doc, score in top:
+            hit = {
+                "_index": index,
+                "_id": local_index.ids[doc],
+                "_score": score,
+                "_source": filter_source(local_index.sources[doc], body.get("_source")),
+            }
+            if "highlight" in body:
+                hit["highlight"] = highlight_source(local_index.sources[doc], body, analyze)
+            if "sort" in body:
+                hit["sort"] = [score, doc]
+            hits.append(hit)
+        response = {
+            "took": int((time.perf_counter() - started) * 1000),
+            "timed_out": False,
+            "hits": {
+                "total": {"value": total, "relation": "eq"},
+                "max_score": hits[0]["_score"] if hits else None,
+                "hits": hits,
+            },
+        }
+        if "pit" in body:
+            response["pit_id"] = body["pit"]["id"]
+        return response
+
+    def msearch(self, searches, **kwargs):
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            name = header.get("index")
+            try:
+                if "pit" not in body and header.get("ignore_unavailable") and name not in self._indices:
+                    responses.append({"took": 0, "timed_out": False,
+                                      "hits": {"total": {"value": 0, "relation": "eq"}, "max_score": None, "hits": []}})
+                    continue
+                responses.append(self.search(index=name, body=body))
+            except LookupError as e:
+                responses.append({"error": {"type": type(e).__name__, "reason": str(e)}, "status": 404})
+            except ValueError as e:
+                responses.append({"error": {"type": type(e).__name__, "reason": str(e)}, "status": 400})
+        return {"took": sum(r.get("took", 0) for r in responses), "responses": responses}
+
+    def count(self, index, body=None, **kwargs):
+        return {"count": len(self._index(index).evaluate((body or {}).get("query")))}
@@ -0,0 +1,241 @@
+"""
+In-process metrics, exposed at /metrics in the Prometheus text format (0.0.4).
+
+- http_request_duration_seconds: latency per route, method and status.
+- es_search_took_seconds vs es_search_round_trip_seconds: time ES spent on a search
+  versus the full round trip seen by the app (the gap is network, queueing and
+  (de)serialization).
+- query/response cache counters, sampled from the caches when scraped.
+- scraper_fetch_duration_seconds / scraper_parse_duration_seconds per host.
+- ingest_documents_total, ingest_filtered_total and ingest_docs_per_second per indexer.
+
+Label values are route templates, hosts and indexer labels, never raw URLs or
+queries, so series counts stay bounded. Each worker process keeps its own
+registry; Prometheus sums them if every worker is scraped.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import profiling
+
+# Prometheus' default latency buckets, plus a few longer ones for scrapes and bulk requests.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SCRAPE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """For totals another component already keeps (e.g. cache hit counters), mirrored on scrape."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def render(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        return self.header() + [f"{self.name}{format_labels(key)} {format_value(value)}" for key, value in series]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][position] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', format_value(float(bound))),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """collect() is called on every scrape and may refresh gauges/counters (e.g. from cache stats)."""
+        self._collectors.append(collect)
+
+    def render(self):
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP ---
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("route", "method", "status")))
+
+# --- ELASTICSEARCH ---
+ES_TOOK_SECONDS = registry.register(Histogram(
+    "es_search_took_seconds", "Time Elasticsearch reports spending on a search (took).", ("operation",)))
+ES_ROUND_TRIP_SECONDS = registry.register(Histogram(
+    "es_search_round_trip_seconds", "Full client round trip of a search, as seen by the app.", ("operation",)))
+ES_SEARCH_ERRORS = registry.register(Counter(
+    "es_search_errors_total", "Searches that raised or came back with an error.", ("operation",)))
+
+# --- CACHES (refreshed from the caches' own counters on scrape) ---
+CACHE_LOOKUPS = registry.register(Counter(
+    "cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result")))
+CACHE_HIT_RATIO = registry.register(Gauge(
+    "cache_hit_ratio", "Hits over lookups since start.", ("cache",)))
+
+# --- SCRAPERS ---
+SCRAPER_FETCH_SECONDS = registry.register(Histogram(
+    "scraper_fetch_duration_seconds", "Scraper HTTP fetch time per host.", ("host", "status"), SCRAPE_BUCKETS))
+SCRAPER_PARSE_SECONDS = registry.register(Histogram(
+    "scraper_parse_duration_seconds", "Scraper HTML/JSON parse time per host.", ("host",), SCRAPE_BUCKETS))
+
+# --- BULK INGESTION ---
+INGEST_DOCUMENTS = registry.register(Counter(
+    "ingest_documents_total", "Documents sent through bulk ingestion, by indexer and outcome.", ("label", "outcome")))
+INGEST_DOCS_PER_SECOND = registry.register(Gauge(
+    "ingest_docs_per_second", "Throughput of the latest (or running) ingestion per indexer.", ("label",)))
+INGEST_FILTERED = registry.register(Counter(
+    "ingest_filtered_total", "Documents dropped before bulk ingestion (boilerplate, near-duplicates).", ("label", "reason")))
+INGEST_DURATION_SECONDS = registry.register(Histogram(
+    "ingest_duration_seconds", "Wall time of whole ingestion runs.", ("label",), SCRAPE_BUCKETS + (300.0, 900.0)))
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower() or "unknown"
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observes the wall time of the with-block into histogram, even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+def measured_search(operation, call, keys=None):
+    """
+    Runs call() (a search or msearch), recording its timings, or an error if it raises.
+    keys name the searched indices/sources, for the per-request profile (profiling.py).
+    """
+    started = time.perf_counter()
+    try:
+        response = call()
+    except Exception:
+        ES_SEARCH_ERRORS.inc(operation=operation)
+        raise
+    observe_search(operation, started, response, keys)
+    return response
+
+
+async def measured_search_async(operation, awaitable, keys=None):
+    started = time.perf_counter()
+    try:
+        response = await awaitable
+    except Exception:
+        ES_SEARCH_ERRORS.inc(operation=operation)
+        raise
+    observe_search(operation, started, response, keys)
+    return response
+
+
+def observe_search(operation, started, response, keys=None):
+    """Records round trip since `started` (perf_counter) and ES's own `took` for one search/msearch."""
+    seconds = time.perf_counter() - started
+    ES_ROUND_TRIP_SECONDS.observe(seconds, operation=operation)
+    profiling.record_search(operation, keys, seconds, response)
+    took = response.get('took')
+    if took is not None:
+        ES_TOOK_SECONDS.observe(took / 1000.0, operation=operation)
+    if response.get('error') or any('error' in sub for sub in response.get('responses', ())):
+        ES_SEARCH_ERRORS.inc(operation=operation)
+
+
+def observe_cache(name, hits, misses):
+    CACHE_LOOKUPS.set(hits, cache=name, result="hit")
+    CACHE_LOOKUPS.set(misses, cache=name, result="miss")
+    lookups = hits + misses
+    CACHE_HIT_RATIO.set(round(hits / lookups, 4) if lookups else 0.0, cache=name)
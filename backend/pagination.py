@@ -0,0 +1,325 @@
+"""
+Cursor pagination shared by every search route.
+
+The first page is a plain search (or one _msearch across sources), so a query that
+never pages costs a single round trip and holds nothing open in ES. Its cursor
+names the concrete index generation(s) that served it and how many hits were read.
+Asking for page two opens a point-in-time (PIT) on exactly those generations, so a
+reindex (alias swap) in between doesn't reshuffle results; from then on pages are
+read with search_after inside the PIT, so a deep page costs the same as page two.
+
+Cursors are opaque to clients: urlsafe base64 of {"index": names, "from": n} for the
+first page's cursor, {"pit": id, "after": sort values} after that, or of
+{source key: one of those} for multi-source routes like /api/search_all.
+They are not trusted: a cursor's index names must be generations of the route's own
+alias, and a page read through a PIT is refused if its hits come from anywhere else
+(e.g. a PIT cursor replayed on another route).
+First-page cursors hold no PIT, so caching the first page is safe; pages read
+with a cursor are never cached (their PIT may expire), and a PIT is closed as
+soon as its last page has been read or the search using it fails.
+"""
+import base64
+import binascii
+import json
+import os
+
+from elasticsearch import NotFoundError
+
+from index_versions import belongs_to_alias
+from metrics import measured_search, measured_search_async
+from profiling import with_profile
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "10"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+PIT_KEEP_ALIVE = os.getenv("PIT_KEEP_ALIVE", "5m")
+# Relevance order; the PIT's implicit _shard_doc tiebreaker makes it a total order for search_after.
+PAGINATION_SORT = [{"_score": "desc"}, {"_shard_doc": "asc"}]
+EMPTY_RESPONSE = {"timed_out": False, "hits": {"total": {"value": 0, "relation": "eq"}, "max_score": None, "hits": []}}
+
+
+class InvalidCursor(ValueError):
+    """Malformed or expired cursor; the client should restart from the first page."""
+
+
+# --- CURSORS ---
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor.")
+    if not isinstance(state, dict):
+        raise InvalidCursor("Invalid cursor.")
+    return state
+
+
+def page_size_arg(value, default=DEFAULT_PAGE_SIZE):
+    """?page_size= clamped to 1..MAX_PAGE_SIZE; anything unparseable falls back to default."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def check_state(state, alias):
+    """state if it is a well-formed cursor state for alias; first-page states may only name its generations."""
+    if not isinstance(state, dict):
+        raise InvalidCursor("Invalid cursor.")
+    if isinstance(state.get("pit"), str) and state["pit"] and isinstance(state.get("after"), list):
+        return state
+    index, offset = state.get("index"), state.get("from")
+    if (isinstance(index, str) and index and type(offset) is int and offset >= 0
+            and all(belongs_to_alias(alias, name) for name in index.split(","))):
+        return state
+    raise InvalidCursor("Invalid cursor.")
+
+
+def check_hits(response, alias):
+    """Refuses a PIT page whose hits don't come from alias (the PIT was opened for another route)."""
+    if not all(belongs_to_alias(alias, hit.get('_index', '')) for hit in response['hits']['hits']):
+        raise InvalidCursor("Invalid cursor.")
+
+
+def cacheable_page(cursor):
+    """Only first pages are cached: a page read with a cursor hands out a PIT that may expire before it."""
+    return not cursor
+
+
+# --- REQUEST/RESPONSE SHAPING ---
+def first_page_body(body, page_size):
+    """body for the PIT-less first page (relevance order, like the PIT sort without its tiebreaker)."""
+    paged = {key: value for key, value in body.items() if key not in ("from", "size", "sort", "search_after")}
+    paged["size"] = page_size
+    return with_profile(paged)
+
+
+def paged_body(body, page_size, pit_id, after=None, offset=0):
+    """body rewritten to read one page from the PIT (PIT searches must not name an index)."""
+    paged = {key: value for key, value in body.items() if key not in ("from", "size", "sort")}
+    paged.update(size=page_size, sort=PAGINATION_SORT, pit={"id": pit_id, "keep_alive": PIT_KEEP_ALIVE})
+    if after:
+        paged["search_after"] = after
+    elif offset:
+        # Page two: skip what the PIT-less first page already returned.
+        paged["from"] = offset
+    return with_profile(paged)
+
+
+def next_state(response, page_size, pit_id):
+    """Cursor state for the page after response, or None if this was the last page."""
+    hits = response['hits']['hits']
+    if len(hits) < page_size:
+        return None
+    if pit_id is None:
+        return {"index": ",".join(sorted({hit['_index'] for hit in hits})), "from": len(hits)}
+    return {"pit": response.get('pit_id', pit_id), "after": hits[-1]['sort']}
+
+
+def open_pit(client, index):
+    return client.open_point_in_time(index=index, keep_alive=PIT_KEEP_ALIVE)['id']
+
+
+def close_pit(client, pit_id):
+    """Best effort: an unclosed PIT just expires after PIT_KEEP_ALIVE."""
+    try:
+        client.close_point_in_time(id=pit_id)
+    except Exception as e:
+        print(f"⚠️ Could not close point-in-time: {e}")
+
+
+def resume_state(client, state):
+    """(pit id, search_after, from offset, opened here?) for a decoded cursor state."""
+    if state.get("pit"):
+        return state["pit"], state["after"], 0, False
+    try:
+        return open_pit(client, state["index"]), None, state["from"], True
+    except (NotFoundError, LookupError):
+        raise InvalidCursor("Cursor expired; start again from the first page.")
+
+
+# --- SINGLE INDEX ---
+def search_page(client, index, body, page_size, cursor=None, **kwargs):
+    """Returns (response, next cursor or None) for one page of body against index."""
+    if not cursor:
+        response = measured_search("search", lambda: client.search(
+            index=index, body=first_page_body(body, page_size), ignore_unavailable=True, **kwargs), keys=[index])
+        state = next_state(response, page_size, None)
+        return response, encode_cursor(state) if state else None
+
+    pit_id, after, offset, opened = resume_state(client, check_state(decode_cursor(cursor), index))
+    searched = False
+    try:
+        paged = paged_body(body, page_size, pit_id, after, offset)
+        response = measured_search("search", lambda: client.search(body=paged, **kwargs), keys=[index])
+        check_hits(response, index)
+        searched = True
+    except (NotFoundError, LookupError):
+        raise InvalidCursor("Cursor expired; start again from the first page.")
+    finally:
+        if opened and not searched:
+            close_pit(client, pit_id)
+
+    state = next_state(response, page_size, pit_id)
+    if state is None:
+        close_pit(client, pit_id)
+    return response, encode_cursor(state) if state else None
+
+
+# --- SEVERAL INDICES IN ONE _msearch ---
+def msearch_plan(sources, page_size, pits):
+    """
+    (sizes, searches, searched keys) for one _msearch. pits is None for the first page
+    (every source, no PIT), else {key: (pit id, search_after, from offset)} for the
+    sources that still have results.
+    """
+    sizes = {key: page_size or body.get("size", DEFAULT_PAGE_SIZE) for key, _, body in sources}
+    searches, searched = [], []
+    for key, index, body in sources:
+        if pits is None:
+            searches.append({"index": index, "ignore_unavailable": True})
+            searches.append(first_page_body(body, sizes[key]))
+        elif key in pits:
+            searches.append({})
+            searches.append(paged_body(body, sizes[key], *pits[key]))
+        else:
+            continue
+        searched.append(key)
+    return sizes, searches, searched
+
+
+def msearch_collect(sources, results, sizes, pits):
+    """(responses aligned with sources, next states, PIT ids whose walk is over) from _msearch results."""
+    responses, next_states, finished = [], {}, []
+    for key, index, _ in sources:
+        response = results.get(key, EMPTY_RESPONSE)
+        responses.append(response)
+        pit_id = pits[key][0] if pits and key in pits else None
+        if 'error' in response:
+            if pit_id and response.get('status') == 404:
+                raise InvalidCursor("Cursor expired; start again from the first page.")
+            if pit_id:
+                finished.append(pit_id)
+            continue
+        if pit_id:
+            check_hits(response, index)
+        if pits is None or pit_id:
+            state = next_state(response, sizes[key], pit_id)
+            if state:
+                next_states[key] = state
+            elif pit_id:
+                finished.append(pit_id)
+    return responses, next_states, finished
+
+
+def msearch_pages(client, sources, page_size, cursor=None, **kwargs):
+    """
+    sources is [(key, index, body)]. Returns (responses aligned with sources, next cursor or None).
+    Without a page_size each source keeps the size in its body. On later pages only the
+    sources that still had results are searched; the rest come back empty.
+    """
+    pits, opened = None, []
+    if cursor:
+        pits = {}
+        aliases = {key: index for key, index, _ in sources}
+        try:
+            for key, state in decode_cursor(cursor).items():
+                if key not in aliases:
+                    raise InvalidCursor("Invalid cursor.")
+                pit_id, after, offset, was_opened = resume_state(client, check_state(state, aliases[key]))
+                pits[key] = (pit_id, after, offset)
+                if was_opened:
+                    opened.append(pit_id)
+        except InvalidCursor:
+            for pit_id in opened:
+                close_pit(client, pit_id)
+            raise
+
+    sizes, searches, searched = msearch_plan(sources, page_size, pits)
+    finished = list(opened) # Closed unless the walk carries on with them
+    try:
+        results = dict(zip(searched, measured_search(
+            "msearch", lambda: client.msearch(searches=searches, **kwargs), keys=searched)['responses'] if searches else []))
+        responses, next_states, finished = msearch_collect(sources, results, sizes, pits)
+    finally:
+        for pit_id in finished:
+            close_pit(client, pit_id)
+    return responses, encode_cursor(next_states) if next_states else None
+
+
+# --- ASYNC VARIANTS (AsyncElasticsearch, for async_app.py) ---
+async def close_pit_async(client, pit_id):
+    try:
+        await client.close_point_in_time(id=pit_id)
+    except Exception as e:
+        print(f"⚠️ Could not close point-in-time: {e}")
+
+
+async def resume_state_async(client, state):
+    if state.get("pit"):
+        return state["pit"], state["after"], 0, False
+    try:
+        opened = await client.open_point_in_time(index=state["index"], keep_alive=PIT_KEEP_ALIVE)
+    except (NotFoundError, LookupError):
+        raise InvalidCursor("Cursor expired; start again from the first page.")
+    return opened['id'], None, state["from"], True
+
+
+async def search_page_async(client, index, body, page_size, cursor=None):
+    if not cursor:
+        response = await measured_search_async("search", client.search(
+            index=index, body=first_page_body(body, page_size), ignore_unavailable=True), keys=[index])
+        state = next_state(response, page_size, None)
+        return response, encode_cursor(state) if state else None
+
+    pit_id, after, offset, opened = await resume_state_async(client, check_state(decode_cursor(cursor), index))
+    searched = False
+    try:
+        paged = paged_body(body, page_size, pit_id, after, offset)
+        response = await measured_search_async("search", client.search(body=paged), keys=[index])
+        check_hits(response, index)
+        searched = True
+    except (NotFoundError, LookupError):
+        raise InvalidCursor("Cursor expired; start again from the first page.")
+    finally:
+        if opened and not searched:
+            await close_pit_async(client, pit_id)
+
+    state = next_state(response, page_size, pit_id)
+    if state is None:
+        await close_pit_async(client, pit_id)
+    return response, encode_cursor(state) if state else None
+
+
+async def msearch_pages_async(client, sources, page_size, cursor=None):
+    pits, opened = None, []
+    if cursor:
+        pits = {}
+        aliases = {key: index for key, index, _ in sources}
+        try:
+            for key, state in decode_cursor(cursor).items():
+                if key not in aliases:
+                    raise InvalidCursor("Invalid cursor.")
+                pit_id, after, offset, was_opened = await resume_state_async(client, check_state(state, aliases[key]))
+                pits[key] = (pit_id, after, offset)
+                if was_opened:
+                    opened.append(pit_id)
+        except InvalidCursor:
+            for pit_id in opened:
+                await close_pit_async(client, pit_id)
+            raise
+
+    sizes, searches, searched = msearch_plan(sources, page_size, pits)
+    finished = list(opened)
+    try:
+        results = dict(zip(searched, (await measured_search_async(
+            "msearch", client.msearch(searches=searches), keys=searched))['responses'] if searches else []))
+        responses, next_states, finished = msearch_collect(sources, results, sizes, pits)
+    finally:
+        for pit_id in finished:
+            await close_pit_async(client, pit_id)
+    return responses, encode_cursor(next_states) if next_states else None
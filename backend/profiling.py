@@ -0,0 +1,145 @@
+"""
+Opt-in, admin-only profiling of a single search request.
+
+Send the PROFILE_TOKEN secret as the X-Profile-Token header (or ?profile=<token>)
+and the route answers with a breakdown attached under "profile":
+
+- timings: handler wall time, ES round trip vs ES `took`, and JSON serialization,
+  so the rest (Flask, network, client) falls out by subtraction;
+- python: the top functions from a cProfile of the handler;
+- searches: every search/msearch the handler ran, with the ES Profile API output
+  of each sub-query (one per source for /api/search_all).
+
+Profiled requests skip the query cache and the response cache so the search really
+runs, and are never cached themselves. With PROFILE_TOKEN unset, profiling is off.
+"""
+import contextvars
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "25"))
+
+_current = contextvars.ContextVar("request_profile", default=None)
+# cProfile hooks are process-wide on recent Pythons, so only one handler is profiled at a time.
+_cprofile_lock = threading.Lock()
+
+
+def requested(header_value=None, query_value=None):
+    """True only when profiling is enabled and the caller presented the admin token."""
+    if not PROFILE_TOKEN:
+        return False
+    presented = header_value or query_value or ""
+    return hmac.compare_digest(presented.encode('utf-8'), PROFILE_TOKEN.encode('utf-8'))
+
+
+class RequestProfile:
+    def __init__(self):
+        self.searches = []
+        self.started = time.perf_counter()
+        self.handler_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.python = None
+
+    def record_search(self, operation, keys, seconds, response):
+        """Keeps ES's own numbers for one search or msearch (sub-responses are labelled with keys)."""
+        if operation == "msearch":
+            sub_responses = response.get('responses', [])
+            labels = list(keys or range(len(sub_responses)))
+            queries = [
+                {"source": label, "took_ms": sub.get('took'), "profile": sub.get('profile'),
+                 "error": sub.get('error')}
+                for label, sub in zip(labels, sub_responses)
+            ]
+        else:
+            queries = [{"source": (keys or [None])[0], "took_ms": response.get('took'),
+                        "profile": response.get('profile')}]
+        self.searches.append({
+            "operation": operation,
+            "round_trip_ms": round(seconds * 1000, 3),
+            "took_ms": response.get('took'),
+            "queries": queries,
+        })
+
+    def report(self):
+        round_trip = sum(search["round_trip_ms"] for search in self.searches)
+        took = sum(search["took_ms"] or 0 for search in self.searches)
+        handler_ms = round(self.handler_seconds * 1000, 3)
+        return {
+            "timings": {
+                "handler_ms": handler_ms,
+                "es_round_trip_ms": round(round_trip, 3),
+                "es_took_ms": took,
+                # Network, HTTP client and response parsing on the way to/from ES.
+                "es_overhead_ms": round(round_trip - took, 3),
+                "outside_es_ms": round(handler_ms - round_trip, 3),
+                "serialize_ms": round(self.serialize_seconds * 1000, 3),
+            },
+            "python": self.python,
+            "searches": self.searches,
+        }
+
+
+def active():
+    """The profile being collected for the current request, or None."""
+    return _current.get()
+
+
+def with_profile(body):
+    """body with ES profiling switched on when the current request is being profiled."""
+    return {**body, "profile": True} if active() is not None else body
+
+
+def record_search(operation, keys, seconds, response):
+    profile = active()
+    if profile is not None:
+        profile.record_search(operation, keys, seconds, response)
+
+
+def top_functions(profiler, limit=PROFILE_TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        })
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+
+@contextmanager
+def profile_request():
+    """Collects a RequestProfile (and a cProfile of the block, when no other one is running)."""
+    profile = RequestProfile()
+    token = _current.set(profile)
+    profiler = cProfile.Profile() if _cprofile_lock.acquire(blocking=False) else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _cprofile_lock.release()
+            profile.python = {"top_functions": top_functions(profiler)}
+        else:
+            profile.python = {"skipped": "another request is being profiled"}
+        profile.handler_seconds = time.perf_counter() - profile.started
+        _current.reset(token)
+
+
+def attach(payload, report):
+    """The route's payload with the report attached (list payloads are wrapped as {"results": ...})."""
+    if isinstance(payload, dict):
+        return {**payload, "profile": report}
+    return {"results": payload, "profile": report}
@@ -0,0 +1,148 @@
+"""
+In-process LRU + TTL cache for search results.
+Entries are tagged with the aliases they read from, and are dropped as soon as
+one of those aliases is swapped to a new index generation.
+"""
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+# Stands in for the live index name until this process sees an alias swap.
+BOOT_ID = uuid.uuid4().hex[:12]
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, so 'Maine  Coon' == 'maine coon'."""
+    return " ".join((query or "").lower().split())
+
+
+class QueryCache:
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._live_indices = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, alias):
+        with self._lock:
+            return self._generations.get(alias, 0)
+
+    def generation_tag(self, alias):
+        """Identifies the data behind alias as this process knows it: live index name plus local generation."""
+        with self._lock:
+            return f"{self._live_indices.get(alias, BOOT_ID)}.{self._generations.get(alias, 0)}"
+
+    def make_key(self, endpoint, query, size, aliases):
+        """Key = endpoint, normalized query, size and the current generation of every alias read."""
+        generations = tuple((alias, self.generation(alias)) for alias in aliases)
+        return (endpoint, normalize_query(query), size, generations)
+
+    def get(self, key):
+        """Returns (True, value) on a fresh hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key, value, aliases=()):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, frozenset(aliases))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_alias(self, alias, new_index=None):
+        """Bumps alias's generation and evicts every entry that read from it."""
+        with self._lock:
+            self._generations[alias] = self._generations.get(alias, 0) + 1
+            if new_index:
+                self._live_indices[alias] = new_index
+            stale = [key for key, entry in self._entries.items() if alias in entry[2]]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "generations": dict(self._generations),
+            }
+
+
+query_cache = QueryCache()
+
+# Set while a request must really run its searches (e.g. when it is being profiled).
+_bypassed = contextvars.ContextVar("query_cache_bypassed", default=False)
+
+
+@contextmanager
+def bypass():
+    """Within the block cached()/cached_async() neither read nor fill the cache."""
+    token = _bypassed.set(True)
+    try:
+        yield
+    finally:
+        _bypassed.reset(token)
+
+
+def cached(endpoint, query, size, aliases, compute):
+    """
+    Returns compute()'s result through the cache. compute() returns (value, cacheable);
+    failed or partial results should come back with cacheable=False.
+    """
+    if _bypassed.get():
+        return compute()[0]
+    key = query_cache.make_key(endpoint, query, size, aliases)
+    hit, value = query_cache.get(key)
+    if hit:
+        return value
+    value, cacheable = compute()
+    if cacheable:
+        query_cache.set(key, value, aliases)
+    return value
+
+
+async def cached_async(endpoint, query, size, aliases, compute):
+    """cached() for the async serving path: compute is a coroutine function."""
+    if _bypassed.get():
+        return (await compute())[0]
+    key = query_cache.make_key(endpoint, query, size, aliases)
+    hit, value = query_cache.get(key)
+    if hit:
+        return value
+    value, cacheable = await compute()
+    if cacheable:
+        query_cache.set(key, value, aliases)
+    return value
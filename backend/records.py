@@ -0,0 +1,251 @@
+"""
+Record files: the hand-off between the scrapers and the indexers.
+
+Scrapers stream rows into a RecordWriter and loaders stream them back with
+read_records(), one record at a time, so neither side ever holds a whole crawl.
+The format is picked by RECORD_FORMAT:
+
+- jsonl.zst (default when `pip install zstandard` is available): one JSON object
+  per line, zstd-compressed;
+- jsonl.gz: the same with gzip (the default without zstandard);
+- csv: the old DictWriter files.
+
+Compressed files are append-only: every writer session adds its own zstd frame
+or gzip member, so a resumed crawl simply appends. A new file starts with a
+header record naming its schema (see Schema) that readers check. Set
+RECORD_CSV_EXPORT=1 to also mirror every row to the CSV for spreadsheets.
+
+Callers name a data set by its CSV filename (e.g. "reddit_cat_memes.csv"); the
+actual file is that name with the format's extension. Readers take whichever file
+exists, so the checked-in CSVs keep loading until they are re-scraped.
+"""
+import csv
+import gzip
+import json
+import os
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSONL_ZST, JSONL_GZ, CSV = "jsonl.zst", "jsonl.gz", "csv"
+RECORD_FORMAT = os.getenv("RECORD_FORMAT", JSONL_ZST if zstandard is not None else JSONL_GZ)
+RECORD_CSV_EXPORT = os.getenv("RECORD_CSV_EXPORT", "0") == "1"
+RECORD_ZSTD_LEVEL = int(os.getenv("RECORD_ZSTD_LEVEL", "6"))
+RECORD_GZIP_LEVEL = int(os.getenv("RECORD_GZIP_LEVEL", "6"))
+# Rows between flushes, so a crash loses at most this many and readers can follow a running crawl.
+RECORD_FLUSH_EVERY = 100
+READ_CHUNK_BYTES = 1 << 20
+
+# Whole-article rows in the legacy Wikipedia CSV exceed the csv module's default field limit.
+csv.field_size_limit(sys.maxsize)
+
+
+class Schema:
+    """The fields of one source's records; `version` is bumped when they change incompatibly."""
+
+    def __init__(self, name, fields, version=1):
+        self.name = name
+        self.fields = list(fields)
+        self.version = version
+
+    def header(self):
+        return {"_schema": self.name, "_version": self.version, "_fields": self.fields}
+
+    def row(self, record):
+        """record reduced to the schema's fields (missing ones empty), in field order."""
+        return {field: record.get(field, "") for field in self.fields}
+
+    def check_header(self, header, filename):
+        if header.get("_schema") != self.name or header.get("_version", 1) > self.version:
+            raise ValueError(
+                f"'{filename}' holds {header.get('_schema')} v{header.get('_version')} records, "
+                f"expected {self.name} v{self.version}."
+            )
+
+
+# --- FILE NAMES ---
+def format_of(filename):
+    for record_format in (JSONL_ZST, JSONL_GZ, CSV):
+        if filename.endswith("." + record_format):
+            return record_format
+    raise ValueError(f"Unknown record file type: {filename}")
+
+
+def records_file(name, record_format=None):
+    """The file a data set named like "reddit_cat_memes.csv" is written to in record_format."""
+    stem = name[:-len(".csv")] if name.endswith(".csv") else name
+    return f"{stem}.{record_format or RECORD_FORMAT}"
+
+
+def find_records(name):
+    """The existing file for a data set: the configured format first, then any other. None if missing."""
+    formats = [RECORD_FORMAT] + [f for f in (JSONL_ZST, JSONL_GZ, CSV) if f != RECORD_FORMAT]
+    for record_format in formats:
+        filename = records_file(name, record_format)
+        if os.path.exists(filename) and (record_format != JSONL_ZST or zstandard is not None):
+            return filename
+    return None
+
+
+# --- WRITING ---
+def dumps_line(record):
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b"\n"
+
+
+class RecordWriter:
+    """
+    Streams rows of schema into the data set's record file (plus its CSV with
+    RECORD_CSV_EXPORT). append=True adds to an existing file instead of replacing it.
+    """
+
+    def __init__(self, name, schema, append=False, record_format=None):
+        self.schema = schema
+        self.filename = records_file(name, record_format)
+        self.format = format_of(self.filename)
+        self.count = 0
+        self._csv_export = None
+        if RECORD_CSV_EXPORT and self.format != CSV:
+            self._csv_export = RecordWriter(name, schema, append, record_format=CSV)
+        new_file = not (append and os.path.exists(self.filename) and os.path.getsize(self.filename))
+        mode = 'wb' if new_file else 'ab'
+        if self.format == CSV:
+            self._file = open(self.filename, mode[0], newline='', encoding='utf-8')
+            self._stream = csv.DictWriter(self._file, fieldnames=schema.fields, extrasaction='ignore')
+            if new_file:
+                self._stream.writeheader()
+            return
+        if self.format == JSONL_ZST:
+            if zstandard is None:
+                raise RuntimeError("RECORD_FORMAT=jsonl.zst needs `pip install zstandard`.")
+            self._file = open(self.filename, mode)
+            self._stream = zstandard.ZstdCompressor(level=RECORD_ZSTD_LEVEL).stream_writer(self._file)
+        else:
+            self._file = None
+            self._stream = gzip.open(self.filename, mode, compresslevel=RECORD_GZIP_LEVEL)
+        if new_file:
+            self._stream.write(dumps_line(schema.header()))
+
+    def write(self, row):
+        if self.format == CSV:
+            self._stream.writerow(row)
+        else:
+            self._stream.write(dumps_line(self.schema.row(row)))
+        if self._csv_export is not None:
+            self._csv_export.write(row)
+        self.count += 1
+        if self.count % RECORD_FLUSH_EVERY == 0:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+        return self.count
+
+    def flush(self):
+        if self.format == JSONL_ZST:
+            self._stream.flush(zstandard.FLUSH_BLOCK)
+        self._stream.flush()
+        if self._file is not None:
+            self._file.flush()
+        if self._csv_export is not None:
+            self._csv_export.flush()
+
+    def close(self):
+        if self.format == CSV:
+            self._file.close()
+        else:
+            self._stream.close() # Ends the zstd frame / gzip member (and closes the file)
+        if self._csv_export is not None:
+            self._csv_export.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def replace_records(name, schema, rows):
+    """
+    Rewrites the data set from rows, which may stream from its current file (e.g. an
+    updated copy of it): they go to a temporary file that then replaces the old one.
+    """
+    stem = name[:-len(".csv")] if name.endswith(".csv") else name
+    with RecordWriter(f"{stem}.tmp", schema) as writer:
+        writer.write_many(rows)
+    os.replace(writer.filename, records_file(name))
+    if writer._csv_export is not None:
+        os.replace(writer._csv_export.filename, records_file(name, CSV))
+    return writer.count
+
+
+def tee_records(rows, name, schema, append=False):
+    """Writes rows to the data set as they stream past, yielding each one on."""
+    with RecordWriter(name, schema, append=append) as writer:
+        for row in rows:
+            writer.write(row)
+            yield row
+
+
+# --- READING ---
+def iter_lines(stream):
+    """Lines of a binary stream, read in large chunks (read1, so a bad tail doesn't swallow the chunk before it)."""
+    read = getattr(stream, 'read1', stream.read)
+    pending = b""
+    while True:
+        chunk = read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def read_jsonl(filename, record_format, schema=None):
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(filename, 'rb') as raw:
+        if record_format == JSONL_ZST:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        else:
+            stream = gzip.GzipFile(fileobj=raw)
+        try:
+            for line in iter_lines(stream):
+                if not line.strip():
+                    continue
+                record = loads(line)
+                if "_schema" in record:
+                    if schema is not None:
+                        schema.check_header(record, filename)
+                    continue
+                yield record
+        except (EOFError, zstandard.ZstdError if zstandard else EOFError) as e:
+            # A writer that died mid-frame leaves a truncated tail; everything before it is intact.
+            print(f"⚠️ '{filename}' ends in a truncated block ({e}); using the records before it.")
+
+
+def read_records(name, schema=None):
+    """
+    Streams the data set's records as dicts, from whichever file exists (see find_records).
+    Raises FileNotFoundError if it was never written.
+    """
+    filename = find_records(name)
+    if filename is None:
+        raise FileNotFoundError(name)
+    record_format = format_of(filename)
+    if record_format == CSV:
+        with open(filename, mode='r', newline='', encoding='utf-8') as csvfile:
+            yield from csv.DictReader(csvfile)
+    else:
+        yield from read_jsonl(filename, record_format, schema)
@@ -1,29 +1,25 @@
-from urllib.robotparser import RobotFileParser
 
-# Initialize the parser
-# Note: The 'User-agent' you provide to the parser should be the same
-# as the one your crawler uses.
-parser = RobotFileParser()
+"""
+Checks a URL against its site's robots.txt the way the scrapers do (see robots.py):
+    python respect_robot.py https://www.britannica.com/some/page/to/crawl.html [user-agent]
+"""
+import sys
 
-# Set the URL of the robots.txt file for the target site
-target_domain = "https://www.britannica.com/"
-robots_txt_url = target_domain + "robots.txt"
+from fetcher import get_session
+from robots import robots_cache
 
-parser.set_url(robots_txt_url)
+# The URL you want to crawl, and the name of your crawler's User-Agent
+url_to_check = sys.argv[1] if len(sys.argv) > 1 else "https://www.britannica.com/some/page/to/crawl.html"
+your_user_agent = sys.argv[2] if len(sys.argv) > 2 else "MyAwesomeCrawler"
 
-# Fetch and parse the robots.txt file content
-# This makes an HTTP request to the robots.txt file.
-parser.read()
+# Fetches, parses and caches the host's robots.txt (later checks are memoized lookups)
+rules = robots_cache.rules(url_to_check, get_session())
 
-# The URL you want to crawl
-url_to_check = target_domain + "some/page/to/crawl.html"
-
-# The name of your crawler's User-Agent
-your_user_agent = "MyAwesomeCrawler"
-
-if parser.can_fetch(your_user_agent, url_to_check):
+if rules.can_fetch(your_user_agent, url_to_check):
     print(f"✅ Allowed to crawl: {url_to_check}")
-    # Proceed with crawling the page
 else:
     print(f"🛑 Disallowed by robots.txt: {url_to_check}")
-    # Skip this URL
\ No newline at end of file
+
+max_rate = rules.max_rate(your_user_agent)
+if max_rate:
+    print(f"⏱️ Crawl-delay/Request-rate limits this host to {max_rate:.2f} requests/s.")
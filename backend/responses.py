@@ -0,0 +1,204 @@
+"""
+Compact, compressed, cacheable JSON responses for the search routes.
+
+- Serialization uses orjson when installed (compact json.dumps otherwise).
+- Bodies above RESPONSE_COMPRESS_MIN_BYTES are brotli- or gzip-encoded, whichever the
+  client accepts (brotli needs `pip install brotli`).
+- Every cacheable response carries a strong ETag derived from the route, the normalized
+  query, its paging parameters and the generation of each index it read, so a
+  revalidation is answered 304 before any search runs. ETags also roll over every
+  QUERY_CACHE_TTL seconds, the same staleness bound as the query cache.
+- Encoded bodies are kept in a small LRU keyed by ETag, so a repeat request costs
+  neither serialization nor compression.
+
+The helpers are framework-neutral: respond() returns (status, body, headers) for the
+Flask routes in connect_db and the Quart routes in async_app to wrap.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from query_cache import normalize_query, query_cache, QUERY_CACHE_TTL
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "512"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+
+# --- SERIALIZATION AND COMPRESSION ---
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def accepted_encodings(accept_encoding):
+    """Codings the client accepts (q=0 means refused)."""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding)
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)
+    return body
+
+
+# --- ETAGS ---
+def search_etag(endpoint, query, params, aliases):
+    """Strong validator for one route/query/page over the current generation of each alias."""
+    material = json.dumps([
+        endpoint,
+        normalize_query(query),
+        params,
+        [query_cache.generation_tag(alias) for alias in aliases],
+        int(time.time() // QUERY_CACHE_TTL) if QUERY_CACHE_TTL else 0,
+    ], default=str)
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()[:24]
+
+
+def representation_etag(etag, encoding):
+    """Each content coding is its own representation, so it gets its own strong ETag."""
+    return f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+
+
+def etag_matches(if_none_match, tag):
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or tag in candidates
+
+
+class RenderedCache:
+    """LRU of (representation ETag) -> (body, headers)."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, tag):
+        with self._lock:
+            entry = self._entries.get(tag)
+            if entry is not None:
+                self._entries.move_to_end(tag)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def set(self, tag, body, headers):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[tag] = (body, headers)
+            self._entries.move_to_end(tag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+rendered_cache = RenderedCache()
+
+
+# --- RESPONSES ---
+def render(payload, accept_encoding, status=200, extra_headers=None, tag=None):
+    """(status, body, headers) for payload, compressed when the client accepts it and it's worth it."""
+    body = dumps(payload)
+    encoding = choose_encoding(accept_encoding) if len(body) >= RESPONSE_COMPRESS_MIN_BYTES else None
+    headers = {"Content-Type": "application/json", "Vary": "Accept-Encoding", **(extra_headers or {})}
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    if tag:
+        headers["ETag"] = representation_etag(tag, encoding)
+        headers["Cache-Control"] = "no-cache" # Cacheable, but revalidate (cheaply, via ETag) every time
+    else:
+        headers["Cache-Control"] = "no-store"
+    return status, body, headers
+
+
+def not_modified(tag_header):
+    return 304, b"", {"ETag": tag_header, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+
+def revalidated(if_none_match, headers):
+    """A 304 if the client already holds the response with these headers (only cacheable ones carry an ETag)."""
+    tag_header = headers.get("ETag")
+    if tag_header and etag_matches(if_none_match, tag_header):
+        rendered_cache.not_modified += 1
+        return not_modified(tag_header)
+    return None
+
+
+def lookup(etag, accept_encoding, if_none_match):
+    """
+    A 304 or an already-rendered response for etag, or None if the search has to run. Only
+    cacheable responses are in the rendered cache, so a 304 from here never covers, say,
+    a cursor page; otherwise the 304 is decided in finish() once cacheability is known.
+    """
+    entry = rendered_cache.get((etag, choose_encoding(accept_encoding)))
+    if entry is None:
+        return None
+    return revalidated(if_none_match, entry[1]) or (200,) + entry
+
+
+def finish(etag, accept_encoding, payload, extra_headers, cacheable, if_none_match=None):
+    status, body, headers = render(payload, accept_encoding, extra_headers=extra_headers,
+                                   tag=etag if cacheable else None)
+    if cacheable:
+        rendered_cache.set((etag, choose_encoding(accept_encoding)), body, headers)
+    return revalidated(if_none_match, headers) or (status, body, headers)
+
+
+def respond(etag, accept_encoding, if_none_match, compute):
+    """
+    compute() returns (payload, extra headers, cacheable) and only runs when neither a
+    304 nor a cached rendering can answer. Returns (status, body, headers).
+    """
+    answered = lookup(etag, accept_encoding, if_none_match)
+    if answered:
+        return answered
+    payload, extra_headers, cacheable = compute()
+    return finish(etag, accept_encoding, payload, extra_headers, cacheable, if_none_match)
+
+
+async def respond_async(etag, accept_encoding, if_none_match, compute):
+    """respond() for the async routes: compute is a coroutine function."""
+    answered = lookup(etag, accept_encoding, if_none_match)
+    if answered:
+        return answered
+    payload, extra_headers, cacheable = await compute()
+    return finish(etag, accept_encoding, payload, extra_headers, cacheable, if_none_match)
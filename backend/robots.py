@@ -0,0 +1,143 @@
+"""
+Per-host robots.txt cache for the fetch path (see fetcher.check_robots).
+
+Each host's robots.txt is fetched once, parsed, and kept for ROBOTS_TTL seconds.
+After that, the first fetch that notices refreshes it while concurrent fetches
+keep using the old rules, so a crawl only waits on robots.txt for the very first
+request to a host. can_fetch() answers are memoized per (user agent, path), and
+Crawl-delay / Request-rate become a per-host rate ceiling for the rate limiter.
+
+Following RFC 9309: a missing robots.txt (any 4xx) allows everything; a 5xx or an
+unreachable host disallows everything until the next attempt, ROBOTS_ERROR_TTL
+seconds later (rules fetched before stay in force meanwhile).
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+ROBOTS_TTL = float(os.getenv("ROBOTS_TTL", str(24 * 3600)))
+ROBOTS_ERROR_TTL = float(os.getenv("ROBOTS_ERROR_TTL", "300"))
+# Overrides the User-Agent header when matching robots.txt groups.
+ROBOTS_USER_AGENT = os.getenv("ROBOTS_USER_AGENT", "")
+# Memoized can_fetch answers kept per host before the memo is cleared.
+ROBOTS_MEMO_SIZE = int(os.getenv("ROBOTS_MEMO_SIZE", "10000"))
+
+
+class RobotsDisallowed(Exception):
+    """Raised instead of fetching a URL that robots.txt puts off limits."""
+
+
+def site_of(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme or 'https'}://{parsed.netloc.lower()}"
+
+
+def path_of(url):
+    parsed = urlparse(url)
+    return (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+
+
+class HostRules:
+    """The parsed robots.txt of one host, with memoized answers."""
+
+    def __init__(self, parser, ttl, source):
+        self.parser = parser
+        self.expires_at = time.monotonic() + ttl
+        self.source = source # "robots.txt", "missing" or "unreachable"
+        self._allowed = {}
+        self._rates = {}
+
+    @property
+    def fresh(self):
+        return time.monotonic() < self.expires_at
+
+    def can_fetch(self, user_agent, url):
+        key = (user_agent, path_of(url))
+        allowed = self._allowed.get(key)
+        if allowed is None:
+            if len(self._allowed) >= ROBOTS_MEMO_SIZE:
+                self._allowed.clear()
+            allowed = self._allowed[key] = self.parser.can_fetch(user_agent, url)
+        return allowed
+
+    def max_rate(self, user_agent):
+        """Requests per second allowed by Crawl-delay / Request-rate (the stricter one), or None."""
+        if user_agent not in self._rates:
+            rates = []
+            delay = self.parser.crawl_delay(user_agent)
+            if delay:
+                rates.append(1.0 / float(delay))
+            request_rate = self.parser.request_rate(user_agent)
+            if request_rate and request_rate.seconds:
+                rates.append(request_rate.requests / request_rate.seconds)
+            self._rates[user_agent] = min(rates) if rates else None
+        return self._rates[user_agent]
+
+
+class RobotsCache:
+    def __init__(self, ttl=ROBOTS_TTL, error_ttl=ROBOTS_ERROR_TTL):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._entries = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def _host_lock(self, site):
+        with self._lock:
+            return self._loading.setdefault(site, threading.Lock())
+
+    def rules(self, url, session):
+        """HostRules for url's host, fetching robots.txt with session the first time (and after the TTL)."""
+        site = site_of(url)
+        entry = self._entries.get(site)
+        if entry is not None and entry.fresh:
+            return entry
+        lock = self._host_lock(site)
+        # Stale rules stay in use while one thread refreshes them; only a first load is waited for.
+        if not lock.acquire(blocking=entry is None):
+            return entry
+        try:
+            current = self._entries.get(site)
+            if current is not None and current is not entry and current.fresh:
+                return current # Loaded by another thread while this one waited
+            loaded = self._load(site, session, previous=entry)
+            self._entries[site] = loaded
+            return loaded
+        finally:
+            lock.release()
+
+    def _load(self, site, session, previous=None):
+        robots_url = f"{site}/robots.txt"
+        parser = RobotFileParser(robots_url)
+        try:
+            response = session.get(robots_url, timeout=10)
+            status = response.status_code
+        except Exception as e:
+            status, response = None, e
+        if status is not None and 200 <= status < 300:
+            parser.parse(response.text.splitlines())
+            parser.modified()
+            rules = HostRules(parser, self.ttl, "robots.txt")
+        elif status is not None and 400 <= status < 500:
+            parser.allow_all = True
+            rules = HostRules(parser, self.ttl, "missing")
+        else:
+            if previous is not None and previous.source != "unreachable":
+                print(f"⚠️ Could not refresh {robots_url} ({status or response}); keeping the cached rules.")
+                previous.expires_at = time.monotonic() + self.error_ttl
+                return previous
+            print(f"⚠️ Could not fetch {robots_url} ({status or response}); not crawling {site} for now.")
+            parser.disallow_all = True
+            rules = HostRules(parser, self.error_ttl, "unreachable")
+        print(f"🤖 Loaded robots rules for {site} ({rules.source}).")
+        return rules
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# One cache for the whole process, shared by every scraper.
+robots_cache = RobotsCache()
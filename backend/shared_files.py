@@ -0,0 +1,34 @@
+"""
+Small helpers for state files that several server worker processes read and write
+(the job list, the alias generation marker): an exclusive lock around a
+read-modify-write, and atomic replacement so readers never see half a file.
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Not on Windows; a single worker process needs no lock
+    fcntl = None
+
+
+@contextmanager
+def locked(filename):
+    """Holds an exclusive lock on filename's sidecar "<filename>.lock" for the block."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{filename}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_atomic(filename, text):
+    """Writes text to filename through a per-process temp file and os.replace."""
+    tmp_name = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_name, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_name, filename)
@@ -0,0 +1,167 @@
+"""
+Query-aware snippets.
+
+Long text fields (passage body_text, CFA description) are indexed with term vectors
+(positions + offsets), and searches ask ES for fast-vector-highlighter fragments of
+them under a fixed budget (SNIPPET_FRAGMENTS fragments of ~SNIPPET_FRAGMENT_CHARS).
+Combined with _source filtering, only the snippet leaves ES, never the full body.
+Generations indexed before the term vectors existed can't serve fvh, so the
+highlighter is picked per alias from its live mapping (highlighter_for) and falls
+back to "unified" until the alias has been reindexed.
+
+The local search engine and the ES stand-in build the same fragments from their
+stored documents with make_fragments().
+"""
+import os
+import re
+
+SNIPPET_FRAGMENT_CHARS = int(os.getenv("SNIPPET_FRAGMENT_CHARS", "160"))
+SNIPPET_FRAGMENTS = int(os.getenv("SNIPPET_FRAGMENTS", "2"))
+# fvh needs the term vectors below; "unified" also works on generations indexed before them.
+SNIPPET_HIGHLIGHTER = os.getenv("SNIPPET_HIGHLIGHTER", "fvh")
+SNIPPET_SEPARATOR = " … "
+FALLBACK_HIGHLIGHTER = "unified"
+
+WORD_RE = re.compile(r"\w+")
+
+# (alias, field) -> highlighter its live generations support; forgotten on every alias swap.
+_highlighters = {}
+
+
+def with_offsets(field_mapping):
+    """A text field mapping that also stores term vectors with positions and offsets (for fvh)."""
+    return {**field_mapping, "term_vector": "with_positions_offsets"}
+
+
+def has_offsets(index_info, field):
+    properties = (index_info.get("mappings") or {}).get("properties") or {}
+    return (properties.get(field) or {}).get("term_vector") == "with_positions_offsets"
+
+
+def highlighter_for(client, alias, field):
+    """
+    SNIPPET_HIGHLIGHTER if it works on every index behind alias: fvh needs term vectors with
+    offsets in the mapping, so older generations get FALLBACK_HIGHLIGHTER instead.
+    """
+    if SNIPPET_HIGHLIGHTER != "fvh":
+        return SNIPPET_HIGHLIGHTER
+    key = (alias, field)
+    if key not in _highlighters:
+        try:
+            indices = client.indices.get(index=alias)
+            supported = bool(indices) and all(has_offsets(info, field) for info in indices.values())
+        except Exception as e:
+            # Not remembered: the mapping is read again once Elasticsearch answers.
+            print(f"⚠️ Could not read the mapping of '{alias}' ({e}); highlighting with {FALLBACK_HIGHLIGHTER}.")
+            return FALLBACK_HIGHLIGHTER
+        if not supported:
+            print(f"ℹ️ '{alias}' has no term vectors for {field}; using the {FALLBACK_HIGHLIGHTER} highlighter until it is reindexed.")
+        _highlighters[key] = SNIPPET_HIGHLIGHTER if supported else FALLBACK_HIGHLIGHTER
+    return _highlighters[key]
+
+
+def forget_highlighters(alias, new_index=None):
+    """Alias swap listener: the new generation's mapping is checked again on the next search."""
+    for key in [key for key in _highlighters if key[0] == alias]:
+        _highlighters.pop(key, None)
+
+
+def highlight_clause(*fields, highlighter=SNIPPET_HIGHLIGHTER):
+    """
+    Highlight section for a search body. Fragments are plain text (the UI renders text, not
+    HTML), best-scoring first; a document matched only on another field gets its opening text.
+    """
+    return {
+        "type": highlighter,
+        "pre_tags": [""],
+        "post_tags": [""],
+        "order": "score",
+        "fragment_size": SNIPPET_FRAGMENT_CHARS,
+        "number_of_fragments": SNIPPET_FRAGMENTS,
+        "no_match_size": SNIPPET_FRAGMENT_CHARS,
+        "fields": {field: {} for field in fields},
+    }
+
+
+def snippet_from_hit(hit, field):
+    """The highlighted fragments of field joined into one snippet, or None if ES sent none."""
+    fragments = (hit.get('highlight') or {}).get(field)
+    return SNIPPET_SEPARATOR.join(fragment.strip() for fragment in fragments) if fragments else None
+
+
+# --- FRAGMENTS FROM A STORED DOCUMENT (local engine / ES stand-in) ---
+def query_strings(query):
+    """Every full-text query string in a (match / multi_match / bool) query."""
+    if not isinstance(query, dict):
+        return []
+    strings = []
+    for kind, spec in query.items():
+        if kind == "match" and isinstance(spec, dict):
+            for params in spec.values():
+                strings.append(params.get("query", "") if isinstance(params, dict) else params)
+        elif kind == "multi_match" and isinstance(spec, dict):
+            strings.append(spec.get("query", ""))
+        elif kind == "bool" and isinstance(spec, dict):
+            for clauses in spec.values():
+                for clause in clauses if isinstance(clauses, list) else [clauses]:
+                    strings.extend(query_strings(clause))
+    return [str(string) for string in strings if string]
+
+
+def make_fragments(text, terms, analyze, fragment_chars=SNIPPET_FRAGMENT_CHARS,
+                   max_fragments=SNIPPET_FRAGMENTS, no_match_size=SNIPPET_FRAGMENT_CHARS):
+    """
+    Up to max_fragments windows of about fragment_chars around the words of text whose
+    analyzed form is in terms, best (most distinct matches) first. Falls back to the
+    first no_match_size characters when nothing matches.
+    """
+    text = str(text or "")
+    matches = [(m.start(), m.end(), analyzed) for m in WORD_RE.finditer(text)
+               for analyzed in analyze(m.group()) if analyzed in terms]
+    if not matches:
+        return [trim_to_word(text, 0, no_match_size)] if text and no_match_size else []
+
+    candidates = []
+    for start, _, _ in matches:
+        window_start = max(0, start - fragment_chars // 4)
+        window_end = window_start + fragment_chars
+        covered = {term for s, e, term in matches if s >= window_start and e <= window_end}
+        candidates.append((-len(covered), window_start))
+    candidates.sort()
+
+    chosen = []
+    for _, window_start in candidates:
+        if all(abs(window_start - other) >= fragment_chars for other in chosen):
+            chosen.append(window_start)
+            if len(chosen) == max_fragments:
+                break
+    return [trim_to_word(text, start, fragment_chars) for start in chosen]
+
+
+def trim_to_word(text, start, length):
+    """text[start:start + length], widened/narrowed so it doesn't cut words in half."""
+    if start > 0:
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+    end = min(len(text), start + length)
+    if end < len(text):
+        cut = text.rfind(' ', start, end)
+        end = cut if cut > start else end
+    return text[start:end].strip()
+
+
+def highlight_source(source, body, analyze):
+    """ES-shaped {"field": [fragments]} for one hit, from its full stored source."""
+    spec = body.get("highlight") or {}
+    terms = {term for string in query_strings(body.get("query")) for term in analyze(string)}
+    highlight = {}
+    for field in spec.get("fields", {}):
+        fragments = make_fragments(
+            source.get(field), terms, analyze,
+            int(spec.get("fragment_size", SNIPPET_FRAGMENT_CHARS)),
+            int(spec.get("number_of_fragments", SNIPPET_FRAGMENTS)),
+            int(spec.get("no_match_size", 0)),
+        )
+        if fragments:
+            highlight[field] = fragments
+    return highlight
@@ -0,0 +1,103 @@
+"""
+Type-ahead suggestions from a precomputed, in-memory prefix index.
+
+Every suggestion text (breed name, section title, Reddit title) is stored under
+each of its word starts, so "coon" completes "Maine Coon" as well as "mai" does.
+Keys live in one sorted array searched with bisect; the best completions of very
+short prefixes (the ones that match thousands of keys) are precomputed at build
+time. A lookup never runs a full-text query.
+"""
+import heapq
+import os
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from query_cache import normalize_query
+
+SUGGEST_MAX_RESULTS = int(os.getenv("SUGGEST_MAX_RESULTS", "10"))
+SUGGEST_MIN_CHARS = 1
+# Prefixes this short get their top completions precomputed.
+SUGGEST_PRECOMPUTED_CHARS = 2
+
+
+class Suggester:
+    def __init__(self, max_results=SUGGEST_MAX_RESULTS):
+        self.max_results = max_results
+        self._sources = {}
+        self._lock = threading.Lock()
+        # (sorted keys, parallel (rank, text, source) entries, precomputed short-prefix results)
+        self._index = ([], [], {})
+
+    def set_source(self, source, texts):
+        """Replaces one source's suggestions (e.g. after its index is rebuilt) and rebuilds the index."""
+        counts = Counter(" ".join(str(text).split()) for text in texts if text and str(text).strip())
+        with self._lock:
+            self._sources[source] = counts
+            self._index = self._build()
+        print(f"✅ Suggestions for '{source}' rebuilt ({len(counts)} entries).")
+
+    def _build(self):
+        rows = []
+        for source, counts in self._sources.items():
+            for text, count in counts.items():
+                words = normalize_query(text).split()
+                for position in range(len(words)):
+                    # Completions of the text's first word rank above mid-text matches, then by frequency.
+                    rank = (position > 0, -count, len(text), text)
+                    rows.append((" ".join(words[position:]), rank, source))
+        rows.sort(key=lambda row: row[0])
+        keys = [key for key, _, _ in rows]
+        entries = [(rank, source) for _, rank, source in rows]
+
+        shortlists = {}
+        for key, (rank, source) in zip(keys, entries):
+            for length in range(SUGGEST_MIN_CHARS, SUGGEST_PRECOMPUTED_CHARS + 1):
+                if len(key) >= length:
+                    shortlists.setdefault(key[:length], []).append((rank, source))
+        precomputed = {prefix: self._top(candidates, self.max_results) for prefix, candidates in shortlists.items()}
+        return keys, entries, precomputed
+
+    @staticmethod
+    def _distinct(ordered, limit):
+        results, seen = [], set()
+        for rank, source in ordered:
+            text = rank[-1]
+            if (text, source) not in seen:
+                seen.add((text, source))
+                results.append({"text": text, "source": source})
+                if len(results) == limit:
+                    break
+        return results
+
+    @classmethod
+    def _top(cls, candidates, limit, sources=None):
+        """The best distinct (text, source) completions among candidates."""
+        if sources:
+            candidates = [entry for entry in candidates if entry[1] in sources]
+        shortlist = heapq.nsmallest(limit * 4, candidates)
+        results = cls._distinct(shortlist, limit)
+        if len(results) < limit and len(candidates) > len(shortlist):
+            results = cls._distinct(sorted(candidates), limit)
+        return results
+
+    def suggest(self, prefix, limit=None, sources=None):
+        """Up to `limit` completions of prefix, best first, optionally only from some sources."""
+        limit = max(1, min(limit or self.max_results, self.max_results))
+        prefix = normalize_query(prefix)
+        if len(prefix) < SUGGEST_MIN_CHARS:
+            return []
+        keys, entries, precomputed = self._index
+        if prefix in precomputed and not sources:
+            return precomputed[prefix][:limit]
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + "\uffff", lo)
+        return self._top(entries[lo:hi], limit, sources)
+
+    def stats(self):
+        keys, _, precomputed = self._index
+        return {"keys": len(keys), "precomputed_prefixes": len(precomputed),
+                "sources": {source: len(counts) for source, counts in self._sources.items()}}
+
+
+suggester = Suggester()
@@ -0,0 +1,55 @@
+import csv
+import os
+
+from dedup import cfa_filter
+
+CFA_DETAILED_CSV = os.path.join(os.path.dirname(__file__), '..', 'cfa_breeds_detailed_2025.csv')
+
+
+def load_cfa_rows():
+    with open(CFA_DETAILED_CSV, newline='', encoding='utf-8') as f:
+        return [{"name": row['name'], "url": row['url'], "description": row['description']}
+                for row in csv.DictReader(f)]
+
+
+def test_breed_cards_with_placeholder_descriptions_survive():
+    rows = load_cfa_rows()
+    kept = list(cfa_filter().filter(rows))
+    breed_urls = {row['url'] for row in rows if '/breed/' in row['url']}
+
+    assert breed_urls
+    assert breed_urls <= {doc['url'] for doc in kept}
+    # The placeholder text itself is never indexed.
+    assert all(doc['description'] != "Content area not found." for doc in kept)
+
+
+def test_navigation_entries_are_dropped():
+    kept_names = {doc['name'] for doc in cfa_filter().filter(load_cfa_rows())}
+
+    assert not kept_names & {"HOME", "CAT TALK", "CATALOG", "Top Cats", "Resources"}
+
+
+def test_repeated_breed_pages_are_dropped():
+    rows = load_cfa_rows()
+    breeds = [row for row in rows if '/breed/' in row['url']]
+    kept = list(cfa_filter().filter(breeds + [dict(row) for row in breeds]))
+
+    assert len(kept) == len(breeds)
+
+
+def test_short_breed_names_with_placeholder_descriptions_are_kept():
+    dedup = cfa_filter()
+    for name in ("Bengal", "Persian", "Maine Coon"):
+        doc = {"name": name, "url": f"https://cfa.org/breed/{name.lower().replace(' ', '-')}/",
+               "description": "No description found."}
+
+        assert dedup.check(doc) is None
+        assert doc['description'] == ""
+
+
+def test_menu_labels_are_navigation_whatever_their_length():
+    dedup = cfa_filter()
+    for name in ("Resources", "Top Cats", "HOME", "2024-25"):
+        doc = {"name": name, "url": f"https://cfa.org/{name}/", "description": "Content area not found."}
+
+        assert dedup.check(doc) == "placeholder"
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("elasticsearch")
+
+from local_search import LocalSearchClient
+from pagination import InvalidCursor, decode_cursor, encode_cursor, msearch_pages, search_page
+
+QUERY = {"query": {"match": {"text": "cat"}}}
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = LocalSearchClient(str(tmp_path))
+    client.build("memes", ({"id": f"m{i}", "text": f"cat meme {i}"} for i in range(6)), ["text"], "id")
+    client.build("secret_stuff", ({"id": f"s{i}", "text": f"cat secret {i}"} for i in range(6)), ["text"], "id")
+    return client
+
+
+def test_pages_walk_the_alias(client):
+    seen = []
+    response, cursor = search_page(client, "memes", QUERY, 2)
+    while True:
+        seen += [hit['_id'] for hit in response['hits']['hits']]
+        if not cursor:
+            break
+        response, cursor = search_page(client, "memes", QUERY, 2, cursor)
+
+    assert sorted(seen) == [f"m{i}" for i in range(6)]
+
+
+def test_cursor_naming_another_index_is_rejected(client):
+    for index in ("secret_stuff", "memes,secret_stuff", "memes-x", "memes-20250101000000000000,secret_stuff"):
+        with pytest.raises(InvalidCursor):
+            search_page(client, "memes", QUERY, 2, encode_cursor({"index": index, "from": 0}))
+
+
+def test_pit_cursor_replayed_on_another_route_is_rejected(client):
+    _, cursor = search_page(client, "secret_stuff", QUERY, 2)
+    _, pit_cursor = search_page(client, "secret_stuff", QUERY, 2, cursor)
+    assert "pit" in decode_cursor(pit_cursor)
+
+    with pytest.raises(InvalidCursor):
+        search_page(client, "memes", QUERY, 2, pit_cursor)
+
+
+def test_multi_source_cursor_is_checked_per_source(client):
+    sources = [("memes", "memes", QUERY)]
+    with pytest.raises(InvalidCursor):
+        msearch_pages(client, sources, 2, encode_cursor({"memes": {"index": "secret_stuff", "from": 2}}))
+    with pytest.raises(InvalidCursor):
+        msearch_pages(client, sources, 2, encode_cursor({"secrets": {"index": "memes", "from": 2}}))
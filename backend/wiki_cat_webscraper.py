@@ -1,9 +1,11 @@
 import requests
-from bs4 import BeautifulSoup
-import csv
-import re
 from datetime import datetime
-import os
+
+from passages import passage_rows, PASSAGE_SCHEMA
+from records import RecordWriter, find_records
+from html_extract import extract_article_passages, extract_title
+from fetcher import fetch
+from crawl_state import crawl_state
 
 # --- CONFIGURATION ---
 # Using the simplified 'action=render' URL for a text-friendly output
@@ -17,74 +19,42 @@ HEADERS = {
 
 def scrape_wikipedia_cat_to_csv(url, filename, headers):
     """
-    Scrapes the Wikipedia article using a brute-force method to extract all 
-    text from the body, bypassing specific <p> tags that were causing failures.
+    Scrapes the Wikipedia article into section- and paragraph-level passages,
+    one CSV row per passage with a stable passage_id.
     """
     print(f"--- Starting Wikipedia scrape for: {url} ---")
-    documents_to_write = [] 
 
     try:
         # 1. Fetch the content
-        response = requests.get(url, headers=headers, timeout=15)
+        # Conditional GET: skip parsing entirely if the article hasn't changed since the last run
+        response = fetch(url, headers=headers, timeout=15, conditional=True)
         response.raise_for_status() 
+        if not response.changed and find_records(filename):
+            print(f"♻️ Article unchanged since the last crawl; {filename} is up to date.")
+            return
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # 2. BRUTE-FORCE: Forget specific classes and IDs. Get the entire body.
-        main_content_container = soup.find('body')
-        
-        # If the body tag is somehow missing (highly unlikely), use the entire document
-        if not main_content_container:
-            main_content_container = soup
-        
-        # 3. EXTRACT AND CLEAN ALL TEXT NODES (Ignoring <p> tags entirely)
-        # Use get_text to extract all readable text, splitting lines with a newline character
-        all_text_nodes = main_content_container.get_text('\n', strip=True) 
-        
-        # Split the giant text blob into lines/paragraphs based on newlines
-        full_text_lines = all_text_nodes.split('\n')
-        
-        article_paragraphs = []
-        
-        print(f"--- DEBUG: Total text lines/nodes found: {len(full_text_lines)} ---") # DEBUG LINE
-
-        for text_line in full_text_lines:
-            # Clean up: remove citation numbers and surrounding whitespace
-            cleaned_text = re.sub(r'\[\d+\]', '', text_line.strip())
-            
-            # Filter: Use a reasonable length filter to discard short navigation/template lines
-            if len(cleaned_text) > 50: 
-                article_paragraphs.append(cleaned_text)
-                print(f"DEBUG: Captured text snippet (Length {len(cleaned_text)}): {cleaned_text[:60]}...") # DEBUG LINE
-            
-        # 4. CONSOLIDATE INTO A SINGLE SEARCHABLE DOCUMENT
-        article_text = ' '.join(article_paragraphs)
+        # 2. The rendered article is the whole body; only headings and paragraphs are parsed
+        # 3. SPLIT INTO PASSAGES: every <h2>/<h3> starts a section, every long <p> is a passage
+        passages = extract_article_passages(response.content, url)
+        for passage in passages:
+            print(f"DEBUG: [{passage['section']}] {passage['text'][:60]}...") # DEBUG LINE
         
         # Get the page title
-        page_title = soup.title.string.replace(' - Wikipedia', '').strip() if soup.title else 'Cat Article'
+        raw_title = extract_title(response.content)
+        page_title = raw_title.replace(' - Wikipedia', '').strip() if raw_title else 'Cat Article'
         
         # Validation check
-        if len(article_text) < 1000: # Setting a high length check now that we are grabbing ALL text
-             print(f"❌ Warning: Scraped content is short ({len(article_text)} chars). Scraping may have failed.")
-             # We won't return here, we will still write the file to see what data was collected
-        
-        # Prepare the single document dictionary
-        documents_to_write.append({
-            'timestamp': datetime.now().isoformat(),
-            'source_url': url,
-            'title': page_title,
-            'scraped_content': article_text 
-        })
+        total_chars = sum(len(p['text']) for p in passages)
+        if total_chars < 1000:
+             print(f"❌ Warning: Scraped content is short ({total_chars} chars). Scraping may have failed.")
         
-        # 5. WRITE DATA TO CSV
-        if documents_to_write and len(article_text) > 50:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['timestamp', 'source_url', 'title', 'scraped_content'] 
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(documents_to_write)
+        # 4. WRITE THE PASSAGE RECORDS (see records.py for the format)
+        if passages:
+            with RecordWriter(filename, PASSAGE_SCHEMA) as writer:
+                writer.write_many(passage_rows(passages, url, page_title, datetime.now().isoformat()))
             
-            print(f"✅ Success! Article scraped (Length: {len(article_text)}). Data saved to {filename}.")
+            crawl_state.commit([url])
+            print(f"✅ Success! {len(passages)} passages scraped (Length: {total_chars}). Data saved to {writer.filename}.")
         else:
             print("⚠️ No suitable content was extracted for indexing.")
             